@@ -1,14 +1,43 @@
-from typing import Dict, List, Union
+import hashlib
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple, Union
 
 import requests
 from qgis.core import Qgis, QgsApplication, QgsMessageLog, QgsTask
 from qgis.PyQt.QtCore import pyqtSignal
 
+from ..sub.crawl_checkpoint import (clear_crawl_checkpoint,
+                                    load_crawl_checkpoint,
+                                    save_crawl_checkpoint)
 from ..sub.logger import LOGGER_CATEGORY
+from ..sub.retry import resilient_get
 from .Layer import Layer
 from .layer_hierarchy import LayerGroup, build_hierarchy_from_flat_with_paths
 from .Service import GrdService
 
+# Folders skipped while crawling, they only contain basemaps, tooling or test services.
+ESRI_FOLDERS_TO_EXCLUDE = [
+    "Basemap",
+    "Utilities",
+    "Thematic_Map",
+    "TEST_DXF2GDB_SERVICE",
+    "temp",
+    "PrintLayouts",
+    "DIONYSIS",
+]
+
+# Worker threads of the concurrent crawler. Requests per host are further
+# limited by the adaptive per-host limiter (sub/rate_limit.py).
+ESRI_CRAWL_MAX_WORKERS = 16
+
+# Seconds between two checkpoints of a running crawl
+ESRI_CRAWL_CHECKPOINT_INTERVAL = 10
+
+# Service types exposing every layer definition at once through {service}/layers
+ESRI_BATCH_LAYER_TYPES = ("MapServer", "FeatureServer")
+
 
 def clean_esri_attributes(layer_attributes: Dict[str, str]) -> None:
     """
@@ -31,6 +60,15 @@ def clean_esri_attributes(layer_attributes: Dict[str, str]) -> None:
     return layer_attributes
 
 
+def esri_service_fingerprint(service_definition: Dict) -> str:
+    """
+    Fingerprint of a service definition ({service}?f=json). Adding, removing, renaming
+    or republishing layers changes the definition, and with it the fingerprint.
+    """
+    encoded = json.dumps(service_definition, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+
 def filter_esri_attributes(attributes: Dict[str, str]) -> Dict[str, str]:
     """
     Only keep desired attributes:
@@ -57,45 +95,261 @@ def filter_esri_attributes(attributes: Dict[str, str]) -> Dict[str, str]:
     }
 
 
+class _CrawlNode:
+    """
+    A single request of the concurrent crawl: either an ArcGIS REST resource
+    (root, folder or service) or a layer definition. Children are kept in the
+    order the serial crawler would visit them, so results can be replayed
+    deterministically once the crawl completes.
+    """
+
+    __slots__ = (
+        "url",
+        "kind",
+        "parent_type",
+        "path_prefix",
+        "layer",
+        "parent",
+        "response",
+        "children",
+        "record",
+        "pending_layers",
+    )
+
+    RESOURCE = "resource"
+    LAYER = "layer"
+    LAYER_BATCH = "layer_batch"  # {service}/layers, children are the service's layer nodes
+
+    def __init__(self, url, kind, parent_type=None, path_prefix="", layer=None, parent=None):
+        self.url = url
+        self.kind = kind
+        self.parent_type = parent_type
+        self.path_prefix = path_prefix
+        self.layer = layer
+        self.parent = parent
+        self.response = None
+        self.children = []
+        self.record = None  # (layer dict, path) once a layer node is resolved
+        self.pending_layers = 0  # layers of a service node still being fetched
+
+
 class LoadEsriAsync(QgsTask):
     """
-    Asynchronously query an ArcGIS server for available services, using a QgsTask
+    Asynchronously query an ArcGIS server for available services, using a QgsTask.
+
+    While crawling, `batchLoaded` publishes the layers of every service as soon as
+    that service is complete, `loaded` publishes the full layer list at the end.
+
+    Args:
+        url: The ArcGIS REST services directory
+        concurrent: Crawl folders, services and layers on a bounded worker pool
+            instead of one request at a time. Both modes produce the same output.
+        max_workers: Size of the worker pool used by the concurrent crawler
+        batch_layers: Fetch all layer definitions of a MapServer/FeatureServer with a
+            single {service}/layers request, falling back to per-layer requests
+            only when that endpoint is unavailable.
+        resume: Persist the concurrent crawl's frontier and finished results under
+            .cache/crawls, and resume an interrupted crawl of the same URL from there.
+        previous_services: Maps service URL -> {"fingerprint", "layers"} of a previous
+            crawl, "layers" being (layer dict, path) records. Services (or folders) that
+            fail to load keep these records.
+        delta: Services whose fingerprint is unchanged reuse their previous records
+            instead of fetching their layers again.
     """
 
     loaded = pyqtSignal(list)
-
-    def __init__(self, url):
+    batchLoaded = pyqtSignal(list, list)  # layer dicts, their hierarchy paths
+
+    def __init__(
+        self,
+        url,
+        concurrent=True,
+        max_workers=ESRI_CRAWL_MAX_WORKERS,
+        batch_layers=True,
+        resume=True,
+        previous_services=None,
+        delta=True,
+    ):
         super().__init__(f"Loading from {url} (ESRI server)", QgsTask.CanCancel)
 
         self.url = url
-        self.capabilities = dict()
+        self.concurrent = concurrent
+        self.max_workers = max_workers
+        self.batch_layers = batch_layers
+        self.resume = resume
+        # Crawl results: flat layer records, and the hierarchy path of each (same index)
         self.layers = list()
-        self.layer_paths = dict()  # Map layer id -> path string for hierarchy
+        self.layer_paths = list()
         self.exception = None
 
-    def _get(self, url):
+        # Crawl checkpoint: listings of fetched resources and records of resolved layers, by URL
+        self._checkpoint_resources = dict()
+        self._checkpoint_layers = dict()
+        self._checkpoint_saved_at = 0
+        self._checkpoint_started_at = None  # Start of the first of a chain of resumed crawls
+
+        # Delta crawl: fingerprint of every fetched service, and the reusable layer records by URL
+        self.previous_services = previous_services or dict()
+        self.delta = delta
+        self.service_fingerprints = dict()
+        self._reused_layers = dict()
+
+    def _get(self, url, record_error=True):
         url = url.rstrip("/")
 
         # Query the REST endpoint
         payload = {"f": "json"}
-        response = requests.get(
-            url,
-            params=payload,
-            headers={"user-agent": "grdata-qgis-plugin/1.0.0"},
-            timeout=10,
-            allow_redirects=True,
-            cookies=None,
-        ).json()
+        try:
+            response = resilient_get(url, params=payload, is_cancelled=self.isCanceled).json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            if record_error:
+                self.exception = e
+                QgsMessageLog.logMessage(
+                    f"[ESRIService/Loader] Request to {url} failed: {e}",
+                    LOGGER_CATEGORY,
+                    Qgis.Warning,
+                )
+            return None
 
         if "error" in response:
-            self.exception = Exception(response)
+            if record_error:
+                self.exception = Exception(response)
             return None
 
         return response
 
-    def query_esri_server(self, url, parent_type=None, path_prefix="") -> Dict[str, Dict[str, str]]:
+    def _get_layer_definitions(self, url) -> Optional[Dict[int, Dict]]:
+        """
+        Fetch every layer definition of a service with one {service}/layers request.
+
+        Args:
+            url: The MapServer/FeatureServer URL
+
+        Returns:
+            Dict mapping layer id -> layer definition, or None if the endpoint is unavailable
+        """
+        # Old servers answer with an error (or an HTML page) instead of the definitions
+        response = self._get(f"{url.rstrip('/')}/layers", record_error=False)
+        if not response or not isinstance(response.get("layers"), list):
+            return None
+
+        return {
+            int(definition["id"]): definition
+            for definition in response["layers"]
+            if isinstance(definition, dict) and "id" in definition
+        }
+
+    def _uses_layer_batch(self, parent_type, response) -> bool:
+        return (
+            self.batch_layers
+            and parent_type in ESRI_BATCH_LAYER_TYPES
+            and len(response.get("layers", list())) > 0
+        )
+
+    def _layer_record(self, layer, url, parent_type, path_prefix, layer_attributes) -> Tuple[Dict, str]:
+        """
+        Clean a layer definition and build its layer entry and hierarchy path.
+
+        Args:
+            layer: The layer stub from the parent service response (id, name)
+            url: The parent service URL
+            parent_type: Service type (Map/Image/Feature)
+            path_prefix: Path of the parent service in the hierarchy
+            layer_attributes: The layer definition returned by the server
+
+        Returns:
+            Tuple of the layer entry and its path
+        """
+        layer_id = int(layer["id"])
+        layer_name = layer["name"]
+        layer_url = f"{url}/{layer_id}"
+
+        # Failed layer requests keep the layer, without its definition
+        _cleaned_attrs = {}
+        try:
+            _filtered_attrs = filter_esri_attributes(layer_attributes or {})
+            _cleaned_attrs = clean_esri_attributes(_filtered_attrs) or {}
+
+        except Exception as e:
+            self.exception = e
+            QgsMessageLog.logMessage(
+                f"[ESRIService/Loader] Tried to clean fields for layer {layer_name} but failed: {e}",
+                LOGGER_CATEGORY,
+                Qgis.Warning,
+            )
+
+        layer_dict = {
+            "id": layer_id,
+            "name": layer_name,
+            "url": layer_url,
+            "type": parent_type,
+            "attributes": _cleaned_attrs,
+            "geometryType": _cleaned_attrs.get("geometryType", None),
+            "extent": _cleaned_attrs.get("extent", None),
+        }
+
+        layer_path = f"{path_prefix}/{layer_name}" if path_prefix else layer_name
+        layer_dict["path"] = layer_path
+
+        return layer_dict, layer_path
+
+    def _append_layer(self, layer_dict, layer_path) -> None:
+        """Record a layer in the flat layer list and track its path."""
+        self.layers.append(layer_dict)
+
+        # Track the path for this layer to rebuild hierarchy later. Indexed like
+        # self.layers, ESRI layer ids repeat across services.
+        self.layer_paths.append(layer_path)
+
+    def _reuse_unchanged_service(self, url, response) -> None:
+        """
+        Fingerprint a fetched service. If the fingerprint matches the previous crawl's,
+        queue that crawl's layer records for reuse. Layers that had no definition
+        (failed requests) are fetched again.
+        """
+        if "layers" not in response:
+            return
+
+        # Listings restored from a crawl checkpoint carry the fingerprint of the full definition
+        fingerprint = response.get("fingerprint") or esri_service_fingerprint(response)
+        self.service_fingerprints[url] = fingerprint
+
+        previous = self.previous_services.get(url)
+        if not self.delta or not previous or previous.get("fingerprint") != fingerprint:
+            return
+
+        for layer_dict, layer_path in previous.get("layers", list()):
+            if layer_dict.get("attributes"):
+                self._reused_layers[layer_dict["url"]] = (layer_dict, layer_path)
+
+    def _previous_records(self, url) -> List[Tuple[Dict, str]]:
+        """
+        Records of the previous crawl for the services at or below a resource that
+        failed to load, so a single broken service or folder does not drop its layers.
+        """
+        records = []
+        for service_url, previous in self.previous_services.items():
+            if service_url != url and not service_url.startswith(f"{url}/"):
+                continue
+            records.extend(tuple(record) for record in previous.get("layers", list()))
+            if previous.get("fingerprint"):
+                self.service_fingerprints[service_url] = previous["fingerprint"]
+        return records
+
+    def _emit_batch(self, records: List[Tuple[Dict, str]]) -> None:
+        """Publish the layers of a completed service while the crawl goes on."""
+        if not records:
+            return
+        self.batchLoaded.emit(
+            [dict(layer_dict) for layer_dict, _ in records],
+            [layer_path for _, layer_path in records],
+        )
+
+    def query_esri_server(self, url, parent_type=None, path_prefix="") -> bool:
         """
-        Recursively query ESRI server.
+        Recursively query ESRI server, one request at a time. Layers are recorded in
+        self.layers / self.layer_paths; only the responses along the current branch
+        are held while crawling.
 
         Args:
             url: Service URL to query
@@ -103,104 +357,338 @@ class LoadEsriAsync(QgsTask):
             path_prefix: Current path in hierarchy (e.g., "Folder A/Folder B")
 
         Returns:
-            Dict of discovered resources at this level
+            Whether the resource could be fetched
         """
-        folders_to_exclude = [
-            "Basemap",
-            "Utilities",
-            "Thematic_Map",
-            "TEST_DXF2GDB_SERVICE",
-            "temp",
-            "PrintLayouts",
-            "DIONYSIS",
-        ]
-
         response = self._get(url)
         if response is None:
-            return None
-
-        # Initialize the dictionary for this level of the directory
-        service_layers = dict()
+            if url != self.url:
+                records = self._previous_records(url)
+                for layer_dict, layer_path in records:
+                    self._append_layer(layer_dict, layer_path)
+                self._emit_batch(records)
+            return False
 
-        # Add any services at this level of the directory to the dictionary
+        # Crawl any services at this level of the directory
         for service in response.get("services", list()):
             service_name = service["name"].split("/")[-1]
             service_type = service["type"]
             service_url = f"{url}/{service_name}/{service_type}"
             service_path = f"{path_prefix}/{service_name}" if path_prefix else service_name
+            self.query_esri_server(service_url, service_type, service_path)
 
-            _service_layers = self.query_esri_server(service_url, service_type, service_path)
-            if not _service_layers:
-                continue
-            service_layers.update(_service_layers)
-
-            service_layers[service_name] = {
-                "name": service_name,
-                "type": service_type,
-                "url": service_url,
-                "layers": service_layers,
-            }
-
-        # Recursively add any subdirectories and layers to the dictionary
+        # Recursively crawl any subdirectories
         for folder in response.get("folders", list()):
-            if folder in folders_to_exclude:
+            if folder in ESRI_FOLDERS_TO_EXCLUDE:
                 continue
             folder_url = f"{url}/{folder}"
             folder_path = f"{path_prefix}/{folder}" if path_prefix else folder
-            folder_dict = self.query_esri_server(folder_url, folder, folder_path)
-            if folder_dict:
-                service_layers[folder] = folder_dict
+            self.query_esri_server(folder_url, folder, folder_path)
+
+        # Record the layers of this service, reusing those of unchanged services
+        self._reuse_unchanged_service(url, response)
+        layers = response.get("layers", list())
+        missing = [layer for layer in layers if f"{url}/{int(layer['id'])}" not in self._reused_layers]
+
+        definitions = None
+        if missing and self._uses_layer_batch(parent_type, response):
+            definitions = self._get_layer_definitions(url)
+
+        records = []
+        for layer in layers:
+            reused = self._reused_layers.pop(f"{url}/{int(layer['id'])}", None)
+            if reused is not None:
+                layer_dict, layer_path = reused
+            else:
+                layer_attributes = (definitions or {}).get(int(layer["id"]))
+                if layer_attributes is None:
+                    layer_attributes = self._get(f"{url}/{int(layer['id'])}")
+                layer_dict, layer_path = self._layer_record(
+                    layer, url, parent_type, path_prefix, layer_attributes
+                )
+            self._append_layer(layer_dict, layer_path)
+            records.append((layer_dict, layer_path))
 
-        # Add any layers for this service to the dictionary
-        for layer in response.get("layers", list()):
-            layer_id = int(layer["id"])
-            layer_name = layer["name"]
-            layer_url = f"{url}/{layer_id}"
+        self._emit_batch(records)
 
-            layer_attributes = self._get(layer_url)
+        return True
 
-            try:
-                _filtered_attrs = filter_esri_attributes(layer_attributes)
-                _cleaned_attrs = clean_esri_attributes(_filtered_attrs)
+    def _fetch_node(self, node: _CrawlNode) -> Optional[Dict]:
+        """Worker: request a crawl node."""
+        if self.isCanceled():
+            return None
 
-            except Exception as e:
-                self.exception = e
-                QgsMessageLog.logMessage(
-                    f"[ESRIService/Loader] Tried to clean fields for layer {layer_name} but failed: {e}",
-                    LOGGER_CATEGORY,
-                    Qgis.Warning,
+        if node.kind == _CrawlNode.LAYER_BATCH:
+            return self._get_layer_definitions(node.url)
+        return self._get(node.url)
+
+    def _resolve_layer(self, layer_node: _CrawlNode) -> None:
+        """Build the record of a fetched layer, publish its service once all its layers are in."""
+        service = layer_node.parent
+        if layer_node.record is None:
+            layer_node.record = self._layer_record(
+                layer_node.layer,
+                service.url,
+                layer_node.parent_type,
+                layer_node.path_prefix,
+                layer_node.response,
+            )
+            # The cleaned record is all that is kept of the definition
+            layer_node.response = None
+        if layer_node.record[0]["attributes"]:
+            # Layers without a definition (failed requests) are retried on resume
+            self._checkpoint_layers[layer_node.url] = list(layer_node.record)
+
+        service.pending_layers -= 1
+        if service.pending_layers == 0:
+            self._emit_batch(
+                [child.record for child in service.children if child.kind == _CrawlNode.LAYER]
+            )
+
+    def _process_node(self, node: _CrawlNode) -> List[_CrawlNode]:
+        """
+        Handle a fetched node. Resources get their child nodes, in the same order the
+        serial crawler visits them: services, folders, then layers.
+
+        Returns:
+            The nodes that still need to be requested
+        """
+        if node.kind == _CrawlNode.LAYER:
+            self._resolve_layer(node)
+            return []
+
+        if node.kind == _CrawlNode.LAYER_BATCH:
+            # Fill layer definitions from the batch, request the rest one by one
+            definitions = node.response or {}
+            missing = []
+            for layer_node in node.children:
+                layer_node.response = definitions.get(int(layer_node.layer["id"]))
+                if layer_node.response is None:
+                    missing.append(layer_node)
+                else:
+                    self._resolve_layer(layer_node)
+            return missing
+
+        if node.response is None:
+            if node.url != self.url:
+                self._emit_batch(self._previous_records(node.url))
+            return []
+
+        url = node.url
+        path_prefix = node.path_prefix
+        self._reuse_unchanged_service(url, node.response)
+
+        for service in node.response.get("services", list()):
+            service_name = service["name"].split("/")[-1]
+            service_type = service["type"]
+            node.children.append(
+                _CrawlNode(
+                    f"{url}/{service_name}/{service_type}",
+                    _CrawlNode.RESOURCE,
+                    parent_type=service_type,
+                    path_prefix=f"{path_prefix}/{service_name}" if path_prefix else service_name,
                 )
+            )
 
-            service_layers[layer_id] = {
-                "id": layer_id,
-                "name": layer_name,
-                "url": layer_url,
-                "type": parent_type,
-                "attributes": _cleaned_attrs,
-                "geometryType": _cleaned_attrs.get("geometryType", None),
-                "extent": _cleaned_attrs.get("extent", None),
-            }
+        for folder in node.response.get("folders", list()):
+            if folder in ESRI_FOLDERS_TO_EXCLUDE:
+                continue
+            node.children.append(
+                _CrawlNode(
+                    f"{url}/{folder}",
+                    _CrawlNode.RESOURCE,
+                    parent_type=folder,
+                    path_prefix=f"{path_prefix}/{folder}" if path_prefix else folder,
+                )
+            )
 
-            layer_dict = {
-                "id": layer_id,
-                "name": layer_name,
-                "url": layer_url,
-                "type": parent_type,
-                "attributes": _cleaned_attrs,
-                "geometryType": _cleaned_attrs.get("geometryType", None),
-                "extent": _cleaned_attrs.get("extent", None),
-            }
+        layer_nodes = [
+            _CrawlNode(
+                f"{url}/{int(layer['id'])}",
+                _CrawlNode.LAYER,
+                parent_type=node.parent_type,
+                path_prefix=path_prefix,
+                layer=layer,
+                parent=node,
+            )
+            for layer in node.response.get("layers", list())
+        ]
+        resource_nodes = list(node.children)
+        node.children.extend(layer_nodes)
+        node.pending_layers = len(layer_nodes)
 
-            self.layers.append(layer_dict)
-            
-            # Track the path for this layer to rebuild hierarchy later
-            layer_path = f"{path_prefix}/{layer_name}" if path_prefix else layer_name
-            self.layer_paths[layer_id] = layer_path
+        # Layers finished by an interrupted crawl, or unchanged since the previous one, are not requested again
+        layer_nodes = [n for n in layer_nodes if not self._restore_layer(n)]
+        if not layer_nodes:
+            return resource_nodes
 
-        return service_layers
+        if self._uses_layer_batch(node.parent_type, node.response):
+            batch = _CrawlNode(url, _CrawlNode.LAYER_BATCH, parent_type=node.parent_type)
+            batch.children = layer_nodes
+            return resource_nodes + [batch]
+
+        return resource_nodes + layer_nodes
+
+    def _load_checkpoint(self, url) -> None:
+        self._checkpoint_started_at = int(time.time())
+
+        # A full (non-delta) crawl is a manual refresh: nothing is reused, not even checkpoints
+        checkpoint = load_crawl_checkpoint(url) if self.resume and self.delta else None
+        if not checkpoint:
+            return
+
+        self._checkpoint_started_at = checkpoint.get("started_at") or checkpoint.get("saved_at")
+        self._checkpoint_resources = dict(checkpoint.get("resources") or {})
+        self._checkpoint_layers = dict(checkpoint.get("layers") or {})
+        QgsMessageLog.logMessage(
+            f"[ESRIService/Loader] Resuming crawl of {url}: {len(self._checkpoint_resources)} resources "
+            f"and {len(self._checkpoint_layers)} layers already fetched",
+            LOGGER_CATEGORY,
+            Qgis.Info,
+        )
+
+    def _save_checkpoint(self, url, frontier: List[_CrawlNode]) -> None:
+        if not self.resume:
+            return
+        try:
+            save_crawl_checkpoint(
+                url,
+                {
+                    "frontier": [node.url for node in frontier if node.kind == _CrawlNode.RESOURCE],
+                    "resources": self._checkpoint_resources,
+                    "layers": self._checkpoint_layers,
+                },
+                started_at=self._checkpoint_started_at,
+            )
+            self._checkpoint_saved_at = time.time()
+        except Exception as e:
+            QgsMessageLog.logMessage(
+                f"[ESRIService/Loader] Could not save crawl checkpoint for {url}: {e}",
+                LOGGER_CATEGORY,
+                Qgis.Warning,
+            )
+
+    def _checkpoint_resource(self, node: _CrawlNode) -> None:
+        """Remember the listing of a fetched resource, trimmed to what the crawl needs."""
+        if node.kind != _CrawlNode.RESOURCE or node.response is None:
+            return
+        listing = {
+            "services": node.response.get("services", list()),
+            "folders": node.response.get("folders", list()),
+            "layers": [
+                {"id": layer["id"], "name": layer["name"]}
+                for layer in node.response.get("layers", list())
+            ],
+        }
+        if node.url in self.service_fingerprints:
+            listing["fingerprint"] = self.service_fingerprints[node.url]
+        self._checkpoint_resources[node.url] = listing
+
+    def _restore_resource(self, node: _CrawlNode) -> bool:
+        listing = self._checkpoint_resources.get(node.url)
+        if node.kind != _CrawlNode.RESOURCE or listing is None:
+            return False
+        node.response = listing
+        return True
+
+    def _restore_layer(self, layer_node: _CrawlNode) -> bool:
+        record = self._checkpoint_layers.get(layer_node.url) or self._reused_layers.pop(
+            layer_node.url, None
+        )
+        if record is None:
+            return False
+        layer_node.record = tuple(record)
+        self._resolve_layer(layer_node)
+        return True
+
+    def _collect(self, node: _CrawlNode) -> None:
+        """Replay a completed crawl tree depth-first, in serial crawl order."""
+        for child in node.children:
+            if child.kind == _CrawlNode.LAYER:
+                self._append_layer(*child.record)
+            elif child.response is not None:
+                self._collect(child)
+            else:
+                for record in self._previous_records(child.url):
+                    self._append_layer(*record)
+
+    def crawl_esri_server(self, url) -> bool:
+        """
+        Crawl an ESRI server concurrently. Folder, service and layer requests run on
+        a bounded worker pool (throttled per host by the adaptive host limiter),
+        while this thread schedules newly discovered children as responses arrive.
+
+        The frontier and finished results are checkpointed periodically, and whenever
+        the crawl is cancelled or interrupted, so the next crawl of the same URL resumes
+        there. A crawl that runs to completion removes its checkpoint, even if some of its
+        requests failed: those are retried by the next crawl, which also sees what changed.
+
+        Args:
+            url: The ArcGIS REST services directory
+
+        Returns:
+            Whether the crawl completed (False if the root request failed or the task was cancelled)
+        """
+        root = _CrawlNode(url, _CrawlNode.RESOURCE)
+        self._load_checkpoint(url)
+        self._checkpoint_saved_at = time.time()
+
+        ready = [root]
+        pending = dict()
+        completed = False
+
+        try:
+            with ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="grdata-esri"
+            ) as executor:
+                while ready or pending:
+                    if self.isCanceled():
+                        for future in pending:
+                            future.cancel()
+                        return False
+
+                    while ready:
+                        node = ready.pop()
+                        if self._restore_resource(node):
+                            ready.extend(self._process_node(node))
+                        else:
+                            pending[executor.submit(self._fetch_node, node)] = node
+
+                    if not pending:
+                        break
+
+                    done, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        node = pending.pop(future)
+                        node.response = future.result()
+                        ready.extend(self._process_node(node))
+                        self._checkpoint_resource(node)
+
+                        # Only keep the trimmed listing of a resource, not its full response
+                        if node.kind == _CrawlNode.RESOURCE and node.response is not None:
+                            node.response = self._checkpoint_resources[node.url]
+
+                    if time.time() - self._checkpoint_saved_at > ESRI_CRAWL_CHECKPOINT_INTERVAL:
+                        self._save_checkpoint(url, ready + list(pending.values()))
+
+            completed = True
+        finally:
+            if completed:
+                clear_crawl_checkpoint(url)
+            else:
+                self._save_checkpoint(url, ready + list(pending.values()))
+
+        if root.response is None:
+            return False
+
+        # Replay into the flat records, the crawl tree is released on return
+        self._collect(root)
+        return True
 
     def run(self):
-        self.capabilities = self.query_esri_server(self.url)
+        if self.concurrent:
+            self.crawl_esri_server(self.url)
+        else:
+            self.query_esri_server(self.url)
         if self.isCanceled():
             return False
         return True
@@ -229,6 +717,8 @@ class LoadEsriAsync(QgsTask):
             return
 
         # Error
+        # Emit what was collected so downstream service transitions out of LOADING.
+        self.loaded.emit(self.layers)
         QgsMessageLog.logMessage(
             f"[ESRIService/Loader] Error while loading {self.url} (ESRI server): {self.exception}.",
             LOGGER_CATEGORY,
@@ -270,34 +760,71 @@ class ESRIService(GrdService):
         attributes = layer.get("attributes") or {}
         return attributes.get("geometryType", layer.get("geometryType", None))
 
+    def _layerSource(self, layer: Layer) -> str:
+        # The MapServer/FeatureServer/... the layer belongs to
+        return layer.url.rpartition("/")[0]
+
+    def _layerHierarchy(self) -> Optional[LayerGroup]:
+        layer_paths = {layer.id: layer.path for layer in self.layers or [] if layer.path}
+        if not layer_paths:
+            return None
+        return build_hierarchy_from_flat_with_paths(self.layers, layer_paths)
+
+    def _previousServices(self) -> Dict[str, Dict]:
+        """
+        The current layers, grouped by ESRI service (in layer order) along with the
+        fingerprint of each service, in the shape LoadEsriAsync expects.
+        """
+        previous = dict()
+        for layer in self.layers or []:
+            service_url, _, layer_id = layer.url.rpartition("/")
+            if layer.path is None or not layer_id.isdigit():
+                continue
+
+            service = previous.setdefault(
+                service_url,
+                {"fingerprint": (self.fingerprints or {}).get(service_url), "layers": []},
+            )
+
+            layer_dict = {
+                "id": int(layer_id),
+                "name": layer.name,
+                "url": layer.url,
+                "type": service_url.rsplit("/", 1)[-1],
+                "attributes": layer.attributes,
+                "geometryType": layer.attributes.get("geometryType", None),
+                "extent": layer.extent,
+                "path": layer.path,
+            }
+            service["layers"].append((layer_dict, layer.path))
+
+        return previous
+
     def _getRemoteCapabilities(self) -> Dict:
-        self._current_esri_task = LoadEsriAsync(self.url)
+        # Scheduled refreshes only re-walk the services that changed. A manual refresh
+        # (which clears updated_at) crawls the whole server again. Either way, services
+        # that fail to load keep their previous layers.
+        self._current_esri_task = LoadEsriAsync(
+            self.url,
+            previous_services=self._previousServices(),
+            delta=self.updated_at is not None,
+        )
+        self._current_esri_task.batchLoaded.connect(self._appendLayers)
         self._current_esri_task.loaded.connect(self._on_esri_layers_loaded)
         self.tm.addTask(self._current_esri_task)
 
+    def _cancelRemoteConfig(self) -> None:
+        task = getattr(self, "_current_esri_task", None)
+        if task is None:
+            return
+        task.batchLoaded.disconnect(self._appendLayers)
+        task.loaded.disconnect(self._on_esri_layers_loaded)
+        task.cancel()
+        self._current_esri_task = None
+
     def _on_esri_layers_loaded(self, layers: List) -> None:
-        """Handler for ESRI layers loaded signal. Builds hierarchy and calls _setupLayers."""
-        # Build hierarchical structure from flat layers and layer_paths
-        hierarchy = None
-        if hasattr(self, "_current_esri_task") and self._current_esri_task:
-            layer_paths = self._current_esri_task.layer_paths
-            if layer_paths:
-                # Reconstruct Layer objects for hierarchy building
-                layer_objs = []
-                for layer_dict in layers:
-                    layer = Layer(
-                        idx=layer_dict.get("id", 0),
-                        url=layer_dict.get("url", ""),
-                        name=layer_dict.get("name", ""),
-                        # Use the normalized service data model, not raw ArcGIS type
-                        # (e.g. MapServer/FeatureServer), so geometry icon mapping works.
-                        data_model=self._layerDataModel(layer_dict),
-                        attributes=layer_dict.get("attributes", {}),
-                        geometry_type=self._layerGeometryType(layer_dict),
-                    )
-                    layer_objs.append(layer)
-
-                hierarchy = build_hierarchy_from_flat_with_paths(layer_objs, layer_paths)
-
-        # Call _setupLayers with both flat layers and hierarchy
-        self._setupLayers(layers, export_conf=True, layer_structure=hierarchy)
+        """Handler for ESRI layers loaded signal. Calls _setupLayers, which builds the hierarchy from the layer paths."""
+        if layers and hasattr(self, "_current_esri_task") and self._current_esri_task:
+            self.fingerprints = dict(self._current_esri_task.service_fingerprints)
+
+        self._setupLayers(layers, export_conf=True)
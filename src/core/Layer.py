@@ -30,6 +30,7 @@ class Layer:
         data_model: DataModel,
         attributes=None,
         geometry_type=None,
+        path=None,
         **kwargs,
     ):
         self.id = idx
@@ -39,6 +40,7 @@ class Layer:
         self.attributes = attributes or {}
         self.geometryType = self.__setupGeometry(geometry_type)
         self.extent = self.attributes.get("extent", None)
+        self.path = path  # Position in the upstream hierarchy, e.g. "Folder/Service/Layer"
 
     def __str__(self) -> str:
         return self.name
@@ -157,6 +159,7 @@ class Layer:
             "type": self.type,
             "geometry_type": self.geometryType,
             "attributes": self.attributes,
+            "path": self.path,
         }
 
     def __setupGeometry(self, geom_type) -> str:
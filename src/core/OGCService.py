@@ -1,17 +1,43 @@
 import time
-from typing import Dict, List, Optional, Union
-from urllib.parse import parse_qs, unquote, urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import parse_qs, quote, unquote, urlparse
 
 import requests
 from qgis.core import Qgis, QgsApplication, QgsMessageLog, QgsTask
 from qgis.PyQt.QtCore import pyqtSignal
 
+from ..sub.capabilities_parser import (CURRENT_UPDATE_SEQUENCE,
+                                      CapabilitiesParser, parse_capabilities,
+                                      parse_feature_type_geometries)
 from ..sub.logger import LOGGER_CATEGORY
-from ..sub.xml import xmltodict
+from ..sub.ogc_sections import record_sections_outcome, request_sections
+from ..sub.retry import resilient_get
+from ..sub.tls_hosts import record_tls_outcome, verify_tls
 from .Layer import DataModel, Layer
 from .layer_hierarchy import LayerGroup
 from .Service import GrdService
 
+# Bytes read from a capabilities response at a time while it is parsed
+CAPABILITIES_CHUNK_SIZE = 65536
+
+# Longest DescribeFeatureType URL, typenames are split over as many requests as needed
+DESCRIBE_FEATURE_TYPE_MAX_URL_LENGTH = 2000
+
+# GetCapabilities sections the loader reads (OWS Common `sections` parameter); the document
+# element and its updateSequence are always returned
+CAPABILITIES_SECTIONS = {
+    "WFS": ("FeatureTypeList",),
+    "WMS": ("Capability",),
+}
+
+# Sections a server honouring the `sections` parameter leaves out. Other sections may be
+# returned regardless, e.g. the Filter_Capabilities WFS 1.1 requires in every document.
+OMITTED_SECTIONS = {
+    "WFS": ("ServiceIdentification", "ServiceProvider", "OperationsMetadata"),
+    "WMS": ("Service",),
+}
+
 
 def clean_OGC_attributes(layer_attributes: Dict[str, str]) -> None:
     """
@@ -60,63 +86,81 @@ def filter_OGC_attributes(attributes: Dict[str, str]) -> Dict[str, str]:
     }
 
 
-def bbox_from_corners(bbox) -> str:
+def extent_from_bbox(bbox) -> Optional[Dict]:
     """
-    Convert WFS repr :
-    <ows:LowerCorner>20.786230268362047 36.20732655645524</ows:LowerCorner>
-    <ows:UpperCorner>28.15668655964659 41.55731605723071</ows:UpperCorner>
+    Convert a WGS84 bounding box parsed from the capabilities, e.g.
+    (20.786230268362047, 36.20732655645524, 28.15668655964659, 41.55731605723071)
 
     to:
     "spatialReference": {
         "wkid": 4326
     },
-    "xmax": 23.348496228518172,
-    "xmin": 23.236629377543807,
-    "ymax": 39.03960686276656,
-    "ymin": 38.990246073097865
+    "xmax": 28.15668655964659,
+    "xmin": 20.786230268362047,
+    "ymax": 41.55731605723071,
+    "ymin": 36.20732655645524
     """
-
-    lower_corner = bbox.get("ows:LowerCorner", None)
-    upper_corner = bbox.get("ows:UpperCorner", None)
-
-    if lower_corner is None or upper_corner is None:
+    if bbox is None:
         return None
 
-    lower_corner = [float(x) for x in lower_corner.split()]
-    upper_corner = [float(x) for x in upper_corner.split()]
-
+    xmin, ymin, xmax, ymax = bbox
     return {
-        "xmin": lower_corner[0],
-        "xmax": upper_corner[0],
-        "ymin": lower_corner[1],
-        "ymax": upper_corner[1],
+        "xmin": xmin,
+        "xmax": xmax,
+        "ymin": ymin,
+        "ymax": ymax,
         "spatialReference": {"wkid": 4326},
     }
 
 
 class LoadOGCAsync(QgsTask):
     """
-    Asynchronously query an ArcGIS server for available services, using a QgsTask
+    Asynchronously query an OGC server for available layers, using a QgsTask.
+
+    `batchLoaded` publishes the layers of each capabilities document (WFS, WMS) as
+    soon as it is parsed (WFS layers before their DescribeFeatureType geometry types
+    are known), `loaded` publishes the full layer list at the end.
+
+    Args:
+        url: The OGC service endpoint
+        describe_feature_types: Read the exact geometry type of the WFS layers with
+            batched DescribeFeatureType requests, instead of guessing it from their names
+        previous_endpoints: Maps "wfs"/"wms" -> {"update_sequence", "layers"} of a previous
+            load. Endpoints that fail to load keep these layers.
+        delta: Send the previous updateSequence, and reuse the previous layers of the
+            endpoints whose server answers that the document is current
     """
 
     loaded = pyqtSignal(list)
+    batchLoaded = pyqtSignal(list, list)  # layer dicts, their hierarchy paths (none for OGC)
 
-    def __init__(self, url):
+    def __init__(self, url, describe_feature_types=True, previous_endpoints=None, delta=True):
         super().__init__(f"Loading from {url} (OGC server)", QgsTask.CanCancel)
 
         self.url = url
+        self.describe_feature_types = describe_feature_types
+        self.previous_endpoints = previous_endpoints or dict()
+        self.delta = delta
+        self.update_sequences = dict()  # "wfs"/"wms" -> updateSequence of the loaded document
         self.capabilities = dict()
         self.layers = list()
         self.exception = None
 
     @staticmethod
-    def _as_list(value):
-        """Normalize xmltodict nodes to a list for safe iteration."""
-        if value is None:
-            return []
-        if isinstance(value, list):
-            return value
-        return [value]
+    def _named_layers(records):
+        """Flatten parsed capabilities records, keeping those with a Name (requestable layers)."""
+        for record in records:
+            if record["name"]:
+                yield record
+            yield from LoadOGCAsync._named_layers(record["layers"])
+
+    @staticmethod
+    def _parse_capabilities(response) -> CapabilitiesParser:
+        """Parse a (streamed) capabilities response while it downloads."""
+        try:
+            return parse_capabilities(response.iter_content(chunk_size=CAPABILITIES_CHUNK_SIZE))
+        finally:
+            response.close()
 
     def _infer_wfs_geometry_from_layer(self, layer: Dict[str, str]) -> Optional[str]:
         """
@@ -148,17 +192,19 @@ class LoadOGCAsync(QgsTask):
         return None
 
     def _request_capabilities(self, url, payload, service_label):
-        """Request OGC capabilities with a one-time SSL-verification fallback."""
-        base_kwargs = {
-            "params": payload,
-            "headers": {"user-agent": "grdata-qgis-plugin/1.0.0"},
-            "timeout": 10,
-            "allow_redirects": True,
-            "cookies": None,
-        }
+        """
+        Request OGC capabilities (retried on transient failures) with an SSL-verification
+        fallback. Hosts whose certificate failed verification are remembered for a while
+        (sub/tls_hosts.py), later requests to them skip verification right away.
+        """
+        if not verify_tls(url):
+            response = resilient_get(url, params=payload, verify=False, stream=True, is_cancelled=self.isCanceled)
+            response.raise_for_status()
+            return response
 
         try:
-            response = requests.get(url, **base_kwargs)
+            response = resilient_get(url, params=payload, stream=True, is_cancelled=self.isCanceled)
+            record_tls_outcome(url, verified=True)
             response.raise_for_status()
             return response
         except requests.exceptions.SSLError as err:
@@ -167,26 +213,65 @@ class LoadOGCAsync(QgsTask):
                 LOGGER_CATEGORY,
                 Qgis.Warning,
             )
-            response = requests.get(url, verify=False, **base_kwargs)
+            record_tls_outcome(url, verified=False)
+            response = resilient_get(url, params=payload, verify=False, stream=True, is_cancelled=self.isCanceled)
             response.raise_for_status()
             return response
 
-    def _get_wfs(self, url):
+    def _get_capabilities(
+        self, url, service, update_sequence=None, sections=True
+    ) -> Optional[CapabilitiesParser]:
+        """
+        Request and parse the GetCapabilities document of an OGC service.
+
+        Only the CAPABILITIES_SECTIONS the loader reads are requested. Servers that reject
+        or ignore the `sections` parameter are asked for the full document, and that
+        endpoint is requested in full for a while (sub/ogc_sections.py).
+
+        Args:
+            url: The OGC service endpoint
+            service: "WFS" or "WMS"
+            update_sequence: updateSequence of the document we already have. The server
+                may then answer that it is current instead of sending it again.
+            sections: Request only the sections the loader reads (unless the endpoint
+                is known not to support it)
+
+        Returns:
+            The finished parser (`current` tells whether the document is unchanged),
+            or None if the request or parsing failed
+        """
         url = url.rstrip("/")
+        endpoint = f"{url}?service={service}"
+        requested_sections = CAPABILITIES_SECTIONS[service] if sections and request_sections(endpoint) else None
+
+        payload = {"request": "GetCapabilities", "service": service}
+        if requested_sections:
+            payload["sections"] = ",".join(requested_sections)
+        if update_sequence is not None:
+            payload["updateSequence"] = update_sequence
 
         try:
-            payload = {"request": "GetCapabilities", "service": "WFS"}
-            response = self._request_capabilities(url, payload, "WFS")
-
-            service_dict = xmltodict.parse(response.content)
-            capabilities = service_dict.get("wfs:WFS_Capabilities", {})
-            feature_type_list = capabilities.get("FeatureTypeList", {})
-            services = feature_type_list.get("FeatureType")
-            return self._as_list(services)
+            response = self._request_capabilities(url, payload, service)
+
+            # OWS Common maps CurrentUpdateSequence to 304 Not Modified
+            if response.status_code == 304 and update_sequence is not None:
+                response.close()
+                parser = CapabilitiesParser()
+                parser.exception_code = CURRENT_UPDATE_SEQUENCE
+                return parser
+
+            parser = self._parse_capabilities(response)
         except requests.exceptions.RequestException as e:
+            if isinstance(e, requests.exceptions.HTTPError):
+                # Servers rejecting the updateSequence (e.g. InvalidUpdateSequence) or the sections.
+                # The updateSequence is dropped first, so it cannot get the sections blamed.
+                if update_sequence is not None:
+                    return self._get_capabilities(url, service, sections=sections)
+                if requested_sections:
+                    return self._full_capabilities(url, service, update_sequence, endpoint)
             self.exception = e
             QgsMessageLog.logMessage(
-                f"[OGCService/Loader] WFS capabilities request failed for {url}: {e}",
+                f"[OGCService/Loader] {service} capabilities request failed for {url}: {e}",
                 LOGGER_CATEGORY,
                 Qgis.Warning,
             )
@@ -194,70 +279,131 @@ class LoadOGCAsync(QgsTask):
         except Exception as e:
             self.exception = e
             QgsMessageLog.logMessage(
-                f"[OGCService/Loader] WFS capabilities parse failed for {url}: {e}",
+                f"[OGCService/Loader] {service} capabilities parse failed for {url}: {e}",
                 LOGGER_CATEGORY,
                 Qgis.Warning,
             )
             return None
 
-    def _get_wms(self, url):
-        url = url.rstrip("/")
-        try:
-            payload = {"request": "GetCapabilities", "service": "WMS"}
-            response = self._request_capabilities(url, payload, "WMS")
-
-            service_dict = xmltodict.parse(response.content)
-            capabilities = service_dict.get("WMS_Capabilities", {})
-            capability = capabilities.get("Capability", {})
-            services = capability.get("Layer")
-            return self._as_list(services)
-        except requests.exceptions.RequestException as e:
-            self.exception = e
-            QgsMessageLog.logMessage(
-                f"[OGCService/Loader] WMS capabilities request failed for {url}: {e}",
-                LOGGER_CATEGORY,
-                Qgis.Warning,
-            )
-            return None
-        except Exception as e:
-            self.exception = e
-            QgsMessageLog.logMessage(
-                f"[OGCService/Loader] WMS capabilities parse failed for {url}: {e}",
-                LOGGER_CATEGORY,
-                Qgis.Warning,
+        if parser.exception_code and not parser.current:
+            if requested_sections and parser.rejects_sections:
+                return self._full_capabilities(url, service, update_sequence, endpoint)
+            if update_sequence is not None:
+                # E.g. InvalidUpdateSequence: ask again without it before suspecting the sections
+                return self._get_capabilities(url, service, sections=sections)
+            if requested_sections:
+                return self._full_capabilities(url, service, update_sequence, endpoint)
+
+        if requested_sections and not parser.current:
+            # Servers ignoring the parameter send the sections that were not asked for
+            record_sections_outcome(
+                endpoint, supported=not set(parser.sections) & set(OMITTED_SECTIONS[service])
             )
-            return None
 
-    def query_OGC_server(self, url) -> Dict[str, Dict[str, str]]:
+        return parser
 
-        wfs_resp = self._get_wfs(url)
-        wms_resp = self._get_wms(url)
+    def _full_capabilities(self, url, service, update_sequence, endpoint) -> Optional[CapabilitiesParser]:
+        """Fall back to the full GetCapabilities document of an endpoint that rejected `sections`."""
+        QgsMessageLog.logMessage(
+            f"[OGCService/Loader] {service} server rejected the sections parameter for {url}; requesting the full capabilities",
+            LOGGER_CATEGORY,
+            Qgis.Info,
+        )
+        record_sections_outcome(endpoint, supported=False)
+        return self._get_capabilities(url, service, update_sequence, sections=False)
 
-        if wfs_resp is None and wms_resp is None:
-            return None
+    def _describe_feature_type_chunks(self, url, type_names) -> List[List[str]]:
+        """
+        Group typenames for DescribeFeatureType requests: one namespace prefix per request
+        (so servers describe them inline instead of importing other schemas), and no
+        request URL longer than DESCRIBE_FEATURE_TYPE_MAX_URL_LENGTH.
+        """
+        base_length = len(url) + len("?service=WFS&request=DescribeFeatureType&version=1.1.0&typeName=")
+
+        by_prefix = dict()
+        for type_name in type_names:
+            prefix = type_name.split(":", 1)[0] if ":" in type_name else ""
+            by_prefix.setdefault(prefix, []).append(type_name)
+
+        chunks = []
+        for names in by_prefix.values():
+            chunk, length = [], base_length
+            for name in names:
+                name_length = len(quote(name)) + 3  # Separating comma, encoded as %2C
+                if chunk and length + name_length > DESCRIBE_FEATURE_TYPE_MAX_URL_LENGTH:
+                    chunks.append(chunk)
+                    chunk, length = [], base_length
+                chunk.append(name)
+                length += name_length
+            if chunk:
+                chunks.append(chunk)
+        return chunks
+
+    def _get_feature_type_geometries(self, url, type_names) -> Dict[str, str]:
+        """
+        Request the schemas of many WFS feature types at once with DescribeFeatureType.
 
-        # Add any services at this level of the directory to the dictionary
-        for idx, layer in enumerate(wfs_resp or []):
-            if not isinstance(layer, dict):
+        Returns:
+            Dict mapping typename -> geometry type (e.g. "MultiPolygon"), for the feature types
+            with a known geometry. Chunks that fail are skipped.
+        """
+        url = url.rstrip("/")
+        geometries = dict()
+
+        for chunk in self._describe_feature_type_chunks(url, type_names):
+            if self.isCanceled():
+                break
+
+            payload = {
+                "service": "WFS",
+                "request": "DescribeFeatureType",
+                "version": "1.1.0",
+                "typeName": ",".join(chunk),
+            }
+            try:
+                response = self._request_capabilities(url, payload, "WFS DescribeFeatureType")
+                chunk_geometries = parse_feature_type_geometries(
+                    response.iter_content(chunk_size=CAPABILITIES_CHUNK_SIZE)
+                )
+                response.close()
+            except Exception as e:
+                QgsMessageLog.logMessage(
+                    f"[OGCService/Loader] DescribeFeatureType failed for {len(chunk)} layers of {url}: {e}",
+                    LOGGER_CATEGORY,
+                    Qgis.Warning,
+                )
                 continue
 
-            type_name = layer.get("Name")
-            if not type_name:
-                continue
+            for type_name in chunk:
+                geometry = chunk_geometries.get(type_name.split(":", 1)[-1])
+                if geometry is not None:
+                    geometries[type_name] = geometry
+
+        return geometries
 
-            self.layers.append(
+    def _emit_batch(self, layers: List[Dict]) -> None:
+        """Publish the layers of a parsed capabilities document while loading goes on."""
+        if not layers:
+            return
+        self.batchLoaded.emit([dict(layer) for layer in layers], [])
+
+    def _wfs_layers(self, url, feature_types) -> List[Dict]:
+        """Layer entries of the parsed WFS FeatureTypes."""
+        layers = []
+        for idx, layer in enumerate(feature_types or []):
+            type_name = layer["name"]
+
+            layers.append(
                 {
                     "id": idx,
-                    "name": layer.get("Title", type_name),
+                    "name": layer["title"] or type_name,
                     "url": f"{url}?typename={type_name}",
                     "type": "wfs",
                     "attributes": {
-                        "crs": layer.get("DefaultCRS", None),
-                        "title": layer.get("Title", None),
-                        "description": layer.get("Abstract", None),
-                        "extent": bbox_from_corners(
-                            layer.get("ows:WGS84BoundingBox", None)
-                        ),
+                        "crs": layer["crs"],
+                        "title": layer["title"],
+                        "description": layer["abstract"],
+                        "extent": extent_from_bbox(layer["bbox"]),
                     },
                     "geometryType": self._infer_wfs_geometry_from_layer(
                         {
@@ -267,34 +413,116 @@ class LoadOGCAsync(QgsTask):
                     ),
                 }
             )
+        return layers
 
-        for idx, layer in enumerate(wms_resp or []):
-            if not isinstance(layer, dict):
-                continue
-
-            # Some WMS capabilities include group layers without Name; skip those.
-            layer_name = layer.get("Name")
-            if not layer_name:
-                continue
+    def _load_endpoint(self, url, service) -> Tuple[Optional[List[Dict]], Optional[CapabilitiesParser]]:
+        """
+        Request the capabilities of an endpoint, sending the updateSequence of the previous load.
 
-            self.layers.append(
+        Returns:
+            (layers, None) when the previous layers are reused (the document is current, or the
+            request failed), otherwise (None, parser); (None, None) if the request failed
+            and there is nothing to reuse
+        """
+        previous = self.previous_endpoints.get(service.lower()) or dict()
+        previous_layers = previous.get("layers")
+        update_sequence = previous.get("update_sequence") if self.delta and previous_layers else None
+
+        parser = self._get_capabilities(url, service, update_sequence)
+        if parser is not None and not parser.current:
+            self.update_sequences[service.lower()] = parser.update_sequence
+            return None, parser
+
+        if parser is None and not previous_layers:
+            return None, None
+
+        # Unchanged (or unreachable for now): keep the previous layers
+        self.update_sequences[service.lower()] = previous.get("update_sequence")
+        return [dict(layer) for layer in previous_layers], None
+
+    def _load_wfs(self, url) -> Optional[List[Dict]]:
+        """Worker: WFS layers, with their exact geometry type if describe_feature_types is set."""
+        previous_layers, parser = self._load_endpoint(url, "WFS")
+        if parser is None:
+            self._emit_batch(previous_layers)
+            return previous_layers
+
+        feature_types = list(self._named_layers(parser.records))
+        layers = self._wfs_layers(url, feature_types)
+        # Published with the geometry types guessed from their names: the DescribeFeatureType
+        # requests can take long on large servers, and the final layer list corrects them
+        self._emit_batch(layers)
+        if not self.describe_feature_types or not layers:
+            return layers
+
+        type_names = [feature_type["name"] for feature_type in feature_types]
+        geometries = self._get_feature_type_geometries(url, type_names)
+        for layer, type_name in zip(layers, type_names):
+            geometry = geometries.get(type_name)
+            if geometry is not None:
+                # New attributes: the published batch shares the previous ones
+                layer["geometryType"] = geometry
+                layer["attributes"] = {**layer["attributes"], "geometryType": geometry}
+
+        return layers
+
+    def _load_wms(self, url) -> Optional[List[Dict]]:
+        """Worker: WMS layers."""
+        previous_layers, parser = self._load_endpoint(url, "WMS")
+        if parser is None:
+            self._emit_batch(previous_layers)
+            return previous_layers
+
+        # Named layers at any depth of the WMS layer tree
+        layers = self._wms_layers(url, list(self._named_layers(parser.records)))
+        self._emit_batch(layers)
+        return layers
+
+    def _wms_layers(self, url, wms_layers) -> List[Dict]:
+        """Layer entries of the parsed WMS named layers."""
+        layers = []
+        for idx, layer in enumerate(wms_layers or []):
+            layer_name = layer["name"]
+
+            layers.append(
                 {
                     "id": idx,
-                    "name": layer.get("Title", layer_name),
+                    "name": layer["title"] or layer_name,
                     "url": f"{url}?typename={layer_name}",
                     "type": "wms",
                     "attributes": {
-                        "crs": layer.get("DefaultCRS", None),
-                        "title": layer.get("Title", None),
-                        "description": layer.get("Abstract", None),
-                        "extent": bbox_from_corners(
-                            layer.get("ows:WGS84BoundingBox", None)
-                        ),
+                        "crs": layer["crs"],
+                        "title": layer["title"],
+                        "description": layer["abstract"],
+                        "extent": extent_from_bbox(layer["bbox"]),
                     },
                     "geometryType": None,
                 }
             )
+        return layers
 
+    def query_OGC_server(self, url) -> Optional[List[Dict]]:
+        """
+        Request the WFS and WMS capabilities concurrently. The layers of each are
+        published as soon as they arrive; the final list has the WFS layers first.
+
+        Returns:
+            The layer entries, or None if neither capabilities document could be loaded
+        """
+        results = dict()
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="grdata-ogc") as executor:
+            futures = {
+                executor.submit(self._load_wfs, url): "wfs",
+                executor.submit(self._load_wms, url): "wms",
+            }
+            # The workers publish their own batches
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+
+        if results["wfs"] is None and results["wms"] is None:
+            return None
+
+        self.layers = (results["wfs"] or []) + (results["wms"] or [])
         return self.layers
 
     def run(self):
@@ -375,6 +603,36 @@ class OGCService(GrdService):
 
         return None
 
+    def _endpointSource(self, service: str) -> str:
+        return f"{self.url}?service={service.upper()}"
+
+    def _layerSource(self, layer: Layer) -> str:
+        # The GetCapabilities endpoint (WFS or WMS) the layer was listed by
+        return self._endpointSource(str(layer.type or ""))
+
+    def _previousEndpoints(self) -> Dict[str, Dict]:
+        """
+        The current layers, grouped by endpoint ("wfs"/"wms") along with the updateSequence
+        of each endpoint's capabilities, in the shape LoadOGCAsync expects.
+        """
+        previous = dict()
+        for layer in self.layers or []:
+            endpoint = previous.setdefault(
+                layer.type,
+                {"update_sequence": (self.fingerprints or {}).get(self._layerSource(layer)), "layers": []},
+            )
+            endpoint["layers"].append(
+                {
+                    "id": len(endpoint["layers"]),
+                    "name": layer.name,
+                    "url": layer.url,
+                    "type": layer.type,
+                    "attributes": layer.attributes,
+                    "geometryType": layer.attributes.get("geometryType", None),
+                }
+            )
+        return previous
+
     def _infer_wfs_geometry_from_layer(self, layer: Dict[str, str]) -> Optional[str]:
         """
         Best-effort geometry inference for WFS layers when explicit geometryType
@@ -420,12 +678,36 @@ class OGCService(GrdService):
         return None
 
     def _getRemoteCapabilities(self) -> Dict:
-        self._current_ogc_task = LoadOGCAsync(self.url)
+        # Scheduled refreshes send the stored updateSequences, a manual refresh (which
+        # clears updated_at) downloads everything again. Either way, an endpoint that
+        # fails to load keeps its previous layers.
+        self._current_ogc_task = LoadOGCAsync(
+            self.url,
+            previous_endpoints=self._previousEndpoints(),
+            delta=self.updated_at is not None,
+        )
+        self._current_ogc_task.batchLoaded.connect(self._appendLayers)
         self._current_ogc_task.loaded.connect(self._on_ogc_layers_loaded)
         self.tm.addTask(self._current_ogc_task)
 
+    def _cancelRemoteConfig(self) -> None:
+        task = getattr(self, "_current_ogc_task", None)
+        if task is None:
+            return
+        task.batchLoaded.disconnect(self._appendLayers)
+        task.loaded.disconnect(self._on_ogc_layers_loaded)
+        task.cancel()
+        self._current_ogc_task = None
+
     def _on_ogc_layers_loaded(self, layers: List) -> None:
         """Handler for OGC layers loaded signal. Calls _setupLayers (no hierarchy extraction yet)."""
+        if layers and hasattr(self, "_current_ogc_task") and self._current_ogc_task:
+            self.fingerprints = {
+                self._endpointSource(service): update_sequence
+                for service, update_sequence in self._current_ogc_task.update_sequences.items()
+                if update_sequence
+            }
+
         # OGC servers don't have clear hierarchy structure like ESRI, so we don't extract hierarchy
         # Fall back to flat rendering
         self._setupLayers(layers, export_conf=True, layer_structure=None)
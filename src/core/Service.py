@@ -1,10 +1,13 @@
 import time
 from typing import Dict, List, Optional, Union
 
+from qgis.core import Qgis, QgsMessageLog
 from qgis.PyQt.QtCore import QObject, pyqtSignal
 
 from ..sub.capabilities_cache import (load_capabilities_cache,
                                       save_capabilities_cache)
+from ..sub.logger import LOGGER_CATEGORY
+from ..sub.refresh_policy import record_refresh, service_ttl
 from .Layer import Layer
 from .layer_hierarchy import LayerGroup
 
@@ -43,6 +46,7 @@ class GrdService(QObject):
     """
 
     changed = pyqtSignal(str)
+    layersAdded = pyqtSignal(list, list)  # Layer objects, their hierarchy paths
 
     def __init__(
         self,
@@ -53,6 +57,7 @@ class GrdService(QObject):
         manager=None,
         config=None,
         loaded=False,
+        summary=None,
     ):
         super().__init__()
 
@@ -64,12 +69,20 @@ class GrdService(QObject):
         self.manager = manager
         self.config = config
         self.updated_at = None
-        self.layers = None
-        self.layer_structure = None  # Hierarchical layer representation
+        self.summary = summary  # Cached layer count / updated_at / geometry histogram
+        self._layers = None
+        self._layer_structure = None  # Hierarchical layer representation
+        self._layers_materialized = True  # Set to False while cached layers wait to be loaded
         self.capabilities = None
         self.available_layers = None
         self.icon = None
+        self.fingerprints = dict()  # Change fingerprints of the service's sources, for delta refreshes
+        self.refresh_history = list()  # Whether past refreshes changed the catalog, for the adaptive TTL
+        self.ttl_override = None  # Refresh interval set in services.json
         self.selectedLayer = None
+        self._streaming = False
+        self._revalidating = False  # A background refresh of expired layers is running
+        self._refreshing = False  # The running fetch replaces layers the service already had
 
         self.loaded = loaded
         self.state = GrdServiceState.LOADED if loaded else GrdServiceState.NOT_LOADED
@@ -78,34 +91,75 @@ class GrdService(QObject):
 
     def _loadConfig(self) -> None:
         """
-        Load static service metadata from services.json and dynamic capabilities/layers
-        from cache (.cache/capabilities).
+        Load static service metadata from services.json, and the summary of the cached
+        capabilities (.cache/capabilities.sqlite). The cached layers themselves are only
+        loaded the first time they are needed (see `layers`).
         """
         serviceConf = self.config or {}
         self.id = str(serviceConf.get("id", self.id) or "")
         self.icon = serviceConf.get("icon")
+        self.ttl_override = serviceConf.get("ttl")
+
+        if self.summary is None:
+            # Not given by the ServiceManager's index
+            cached = load_capabilities_cache(service_id=self.id, with_layers=False)
+            if cached is None:
+                return
+            self.summary = {
+                "updated_at": cached.get("updated_at"),
+                "layer_count": cached.get("layer_count", 0),
+                "geometry_counts": None,
+            }
+
+        self.updated_at = self.summary.get("updated_at")
+        if self.summary.get("layer_count"):
+            self._layers_materialized = False
+            self.loaded = True
+            self.state = GrdServiceState.LOADED
+
+    def _materializeLayers(self) -> None:
+        """Load the cached capabilities and layers, the first time they are needed."""
+        if self._layers_materialized:
+            return
+        self._layers_materialized = True
 
         cached = load_capabilities_cache(service_id=self.id)
-        if cached is not None:
-            self.updated_at = cached.get("updated_at")
-            self.capabilities = cached.get("capabilities")
-            self.available_layers = cached.get("available_layers")
-
-            # Load flat layer list
-            cached_layers = cached.get("layers")
-            if cached_layers:
-                self._setupLayers(cached_layers, export_conf=False)
-
-            # Load hierarchical layer structure if available
-            cached_layer_structure = cached.get("layer_structure")
-            if cached_layer_structure:
-                try:
-                    self.layer_structure = LayerGroup.from_dict(cached_layer_structure)
-                except Exception:
-                    # If deserialization fails, layer_structure stays None
-                    pass
+        if cached is None:
+            # Evicted from the cache since startup: fetch the layers again
+            self.loaded = False
+            self.state = GrdServiceState.NOT_LOADED
             return
 
+        self.capabilities = cached.get("capabilities")
+        self.available_layers = cached.get("available_layers")
+        self.fingerprints = cached.get("fingerprints") or dict()
+        self.refresh_history = cached.get("refresh_history") or list()
+
+        # The hierarchy is rebuilt from the layer paths
+        self._layers = [self._newLayer(i, layer) for i, layer in enumerate(cached.get("layers") or [])]
+        self._layer_structure = self._layerHierarchy()
+
+    @property
+    def layers(self) -> Optional[List[Layer]]:
+        """The layers of the service; cached layers are loaded on first access."""
+        self._materializeLayers()
+        return self._layers
+
+    @layers.setter
+    def layers(self, layers: Optional[List[Layer]]) -> None:
+        self._layers_materialized = True
+        self._layers = layers
+
+    @property
+    def layer_structure(self) -> Optional[LayerGroup]:
+        """The hierarchy of the layers, if the service has one."""
+        self._materializeLayers()
+        return self._layer_structure
+
+    @layer_structure.setter
+    def layer_structure(self, layer_structure: Optional[LayerGroup]) -> None:
+        self._layer_structure = layer_structure
+
     def __str__(self):
         return self.name
 
@@ -124,6 +178,33 @@ class GrdService(QObject):
     def _getRemoteCapabilities(self) -> Dict:
         raise NotImplementedError
 
+    def _cancelRemoteConfig(self) -> None:
+        """Cancel the running fetch; it must not deliver its layers any more."""
+        pass
+
+    def _layerSource(self, layer: Layer) -> str:
+        """
+        Returns the source a layer was fetched from (e.g. its ESRI service or OGC endpoint).
+        Layers are cached per source.
+        """
+        return self.url
+
+    def _layerHierarchy(self) -> Optional[LayerGroup]:
+        """
+        Returns the hierarchical structure of the current layers, if the service has one
+        """
+        return None
+
+    def _newLayer(self, idx: int, layer: Dict) -> Layer:
+        """Build a Layer from a layer dict, either fetched or cached (Layer.toJson)."""
+        fields = {k: v for k, v in layer.items() if k not in ("data_model", "geometry_type")}
+        return Layer(
+            idx=idx,
+            **fields,
+            data_model=self._layerDataModel(layer),
+            geometry_type=self._layerGeometryType(layer),
+        )
+
     def _setupLayers(self, available_layers, export_conf=True, layer_structure=None) -> None:
         """
         Setup the layers of the service, based on the available layers.
@@ -135,20 +216,40 @@ class GrdService(QObject):
         """
 
         lrs = available_layers if available_layers else []
-
-        self.layers = [
-            Layer(
-                idx=i,
-                **layer,
-                data_model=self._layerDataModel(layer),
-                geometry_type=self._layerGeometryType(layer),
-            )
-            for i, layer in enumerate(lrs)
-        ]
+        self._streaming = False
+
+        layers = [self._newLayer(i, layer) for i, layer in enumerate(lrs)]
+
+        unchanged = False
+        refreshing, self._refreshing = self._refreshing, False
+        if refreshing and layers and self.layers:
+            # A refresh of known layers: remember whether the catalog changed. (A first
+            # fetch compares with its own streamed batches, which is not a change.)
+            unchanged = [layer.toJson() for layer in layers] == [layer.toJson() for layer in self.layers]
+            self.refresh_history = record_refresh(self.refresh_history, changed=not unchanged)
+
+        revalidating, self._revalidating = self._revalidating, False
+        if revalidating:
+            if not layers:
+                # Keep serving the cached layers, they are retried once expired again
+                QgsMessageLog.logMessage(
+                    f"[GrdService] Background refresh of {self.name} failed; keeping the cached layers",
+                    LOGGER_CATEGORY,
+                    Qgis.Warning,
+                )
+                return
+
+            if unchanged:
+                # Unchanged catalog: the current layers (and the tree showing them) stay as they are
+                if export_conf:
+                    self.exportConfig()
+                return
+
+        self.layers = layers
 
         # Always refresh hierarchy state, so stale cached/grouped structures
         # cannot leak across service type changes or fetch cycles.
-        self.layer_structure = layer_structure
+        self.layer_structure = layer_structure or self._layerHierarchy()
 
         if len(self.layers) > 0:
             self.loaded = True
@@ -162,17 +263,71 @@ class GrdService(QObject):
             self.state = GrdServiceState.ERROR
             self.changed.emit(GrdServiceState.ERROR)
 
+    def _appendLayers(self, available_layers, layer_paths=None) -> None:
+        """
+        Append a batch of layers published by an in-progress fetch, so they can be
+        shown before the whole server has been crawled. Only used when the service had
+        no layers to show yet; the complete list replaces them in _setupLayers.
+
+        Args:
+            available_layers: List of layer dicts to convert to Layer objects
+            layer_paths: Hierarchy path of each layer, if the service has a hierarchy
+        """
+        if not self._streaming or self.state != GrdServiceState.LOADING:
+            return
+
+        if self.layers is None:
+            self.layers = []
+
+        start = len(self.layers)
+        new_layers = [self._newLayer(start + i, layer) for i, layer in enumerate(available_layers)]
+        self.layers.extend(new_layers)
+        self.layersAdded.emit(new_layers, list(layer_paths or []))
+
     def _fetchRemoteConfig(self) -> None:
         """
         Fetch the remote config of the service (e.g. GetCapabilities, ESRI capabilities, etc.)
         """
 
+        # A fetch is already running (e.g. a partially loaded layer was selected)
+        if self.state == GrdServiceState.LOADING:
+            return
+
+        if self._revalidating:
+            self._revalidating = False
+            if self.updated_at is not None:
+                # A background refresh is running: its result is the fetch, show its progress
+                self.state = GrdServiceState.LOADING
+                self.changed.emit(GrdServiceState.LOADING)
+                return
+
+            # A manual refresh (which clears updated_at) must not take over the background
+            # delta refresh, it fetches everything again
+            self._cancelRemoteConfig()
+
+        self._streaming = not self.layers
+        self._refreshing = not self._streaming
         self.state = GrdServiceState.LOADING
         self.changed.emit(GrdServiceState.LOADING)
 
         self._getRemoteCapabilities()
         self.updated_at = int(time.time())
 
+    def _revalidateRemoteConfig(self) -> None:
+        """
+        Refresh expired layers in the background (stale-while-revalidate): the cached
+        layers keep being served and the service stays LOADED. The service only
+        signals a change once the refreshed catalog turns out to differ.
+        """
+        if self.state == GrdServiceState.LOADING or self._revalidating:
+            return
+
+        self._revalidating = True
+        self._refreshing = True
+        self._streaming = False
+        self._getRemoteCapabilities()
+        self.updated_at = int(time.time())
+
     def setSelectedLayer(self, idx: int) -> None:
         if idx is None:
             self.selectedLayer = None
@@ -190,26 +345,30 @@ class GrdService(QObject):
 
     def __layersExpired(self) -> bool:
         """
-        The service's layers have not been updated recently (1 week)
-        and need to be refreshed from the server.
+        The service's layers are older than its refresh interval (adapted to how
+        often its catalog changed, see sub/refresh_policy.py) and need to be
+        refreshed from the server.
         """
-        MAX_AGE = 604800  # 1 week
-
         unix_time_now = int(time.time())
         if self.updated_at is None:
             return True
 
-        return unix_time_now - self.updated_at > MAX_AGE
+        return unix_time_now - self.updated_at > service_ttl(self.refresh_history, self.ttl_override)
 
     def getLayers(self) -> List[Layer]:
-        if not self.loaded or self.__layersExpired() or len(self.layers) == 0:
+        if not self.loaded or not self.layers:
             self._fetchRemoteConfig()
+        elif self.__layersExpired():
+            # Serve the cached layers now, refresh them in the background
+            self._revalidateRemoteConfig()
 
         return self.layers
 
     def getLayer(self, idx: int) -> Layer:
-        if not self.loaded or self.__layersExpired():
+        if not self.loaded or not self.layers:
             self._fetchRemoteConfig()
+        elif self.__layersExpired():
+            self._revalidateRemoteConfig()
 
         if idx >= len(self.layers):
             print(f"Layer with index {idx} does not exist.")
@@ -243,9 +402,35 @@ class GrdService(QObject):
             "capabilities": self.capabilities,
             "available_layers": self.available_layers,
             "icon": self.icon,
-            "layers": [layer.toJson() for layer in self.layers] if self.layers else [],
+            "fingerprints": self.fingerprints,
+            "refresh_history": self.refresh_history,
         }
-        # Include hierarchical structure if available
-        if self.layer_structure is not None:
-            payload["layer_structure"] = self.layer_structure.to_dict()
-        save_capabilities_cache(service_id=self.id, payload=payload)
+
+        geometry_counts = dict()
+        for layer in self.layers or []:
+            key = layer.geometryType or "unknown"
+            geometry_counts[key] = geometry_counts.get(key, 0) + 1
+        self.summary = {
+            "updated_at": self.updated_at,
+            "layer_count": len(self.layers or []),
+            "geometry_counts": geometry_counts,
+        }
+
+        # Layers are cached per source, so unchanged sources are not rewritten.
+        # The hierarchy is rebuilt from the layer paths when loading.
+        entries = dict()
+        for layer in self.layers or []:
+            entries.setdefault(self._layerSource(layer), []).append(layer.toJson())
+
+        # Written on the cache writer thread
+        future = save_capabilities_cache(service_id=self.id, payload=payload, entries=entries)
+        future.add_done_callback(self._onConfigExported)
+
+    def _onConfigExported(self, future) -> None:
+        # Runs on the cache writer thread
+        if future.exception() is not None:
+            QgsMessageLog.logMessage(
+                f"[GrdService] Failed to cache the capabilities of {self.name}: {future.exception()}",
+                LOGGER_CATEGORY,
+                Qgis.Warning,
+            )
@@ -3,13 +3,14 @@ from .OGCService import OGCService
 
 
 class ServiceFactory:
-    def __init__(self, serviceManager=None, serviceConf=None, **kwargs):
+    def __init__(self, serviceManager=None, serviceConf=None, summary=None, **kwargs):
         self.name = kwargs.get("name")
         self.id = kwargs.get("id")
         self.url = kwargs.get("url")
         self.data_model = kwargs.get("type")
         self.serviceManager = serviceManager
         self.serviceConf = serviceConf
+        self.summary = summary
 
     def new(self):
         """
@@ -23,6 +24,7 @@ class ServiceFactory:
                 service_id=self.id,
                 manager=self.serviceManager,
                 config=self.serviceConf,
+                summary=self.summary,
             )
 
         if self.data_model == "ogc":
@@ -32,6 +34,7 @@ class ServiceFactory:
                 service_id=self.id,
                 manager=self.serviceManager,
                 config=self.serviceConf,
+                summary=self.summary,
             )
 
         return None
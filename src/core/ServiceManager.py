@@ -3,8 +3,10 @@ import json
 from os.path import dirname, join
 from typing import Dict, List, Union
 
-import requests
-
+from ..sub.cache_manager import schedule_cache_maintenance
+from ..sub.capabilities_cache import load_capabilities_index
+from ..sub.helper_functions import service_icon_cache_path
+from ..sub.http_client import http_get
 from .ESRIService import ESRIService
 from .OGCService import OGCService
 from .Service import GrdService, ServiceNotExists
@@ -76,11 +78,7 @@ class ServiceManager:
         """
         Fetch a remote resource describing available services, and load them
         """
-        response = requests.get(
-            url=self.remote_repo,
-            headers={"user-agent": "grdata-qgis-plugin/2.0"},
-            timeout=10,
-        )
+        response = http_get(self.remote_repo)
 
         # try:
         available_services = json.loads(response.content).get("services")
@@ -93,19 +91,31 @@ class ServiceManager:
     def __instantiate_services(self) -> List[GrdService]:
         """
         Instantiate the services from the list of available services.
+        Only the summary of their cached capabilities is read; the layers of each
+        service are loaded when first needed.
 
         Returns:
             List[GrdService]: A list of GrdService instances
         """
         services = list()
+        cache_index = load_capabilities_index()
 
         for service in self.servicesConf:
             service_instance = ServiceFactory(
-                serviceManager=self, serviceConf=service, **service
+                serviceManager=self,
+                serviceConf=service,
+                summary=cache_index.get(str(service.get("id") or "")),
+                **service,
             ).new()
 
             services.append(service_instance)
 
+        # Evict orphaned and least recently used cache entries (at most daily)
+        schedule_cache_maintenance(
+            [service.id for service in services if service is not None],
+            [service_icon_cache_path(service) for service in services if service is not None],
+        )
+
         # Old implementation, prioritize remote repo
         # for service in self.available_services:
 
@@ -121,6 +121,7 @@ class LayerGroup:
                     data_model=normalized_type,
                     attributes=attributes,
                     geometry_type=raw_geometry,
+                    path=layer_json.get("path"),
                 )
                 group.add_child(layer)
         return group
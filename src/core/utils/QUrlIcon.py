@@ -1,13 +1,14 @@
-import requests
 from qgis.PyQt.QtGui import QIcon, QPixmap
 
+from ...sub.http_client import ICON_TIMEOUT, http_get
+
 
 class QUrlIcon:
     def __init__(self, url):
         self.url = url
         self._icon = QIcon()
         try:
-            response = requests.get(self.url, timeout=5)
+            response = http_get(self.url, timeout=ICON_TIMEOUT)
             if response.status_code != 200:
                 self._icon = None
             else:
@@ -1,16 +1,12 @@
 import json
 
-import requests
+from ...sub.http_client import http_get
 
 
 def query_esri_server(url, parent_url=None, parent_type=None):
     # Query the REST endpoint
     payload = {"f": "pjson"}
-    response = requests.get(
-        url,
-        params=payload,
-        headers={"user-agent": "grdata-qgis-plugin/1.0.0"},
-    ).json()
+    response = http_get(url, params=payload).json()
 
     # Initialize the dictionary for this level of the directory
     service_dict = dict()
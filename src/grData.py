@@ -24,7 +24,7 @@
 import os
 
 from qgis.core import (Qgis, QgsApplication, QgsCoordinateReferenceSystem,
-                       QgsGeometry, QgsRectangle)
+                       QgsGeometry, QgsMessageLog, QgsRectangle)
 from qgis.gui import QgsRubberBand
 from qgis.PyQt.QtCore import QCoreApplication, QSettings, Qt, QTranslator
 from qgis.PyQt.QtGui import QColor, QIcon
@@ -37,7 +37,11 @@ from .grData_dockwidget import grDataDockWidget
 from .resources import *
 # Local Imports
 from .sub.cache import ensure_cache_directories
+from .sub.capabilities_cache import (UNLOAD_FLUSH_TIMEOUT,
+                                     flush_capabilities_cache)
 from .sub.helper_functions import fill_tree_widget, filter_tree_widget_leafs
+from .sub.http_client import close_session
+from .sub.logger import LOGGER_CATEGORY
 from .sub.native_datasource_connections import NativeDatasourceConnections
 from .sub.service_tree import ServiceTreeController
 from .sub.Updater import GrdSourcesUpdater
@@ -234,6 +238,18 @@ class grData:
         # remove the toolbar
         del self.toolbar
 
+        # release pooled HTTP connections
+        close_session()
+
+        # write the capabilities still queued for the cache, without hanging QGIS
+        # (e.g. behind a cache maintenance VACUUM holding the database)
+        if not flush_capabilities_cache(timeout=UNLOAD_FLUSH_TIMEOUT):
+            QgsMessageLog.logMessage(
+                f"[grData] Cache writes still pending after {UNLOAD_FLUSH_TIMEOUT}s; they are lost if QGIS exits now",
+                LOGGER_CATEGORY,
+                Qgis.Warning,
+            )
+
     # --------------------------------------------------------------------------
 
     def run(self):
@@ -315,6 +331,7 @@ class grData:
         if filterTarget == "Services":
             self.service_tree.filter_services(filter_text)
         elif filterTarget == "Layers":
+            self.service_tree.populate_matching_services(filter_text)
             filter_tree_widget_leafs(self.dockwidget.conn_list_widget, filter_text)
         else:
             return
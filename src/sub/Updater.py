@@ -5,6 +5,7 @@ import requests
 from qgis.core import Qgis, QgsApplication, QgsMessageLog, QgsTask
 from qgis.PyQt.QtCore import pyqtSignal
 
+from .http_client import http_get
 from .logger import LOGGER_CATEGORY
 
 CONFIG_FILE = join(dirname(dirname(__file__)), "assets", "settings", "services.json")
@@ -36,13 +37,7 @@ class FetchFromGithub(QgsTask):
         Fetch the source.json file from github
         """
         try:
-            response = requests.get(
-                self.github_url,
-                headers={"user-agent": "grdata-qgis-plugin/1.0.0"},
-                timeout=10,
-                allow_redirects=True,
-                cookies=None,
-            )
+            response = http_get(self.github_url)
             response.raise_for_status()
             try:
                 return response.json()
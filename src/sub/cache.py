@@ -5,6 +5,9 @@ _plugin_root = dirname(dirname(__file__))
 CACHE_DIR = join(_plugin_root, ".cache")
 ICONS_CACHE_DIR = join(CACHE_DIR, "icons")
 CAPABILITIES_CACHE_DIR = join(CACHE_DIR, "capabilities")
+RESPONSES_CACHE_DIR = join(CACHE_DIR, "responses")
+CRAWLS_CACHE_DIR = join(CACHE_DIR, "crawls")
+CAPABILITIES_DB_FILE = join(CACHE_DIR, "capabilities.sqlite")
 
 
 def get_cache_dir() -> str:
@@ -18,3 +21,5 @@ def get_icons_cache_dir() -> str:
 def ensure_cache_directories() -> None:
     os.makedirs(ICONS_CACHE_DIR, exist_ok=True)
     os.makedirs(CAPABILITIES_CACHE_DIR, exist_ok=True)
+    os.makedirs(RESPONSES_CACHE_DIR, exist_ok=True)
+    os.makedirs(CRAWLS_CACHE_DIR, exist_ok=True)
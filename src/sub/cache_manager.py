@@ -0,0 +1,270 @@
+"""
+Disk budget of the plugin cache.
+
+Service icons (.cache/icons), cached capabilities (.cache/capabilities.sqlite) and
+raw responses kept for revalidation (.cache/responses) share a disk budget, set in
+the QGIS settings (CACHE_BUDGET_SETTING, in MB). Above it, the least recently used
+entries of all three stores are evicted: icons by file modification time (touched
+whenever an icon is used), services by the last time their layers were loaded, and
+responses by the last time they were stored or revalidated. A sweep also removes the
+entries of services no longer listed in services.json, responses unused for
+RESPONSES_MAX_AGE, and expired crawl checkpoints.
+
+Maintenance runs on a background thread, at most once per CACHE_MAINTENANCE_INTERVAL,
+and logs the cache occupancy.
+"""
+
+import json
+import os
+import threading
+import time
+from os.path import join
+from typing import Dict, Iterable, Optional
+
+from qgis.core import Qgis, QgsMessageLog, QgsSettings
+
+from .cache import (CACHE_DIR, CRAWLS_CACHE_DIR, ICONS_CACHE_DIR,
+                    RESPONSES_CACHE_DIR, ensure_cache_directories)
+from .capabilities_cache import (capabilities_cache_size,
+                                 capabilities_cache_usage,
+                                 delete_capabilities_cache)
+from .crawl_checkpoint import CHECKPOINT_MAX_AGE
+from .logger import LOGGER_CATEGORY
+from .response_cache import cached_response_usage, delete_cached_responses
+
+CACHE_BUDGET_SETTING = "grdata/cache/budget_mb"
+DEFAULT_CACHE_BUDGET_MB = 200
+CACHE_MAINTENANCE_INTERVAL = 86400  # 1 day
+CACHE_MAINTENANCE_FILE = join(CACHE_DIR, "cache_maintenance.json")
+RESPONSES_MAX_AGE = 7776000  # 90 days, the longest default refresh interval
+
+_maintenance_lock = threading.Lock()
+
+
+def touch_cache_file(path: str) -> None:
+    """Mark a cached file as used, for LRU eviction."""
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+
+def configured_cache_budget() -> int:
+    """The disk budget of the icon and capabilities caches, in bytes."""
+    try:
+        budget_mb = int(QgsSettings().value(CACHE_BUDGET_SETTING, DEFAULT_CACHE_BUDGET_MB))
+    except (TypeError, ValueError):
+        budget_mb = DEFAULT_CACHE_BUDGET_MB
+    return max(budget_mb, 1) * 1024 * 1024
+
+
+def _directory_files(path: str):
+    """(path, size, modification time) of the files of a cache directory."""
+    if not os.path.isdir(path):
+        return []
+
+    files = []
+    for file_name in os.listdir(path):
+        file_path = join(path, file_name)
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            continue
+        if os.path.isfile(file_path):
+            files.append((file_path, stat.st_size, stat.st_mtime))
+    return files
+
+
+def _remove_file(path: str) -> bool:
+    try:
+        os.remove(path)
+        return True
+    except OSError:
+        return False
+
+
+def cache_occupancy() -> Dict[str, Dict[str, int]]:
+    """
+    Disk occupancy of the plugin cache.
+
+    Returns:
+        Dict mapping store ("icons", "capabilities", "responses", "crawls") ->
+        {"entries", "bytes"}, plus "total" -> {"bytes"}
+    """
+    occupancy = dict()
+    for store, path in (("icons", ICONS_CACHE_DIR), ("crawls", CRAWLS_CACHE_DIR)):
+        files = _directory_files(path)
+        occupancy[store] = {"entries": len(files), "bytes": sum(size for _, size, _ in files)}
+
+    responses = cached_response_usage()
+    occupancy["responses"] = {
+        "entries": len(responses),
+        "bytes": sum(usage["bytes"] for usage in responses),
+    }
+    occupancy["capabilities"] = {
+        "entries": len(capabilities_cache_usage()),
+        "bytes": capabilities_cache_size(),
+    }
+    occupancy["total"] = {"bytes": sum(store["bytes"] for store in occupancy.values())}
+    return occupancy
+
+
+def sweep_orphans(service_ids: Iterable[str], icon_files: Iterable[str]) -> int:
+    """
+    Remove the cached capabilities of services that are not configured any more,
+    the icons no configured service uses, responses unused for RESPONSES_MAX_AGE
+    (and leftovers of interrupted writes), and expired crawl checkpoints.
+
+    Args:
+        service_ids: Ids of the configured services
+        icon_files: Cache files of the configured services' icons
+
+    Returns:
+        Number of entries removed
+    """
+    service_ids = {str(service_id) for service_id in service_ids if service_id}
+    if not service_ids:
+        # services.json could not be read: everything would look orphaned
+        return 0
+
+    orphan_services = [usage["id"] for usage in capabilities_cache_usage() if usage["id"] not in service_ids]
+    # Waited for, so the budget is not enforced against services about to be removed
+    delete_capabilities_cache(orphan_services).result()
+    removed = len(orphan_services)
+
+    icon_files = {os.path.normcase(os.path.abspath(path)) for path in icon_files if path}
+    for path, _, _ in _directory_files(ICONS_CACHE_DIR):
+        if os.path.normcase(os.path.abspath(path)) not in icon_files:
+            removed += _remove_file(path)
+
+    now = time.time()
+    stale_responses = [usage["key"] for usage in cached_response_usage() if now - usage["last_used"] > RESPONSES_MAX_AGE]
+    delete_cached_responses(stale_responses)
+    removed += len(stale_responses)
+
+    for path, _, modified_at in _directory_files(RESPONSES_CACHE_DIR):
+        if path.endswith(".tmp") and now - modified_at > CHECKPOINT_MAX_AGE:
+            removed += _remove_file(path)
+
+    for path, _, modified_at in _directory_files(CRAWLS_CACHE_DIR):
+        if now - modified_at > CHECKPOINT_MAX_AGE:
+            removed += _remove_file(path)
+
+    return removed
+
+
+def enforce_cache_budget(budget_bytes: int) -> int:
+    """
+    Evict the least recently used icons, cached services and cached responses until
+    the three stores fit in `budget_bytes`.
+
+    Returns:
+        Number of entries evicted
+    """
+    entries = [(modified_at, size, "icon", path) for path, size, modified_at in _directory_files(ICONS_CACHE_DIR)]
+    entries.extend(
+        (usage["last_used"], usage["bytes"], "service", usage["id"]) for usage in capabilities_cache_usage()
+    )
+    entries.extend(
+        (usage["last_used"], usage["bytes"], "response", usage["key"]) for usage in cached_response_usage()
+    )
+
+    total = sum(size for _, size, _, _ in entries)
+    evicted_services = []
+    evicted_responses = []
+    evicted = 0
+    for _, size, kind, key in sorted(entries, key=lambda entry: entry[0]):
+        if total <= budget_bytes:
+            break
+        if kind == "icon":
+            if not _remove_file(key):
+                continue
+        elif kind == "service":
+            evicted_services.append(key)
+        else:
+            evicted_responses.append(key)
+        total -= size
+        evicted += 1
+
+    delete_capabilities_cache(evicted_services).result()
+    delete_cached_responses(evicted_responses)
+    return evicted
+
+
+def _last_maintenance() -> int:
+    try:
+        with open(CACHE_MAINTENANCE_FILE, "r", encoding="utf-8") as f:
+            return int(json.load(f).get("last_run") or 0)
+    except Exception:
+        return 0
+
+
+def _save_last_maintenance(last_run: int) -> None:
+    ensure_cache_directories()
+    tmp_file = f"{CACHE_MAINTENANCE_FILE}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump({"last_run": last_run}, f)
+    os.replace(tmp_file, CACHE_MAINTENANCE_FILE)
+
+
+def maintain_cache(
+    service_ids: Iterable[str],
+    icon_files: Iterable[str],
+    budget_bytes: Optional[int] = None,
+    force: bool = False,
+) -> Optional[Dict[str, Dict[str, int]]]:
+    """
+    Sweep orphaned entries, then evict entries over the disk budget.
+
+    Args:
+        service_ids: Ids of the configured services
+        icon_files: Cache files of the configured services' icons
+        budget_bytes: Disk budget of the icon and capabilities caches (default: configured_cache_budget())
+        force: Run even if the last maintenance is recent
+
+    Returns:
+        The cache occupancy afterwards, or None if maintenance was not due
+    """
+    with _maintenance_lock:
+        now = int(time.time())
+        if not force and now - _last_maintenance() < CACHE_MAINTENANCE_INTERVAL:
+            return None
+
+        removed = sweep_orphans(service_ids, icon_files)
+        evicted = enforce_cache_budget(configured_cache_budget() if budget_bytes is None else budget_bytes)
+        _save_last_maintenance(now)
+
+    occupancy = cache_occupancy()
+    QgsMessageLog.logMessage(
+        "[CacheManager] Removed {} orphaned and evicted {} entries. Cache: {}".format(
+            removed,
+            evicted,
+            ", ".join(
+                f"{store} {usage['bytes'] / 1048576:.1f} MB"
+                + (f" ({usage['entries']} entries)" if "entries" in usage else "")
+                for store, usage in occupancy.items()
+            ),
+        ),
+        LOGGER_CATEGORY,
+        Qgis.Info,
+    )
+    return occupancy
+
+
+def schedule_cache_maintenance(service_ids: Iterable[str], icon_files: Iterable[str]) -> threading.Thread:
+    """Run maintain_cache (if due) on a background thread."""
+    service_ids, icon_files = list(service_ids), list(icon_files)
+
+    def run():
+        try:
+            maintain_cache(service_ids, icon_files)
+        except Exception as e:
+            QgsMessageLog.logMessage(
+                f"[CacheManager] Cache maintenance failed: {e}",
+                LOGGER_CATEGORY,
+                Qgis.Warning,
+            )
+
+    thread = threading.Thread(target=run, name="grdata-cache-maintenance", daemon=True)
+    thread.start()
+    return thread
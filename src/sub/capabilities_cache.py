@@ -1,69 +1,650 @@
+"""
+Capabilities cache, stored in a single SQLite database (.cache/capabilities.sqlite).
+
+    services  One row per service: metadata payload (JSON), plus the summary read at
+              startup (updated_at, layer count, geometry histogram)
+    sources   The sources (ESRI service, OGC endpoint) of each service, in display
+              order, with a checksum of their layers
+    layers    One row per layer, with indexed name/url/data model/geometry/extent
+              columns; the raw attributes are kept in a blob
+
+Payloads and attributes are stored in a versioned compact encoding (see
+encode_cache_blob). Every layer is stored once: the hierarchy is rebuilt from the
+layers' paths, in layer order.
+
+Saves run on a background writer thread, each in a single transaction, and only
+rewrite the layers of sources that changed. Saves of a service queued while an
+earlier one is still waiting are coalesced into one write. Readers can query only the rows they
+need (load_cached_layers) instead of loading a whole service. Legacy per-service
+JSON files (.cache/capabilities) are imported on first load and removed.
+"""
+
+import hashlib
 import json
 import os
+import shutil
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import Future
 from os.path import join
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
+from . import cache
 from .cache import CAPABILITIES_CACHE_DIR, ensure_cache_directories
 
+SCHEMA_VERSION = 3
+
+# Columns added to the services table after its first version: schema version -> (name, type)
+_ADDED_SERVICE_COLUMNS = {
+    2: ("geometry_counts", "TEXT"),
+    3: ("accessed_at", "INTEGER"),
+}
+
+# Blob encodings: a version byte, then the encoded value
+CACHE_ENCODING_ZLIB_JSON = 1  # zlib-compressed compact JSON
+CACHE_ENCODING_VERSION = CACHE_ENCODING_ZLIB_JSON
+CACHE_COMPRESS_LEVEL = 6
+
+# Longest wait for queued saves when the plugin unloads: QGIS is blocked meanwhile
+UNLOAD_FLUSH_TIMEOUT = 5  # seconds
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS services (
+    id TEXT PRIMARY KEY,
+    updated_at INTEGER,
+    layer_count INTEGER NOT NULL DEFAULT 0,
+    geometry_counts TEXT,
+    accessed_at INTEGER,
+    payload BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sources (
+    service_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    source TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    checksum TEXT NOT NULL,
+    updated_at INTEGER,
+    layer_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (service_id, key)
+);
+CREATE TABLE IF NOT EXISTS layers (
+    id INTEGER PRIMARY KEY,
+    service_id TEXT NOT NULL,
+    source_key TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT,
+    url TEXT,
+    path TEXT,
+    data_model TEXT,
+    geometry TEXT,
+    xmin REAL,
+    ymin REAL,
+    xmax REAL,
+    ymax REAL,
+    attributes BLOB,
+    UNIQUE (service_id, source_key, position)
+);
+CREATE INDEX IF NOT EXISTS layers_name ON layers (service_id, name);
+CREATE INDEX IF NOT EXISTS layers_url ON layers (url);
+"""
+
+_LAYER_COLUMNS = "l.name, l.url, l.path, l.data_model, l.geometry, l.attributes"
+_LAYERS_ORDER = """
+    FROM layers l JOIN sources s ON s.service_id = l.service_id AND s.key = l.source_key
+    WHERE l.service_id = ?
+"""
+
 _cache_presence_index: Dict[str, bool] = {}
+_access_times: Dict[str, int] = {}  # service id -> last load of its layers, not yet stored
+_access_times_lock = threading.Lock()
+_connections = threading.local()  # One connection per thread (UI thread, writer thread)
 
 
-def _service_cache_file(service_id: str) -> str:
-    safe_id = (service_id or "").strip() or "unknown_service"
-    return join(CAPABILITIES_CACHE_DIR, f"{safe_id}.json")
+def _safe_service_id(service_id: str) -> str:
+    return (service_id or "").strip() or "unknown_service"
 
 
-def load_capabilities_cache(
-    service_id: str,
-) -> Optional[Dict[str, object]]:
+def _connection() -> sqlite3.Connection:
+    db_file = cache.CAPABILITIES_DB_FILE
+    conn = getattr(_connections, "conn", None)
+    if conn is not None and getattr(_connections, "db_file", None) == db_file:
+        return conn
+
     ensure_cache_directories()
-    safe_id = (service_id or "").strip() or "unknown_service"
-    cache_file = _service_cache_file(safe_id)
+    conn = sqlite3.connect(db_file, timeout=30)
+    # Only applies to a new database (an existing one is converted by its next VACUUM),
+    # and only if set before switching it to WAL
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    # WAL: the UI thread keeps reading while the writer thread commits
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
 
-    if not os.path.isfile(cache_file):
-        _cache_presence_index[safe_id] = False
+    user_version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if user_version < SCHEMA_VERSION:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(services)")]
+        for version, (name, column_type) in sorted(_ADDED_SERVICE_COLUMNS.items()):
+            if version > user_version and name not in columns:
+                conn.execute(f"ALTER TABLE services ADD COLUMN {name} {column_type}")
+        conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+    _connections.conn = conn
+    _connections.db_file = db_file
+    return conn
+
+
+def capabilities_entry_key(source: str) -> str:
+    """Cache key of a capabilities source (an ESRI service, an OGC endpoint)."""
+    return hashlib.sha1((source or "").encode("utf-8")).hexdigest()[:16]
+
+
+def encode_cache_blob(value) -> bytes:
+    """Encode a JSON-serializable value in the current cache encoding."""
+    encoded = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return bytes([CACHE_ENCODING_VERSION]) + zlib.compress(encoded, CACHE_COMPRESS_LEVEL)
+
+
+def decode_cache_blob(blob):
+    """
+    Decode a value stored by encode_cache_blob. Plain JSON (text or bytes), as
+    written before the encoding was versioned, is read as well.
+
+    Raises:
+        ValueError: Unknown encoding version
+    """
+    if not blob:
         return None
+    if isinstance(blob, str):
+        return json.loads(blob)
+
+    version = blob[0]
+    if version == CACHE_ENCODING_ZLIB_JSON:
+        return json.loads(zlib.decompress(blob[1:]).decode("utf-8"))
+    if blob[:1] in (b"{", b"["):
+        return json.loads(blob.decode("utf-8"))
+    raise ValueError(f"Unknown capabilities cache encoding: {version}")
+
+
+def _geometry_counts(geometries) -> Dict[str, int]:
+    counts = dict()
+    for geometry in geometries:
+        key = geometry or "unknown"
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def _layer_checksum(layers: List[Dict[str, object]]) -> str:
+    # Without the ids (list positions), which shift when other sources change
+    encoded = json.dumps(
+        [{k: v for k, v in layer.items() if k != "id"} for layer in layers],
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+
+def _extent_columns(layer: Dict[str, object]):
+    extent = (layer.get("attributes") or {}).get("extent")
+    if not isinstance(extent, dict):
+        return None, None, None, None
+    try:
+        return tuple(float(extent[k]) for k in ("xmin", "ymin", "xmax", "ymax"))
+    except (KeyError, TypeError, ValueError):
+        return None, None, None, None
+
+
+def _layer_row(service_id: str, key: str, position: int, layer: Dict[str, object]) -> tuple:
+    return (
+        service_id,
+        key,
+        position,
+        layer.get("name"),
+        layer.get("url"),
+        layer.get("path"),
+        layer.get("type"),
+        layer.get("geometry_type"),
+        *_extent_columns(layer),
+        encode_cache_blob(layer.get("attributes") or {}),
+    )
+
 
+def _layer_from_row(idx: int, row: tuple) -> Dict[str, object]:
+    # Same structure as Layer.toJson
+    name, url, path, data_model, geometry, attributes = row
+    return {
+        "id": idx,
+        "name": name,
+        "url": url,
+        "type": data_model,
+        "geometry_type": geometry,
+        "attributes": decode_cache_blob(attributes) or {},
+        "path": path,
+    }
+
+
+def _legacy_capabilities(safe_id: str):
+    """
+    Read a legacy JSON cache: a single-file payload, or a manifest with an entry file
+    per source.
+
+    Returns:
+        (payload, layers grouped by source), or None if there is no legacy cache
+    """
+    cache_file = join(CAPABILITIES_CACHE_DIR, f"{safe_id}.json")
     try:
         with open(cache_file, "r", encoding="utf-8") as f:
             payload = json.load(f)
+    except Exception:
+        return None
+    if not isinstance(payload, dict):
+        return None
 
-        if not isinstance(payload, dict):
-            _cache_presence_index[safe_id] = False
-            return None
+    entries = dict()
+    if "layers" in payload:
+        entries[payload.get("url") or ""] = payload.get("layers") or []
+    for entry in payload.get("entries") or []:
+        try:
+            with open(join(CAPABILITIES_CACHE_DIR, safe_id, f"{entry.get('key')}.json"), "r", encoding="utf-8") as f:
+                entries[entry.get("source") or ""] = json.load(f).get("layers") or []
+        except Exception:
+            pass
 
-        _cache_presence_index[safe_id] = True
+    # The layers of a legacy "layer_structure" (which repeated every layer) get the
+    # path of their group instead, the hierarchy is rebuilt from it
+    if isinstance(payload.get("layer_structure"), dict):
+        group_paths = _legacy_group_paths(payload["layer_structure"])
+        for layers in entries.values():
+            for layer in layers:
+                if not layer.get("path") and layer.get("url") in group_paths:
+                    # Names containing "/" were split into groups, which are in the group path already
+                    name = str(layer.get("name") or "").split("/")[-1]
+                    layer["path"] = "/".join(group_paths[layer["url"]] + [name])
 
-        return payload
-    except Exception:
-        _cache_presence_index[safe_id] = False
+    payload = {k: v for k, v in payload.items() if k not in ("layers", "layer_structure", "entries")}
+    return payload, entries
+
+
+def _legacy_group_paths(group: Dict[str, object], parents=()) -> Dict[str, List[str]]:
+    """Group names (below the root) of every layer of a legacy layer_structure, by layer url."""
+    paths = dict()
+    for child in group.get("children") or []:
+        if child.get("type") == "group":
+            paths.update(_legacy_group_paths(child, (*parents, child.get("name") or "")))
+        elif child.get("type") == "layer":
+            paths[(child.get("layer_json") or {}).get("url")] = list(parents)
+    return paths
+
+
+def _import_legacy_cache(safe_id: str) -> bool:
+    """Move a service's legacy JSON cache into the database. Returns whether there was one."""
+    legacy = _legacy_capabilities(safe_id)
+    if legacy is None:
+        return False
+
+    _save(safe_id, *legacy)
+    try:
+        os.remove(join(CAPABILITIES_CACHE_DIR, f"{safe_id}.json"))
+    except OSError:
+        pass
+    shutil.rmtree(join(CAPABILITIES_CACHE_DIR, safe_id), ignore_errors=True)
+    return True
+
+
+def load_capabilities_cache(
+    service_id: str,
+    with_layers: bool = True,
+) -> Optional[Dict[str, object]]:
+    """
+    Load the cached capabilities of a service.
+
+    Args:
+        service_id: The service id
+        with_layers: Also load all the service's layers into the "layers" key
+
+    Returns:
+        The service payload (plus "layer_count"), or None if the service is not cached
+    """
+    safe_id = _safe_service_id(service_id)
+    conn = _connection()
+
+    row = conn.execute("SELECT payload, layer_count FROM services WHERE id = ?", (safe_id,)).fetchone()
+    if row is None and _import_legacy_cache(safe_id):
+        row = conn.execute("SELECT payload, layer_count FROM services WHERE id = ?", (safe_id,)).fetchone()
+
+    _cache_presence_index[safe_id] = row is not None
+    if row is None:
         return None
 
+    payload = decode_cache_blob(row[0])
+    payload["layer_count"] = row[1]
+    if with_layers:
+        payload["layers"] = load_cached_layers(safe_id)
+        _record_access(safe_id)
+    return payload
+
+
+def _record_access(safe_id: str) -> None:
+    """Remember that the layers of a service were used (for LRU eviction)."""
+    with _access_times_lock:
+        _access_times[safe_id] = int(time.time())
+    _writer.submit("__accessed_at__", _save_access_times)
+
+
+def _save_access_times() -> None:
+    with _access_times_lock:
+        access_times = dict(_access_times)
+        _access_times.clear()
+
+    conn = _connection()
+    with conn:
+        conn.executemany(
+            "UPDATE services SET accessed_at = ? WHERE id = ?",
+            [(accessed_at, safe_id) for safe_id, accessed_at in access_times.items()],
+        )
+
+
+def load_capabilities_index() -> Dict[str, Dict[str, object]]:
+    """
+    Load the summary of every cached service, without their payloads or layers.
+    Legacy JSON caches left on disk are imported first.
+
+    Returns:
+        Dict mapping service id -> {"updated_at", "layer_count", "geometry_counts"}
+        ("geometry_counts": number of layers by geometry type)
+    """
+    if os.path.isdir(CAPABILITIES_CACHE_DIR):
+        for file_name in os.listdir(CAPABILITIES_CACHE_DIR):
+            if file_name.endswith(".json"):
+                _import_legacy_cache(file_name[: -len(".json")])
+
+    conn = _connection()
+    index = dict()
+    for service_id, updated_at, layer_count, geometry_counts in conn.execute(
+        "SELECT id, updated_at, layer_count, geometry_counts FROM services"
+    ):
+        if geometry_counts is None:
+            # Saved before the histogram was kept
+            geometry_counts = json.dumps(_geometry_counts(
+                geometry for (geometry,) in conn.execute(
+                    "SELECT geometry FROM layers WHERE service_id = ?", (service_id,)
+                )
+            ))
+        index[service_id] = {
+            "updated_at": updated_at,
+            "layer_count": layer_count,
+            "geometry_counts": json.loads(geometry_counts),
+        }
+        _cache_presence_index[service_id] = True
+    return index
+
+
+def services_with_cached_layers(name_filter: str) -> List[str]:
+    """Ids of the services with cached layers whose name contains `name_filter` (case-insensitive)."""
+    escaped = name_filter.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    rows = _connection().execute(
+        "SELECT DISTINCT service_id FROM layers WHERE name LIKE ? ESCAPE '\\'",
+        (f"%{escaped}%",),
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def load_cached_layers(
+    service_id: str,
+    start: int = 0,
+    count: Optional[int] = None,
+) -> List[Dict[str, object]]:
+    """
+    Load cached layers of a service, in display order (the structure of Layer.toJson).
+
+    Args:
+        service_id: The service id
+        start: Index of the first layer to load
+        count: Number of layers to load (None: all the remaining layers)
+
+    Returns:
+        The layer dicts; their "id" is their index among all the service's layers
+    """
+    rows = _connection().execute(
+        f"SELECT {_LAYER_COLUMNS} {_LAYERS_ORDER} ORDER BY s.position, l.position LIMIT ? OFFSET ?",
+        (_safe_service_id(service_id), -1 if count is None else count, start),
+    ).fetchall()
+    return [_layer_from_row(start + i, row) for i, row in enumerate(rows)]
+
 
 def has_capabilities_cache(service_id: str) -> bool:
-    ensure_cache_directories()
-    safe_id = (service_id or "").strip() or "unknown_service"
+    safe_id = _safe_service_id(service_id)
 
     if safe_id in _cache_presence_index:
         return _cache_presence_index[safe_id]
 
-    cache_file = _service_cache_file(safe_id)
-    exists = os.path.isfile(cache_file)
+    exists = (
+        _connection().execute("SELECT 1 FROM services WHERE id = ?", (safe_id,)).fetchone() is not None
+        or os.path.isfile(join(CAPABILITIES_CACHE_DIR, f"{safe_id}.json"))
+    )
     _cache_presence_index[safe_id] = exists
     return exists
 
 
+def capabilities_cache_usage() -> List[Dict[str, object]]:
+    """
+    Disk usage of every cached service.
+
+    Returns:
+        List of {"id", "bytes" (stored layers and payload), "last_used" (unix time)}
+    """
+    rows = _connection().execute(
+        """SELECT s.id,
+                  LENGTH(s.payload) + COALESCE(SUM(LENGTH(l.attributes) + LENGTH(COALESCE(l.name, ''))
+                      + LENGTH(COALESCE(l.url, '')) + LENGTH(COALESCE(l.path, ''))), 0),
+                  COALESCE(s.accessed_at, s.updated_at, 0)
+           FROM services s LEFT JOIN layers l ON l.service_id = s.id
+           GROUP BY s.id"""
+    ).fetchall()
+    return [{"id": service_id, "bytes": size, "last_used": last_used} for service_id, size, last_used in rows]
+
+
+def capabilities_cache_size() -> int:
+    """Size of the capabilities database on disk, in bytes."""
+    db_file = cache.CAPABILITIES_DB_FILE
+    return sum(
+        os.path.getsize(path) for path in (db_file, f"{db_file}-wal") if os.path.isfile(path)
+    )
+
+
+def delete_capabilities_cache(service_ids: List[str]) -> Future:
+    """
+    Remove cached services, and give the space they used back to the file system,
+    on the background writer thread.
+
+    A save of one of the services still waiting in the queue is dropped.
+
+    Returns:
+        Future of the removal (done once the space is reclaimed)
+    """
+    safe_ids = [_safe_service_id(service_id) for service_id in service_ids]
+    if not safe_ids:
+        future = Future()
+        future.set_result(None)
+        return future
+
+    for safe_id in safe_ids:
+        _cache_presence_index[safe_id] = False
+        _writer.submit(safe_id, _delete, safe_id)
+    return _writer.submit("__vacuum__", _vacuum)
+
+
+def _delete(safe_id: str) -> None:
+    conn = _connection()
+    with conn:
+        conn.execute("DELETE FROM layers WHERE service_id = ?", (safe_id,))
+        conn.execute("DELETE FROM sources WHERE service_id = ?", (safe_id,))
+        conn.execute("DELETE FROM services WHERE id = ?", (safe_id,))
+
+
+def _vacuum() -> None:
+    conn = _connection()
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        conn.execute("PRAGMA incremental_vacuum").fetchall()
+    else:
+        conn.execute("VACUUM")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def _save(
+    safe_id: str,
+    payload: Dict[str, object],
+    entries: Dict[str, List[Dict[str, object]]],
+) -> None:
+    conn = _connection()
+    now = payload.get("updated_at")
+
+    with conn:  # One transaction
+        previous = {
+            key: checksum
+            for key, checksum in conn.execute(
+                "SELECT key, checksum FROM sources WHERE service_id = ?", (safe_id,)
+            )
+        }
+
+        keys = []
+        for position, (source, layers) in enumerate(entries.items()):
+            key = capabilities_entry_key(source)
+            keys.append(key)
+            checksum = _layer_checksum(layers)
+
+            if previous.get(key) == checksum:
+                conn.execute(
+                    "UPDATE sources SET position = ? WHERE service_id = ? AND key = ?",
+                    (position, safe_id, key),
+                )
+                continue
+
+            conn.execute("DELETE FROM layers WHERE service_id = ? AND source_key = ?", (safe_id, key))
+            conn.executemany(
+                """INSERT INTO layers (service_id, source_key, position, name, url, path, data_model,
+                   geometry, xmin, ymin, xmax, ymax, attributes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                [_layer_row(safe_id, key, i, layer) for i, layer in enumerate(layers)],
+            )
+            conn.execute(
+                """INSERT OR REPLACE INTO sources (service_id, key, source, position, checksum, updated_at,
+                   layer_count) VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (safe_id, key, source, position, checksum, now, len(layers)),
+            )
+
+        # Drop the sources that disappeared from the service
+        for key in set(previous) - set(keys):
+            conn.execute("DELETE FROM layers WHERE service_id = ? AND source_key = ?", (safe_id, key))
+            conn.execute("DELETE FROM sources WHERE service_id = ? AND key = ?", (safe_id, key))
+
+        conn.execute(
+            """INSERT OR REPLACE INTO services (id, updated_at, layer_count, geometry_counts, accessed_at,
+               payload) VALUES (?, ?, ?, ?, ?, ?)""",
+            (
+                safe_id,
+                now,
+                sum(len(layers) for layers in entries.values()),
+                json.dumps(_geometry_counts(
+                    layer.get("geometry_type") for layers in entries.values() for layer in layers
+                )),
+                int(time.time()),
+                encode_cache_blob(payload),
+            ),
+        )
+
+
+class _CacheWriter:
+    """
+    Background writer of the capabilities cache, the only thread writing to it. Writes
+    are queued by key (the service id for saves and removals): a write queued while its
+    key already has one waiting replaces it and moves to the end of the queue (both
+    callers get the same future). The thread is started on demand and exits once the
+    queue is empty.
+    """
+
+    def __init__(self):
+        self._pending: Dict[str, tuple] = {}  # key -> (function, args), in queue order
+        self._futures: Dict[str, Future] = {}
+        self._writing = False
+        self._thread: Optional[threading.Thread] = None
+        self._condition = threading.Condition()
+
+    def submit(self, key: str, function, *args) -> Future:
+        with self._condition:
+            future = self._futures.setdefault(key, Future())
+            self._pending.pop(key, None)  # Keep the queue in submission order
+            self._pending[key] = (function, args)
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="grdata-cache", daemon=True)
+                self._thread.start()
+            return future
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                if not self._pending:
+                    self._thread = None
+                    self._condition.notify_all()
+                    return
+                key = next(iter(self._pending))
+                function, args = self._pending.pop(key)
+                future = self._futures.pop(key)
+                self._writing = True
+
+            try:
+                future.set_result(function(*args))
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                with self._condition:
+                    self._writing = False
+                    self._condition.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued save is written. Returns False on timeout."""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._pending and not self._writing, timeout)
+
+
+_writer = _CacheWriter()
+
+
 def save_capabilities_cache(
     service_id: str,
     payload: Dict[str, object],
-) -> None:
-    ensure_cache_directories()
-    safe_id = (service_id or "").strip() or "unknown_service"
-    cache_file = _service_cache_file(safe_id)
-    tmp_file = f"{cache_file}.tmp"
+    entries: Optional[Dict[str, List[Dict[str, object]]]] = None,
+) -> Future:
+    """
+    Save the capabilities of a service, on the background writer thread.
 
-    with open(tmp_file, "w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
+    The save is a single transaction. Until it starts, a later save of the same
+    service replaces it. The layers of sources whose layers did not
+    change since the last save are not rewritten and keep their timestamp; sources
+    no longer listed are removed.
 
-    os.replace(tmp_file, cache_file)
+    Args:
+        service_id: The service id
+        payload: Service-level payload (metadata, without the layers)
+        entries: Layers of the service (Layer.toJson), grouped by source, in display order
+
+    Returns:
+        Future of the save
+    """
+    safe_id = _safe_service_id(service_id)
+    payload = {k: v for k, v in payload.items() if k not in ("layers", "layer_structure")}
     _cache_presence_index[safe_id] = True
+    return _writer.submit(safe_id, _save, safe_id, payload, dict(entries or {}))
+
+
+def flush_capabilities_cache(timeout: Optional[float] = None) -> bool:
+    """
+    Wait for the queued capabilities saves to be written (e.g. before the plugin unloads).
+
+    Args:
+        timeout: Seconds to wait at most (None: no limit)
+
+    Returns:
+        False if the saves did not finish within `timeout`
+    """
+    return _writer.flush(timeout)
@@ -0,0 +1,345 @@
+"""
+Streaming parsers for OGC GetCapabilities and DescribeFeatureType documents.
+
+Instead of building a dict tree of the whole document (xmltodict), the parser is
+fed the response body chunk by chunk while it downloads, and only keeps the
+fields the loaders use from each WFS FeatureType / WMS Layer:
+
+    {
+        "name": str or None,
+        "title": str or None,
+        "abstract": str or None,
+        "crs": str or None,        # DefaultCRS/DefaultSRS (WFS), first CRS/SRS (WMS)
+        "bbox": (minx, miny, maxx, maxy) in WGS84 longitude/latitude, or None,
+        "layers": [...],           # nested WMS layers, same structure
+    }
+
+The parser also reads the document's updateSequence, the sections (children of the
+document element) it contains, and the exception code of exception reports (e.g. CurrentUpdateSequence, when the document requested with an
+updateSequence has not changed).
+
+FeatureTypeSchemaParser does the same for WFS DescribeFeatureType schemas, keeping
+only the geometry type of each feature type.
+"""
+
+from typing import Dict, Iterable, List, Optional
+from xml.parsers import expat
+
+# Exception code of a server answering that the requested updateSequence is current
+CURRENT_UPDATE_SEQUENCE = "CurrentUpdateSequence"
+_EXCEPTION_REPORTS = ("ServiceExceptionReport", "ExceptionReport")
+_EXCEPTIONS = ("ServiceException", "Exception")
+
+# Elements whose content is collected, by local name
+CAPABILITIES_RECORD_ELEMENTS = ("FeatureType", "Layer")
+_TEXT_FIELDS = {
+    "Name": "name",
+    "Title": "title",
+    "Abstract": "abstract",
+    "DefaultCRS": "crs",
+    "DefaultSRS": "crs",
+    "SRS": "crs",
+    "CRS": "crs",
+}
+
+# Bounding box children (text content): ows:WGS84BoundingBox (WFS), EX_GeographicBoundingBox (WMS 1.3)
+_CORNER_FIELDS = ("LowerCorner", "UpperCorner")
+_GEOGRAPHIC_BOUND_FIELDS = (
+    "westBoundLongitude",
+    "southBoundLatitude",
+    "eastBoundLongitude",
+    "northBoundLatitude",
+)
+
+# Bounding boxes given as attributes: LatLonBoundingBox (WMS 1.1), LatLongBoundingBox (WFS 1.0)
+_ATTRIBUTE_BBOX_ELEMENTS = ("LatLonBoundingBox", "LatLongBoundingBox")
+
+
+def _local_name(name: str) -> str:
+    # expat reports namespaced names as "<uri>}<local name>"
+    return name.rsplit("}", 1)[-1].rsplit(":", 1)[-1]
+
+
+def _new_record() -> Dict[str, object]:
+    return {"name": None, "title": None, "abstract": None, "crs": None, "bbox": None, "layers": []}
+
+
+class CapabilitiesParser:
+    """
+    Incremental GetCapabilities parser:
+
+        parser = CapabilitiesParser()
+        for chunk in response.iter_content(chunk_size=65536):
+            parser.feed(chunk)
+        records = parser.close()
+
+    Raises:
+        xml.parsers.expat.ExpatError: The document is not well-formed XML
+    """
+
+    def __init__(self):
+        self.root = None  # Local name of the document element
+        self.update_sequence = None
+        self.sections: List[str] = []  # Local names of the document element's children
+        self.exception_code = None  # Set if the document is an exception report
+        self.exception_locator = None  # The request parameter the exception report blames, if any
+        self.records: List[Dict[str, object]] = []
+
+        self._elements: List[str] = []  # Open elements, local names
+        self._records: List[Dict[str, object]] = []  # Open records, innermost last
+        self._record_depths: List[int] = []
+        self._text: Optional[List[str]] = None
+        self._bounds: Dict[str, str] = {}
+
+        self._parser = expat.ParserCreate(namespace_separator="}")
+        self._parser.buffer_text = True
+        self._parser.StartElementHandler = self._start
+        self._parser.EndElementHandler = self._end
+        self._parser.CharacterDataHandler = self._characters
+
+    def _in_record(self, depth: int) -> bool:
+        """The element at `depth` is a direct child of the innermost open record."""
+        return bool(self._record_depths) and depth == self._record_depths[-1] + 1
+
+    def _start(self, name, attributes) -> None:
+        tag = _local_name(name)
+        depth = len(self._elements)
+        self._elements.append(tag)
+
+        if self.root is None:
+            self.root = tag
+            self.update_sequence = attributes.get("updateSequence")
+            return
+
+        if depth == 1:
+            self.sections.append(tag)
+
+        if self.root in _EXCEPTION_REPORTS:
+            if tag in _EXCEPTIONS and self.exception_code is None:
+                self.exception_code = attributes.get("code") or attributes.get("exceptionCode") or tag
+                self.exception_locator = attributes.get("locator")
+            return
+
+        if tag in CAPABILITIES_RECORD_ELEMENTS:
+            record = _new_record()
+            if self._records:
+                self._records[-1]["layers"].append(record)
+            else:
+                self.records.append(record)
+            self._records.append(record)
+            self._record_depths.append(depth)
+            return
+
+        if not self._records:
+            return
+
+        if self._in_record(depth):
+            if tag in _TEXT_FIELDS:
+                self._text = []
+            elif tag in _ATTRIBUTE_BBOX_ELEMENTS and self._records[-1]["bbox"] is None:
+                attributes = {_local_name(k): v for k, v in attributes.items()}
+                self._set_bbox(
+                    attributes.get("minx"),
+                    attributes.get("miny"),
+                    attributes.get("maxx"),
+                    attributes.get("maxy"),
+                )
+            else:
+                self._bounds = {}
+        elif self._in_record(depth - 1) and tag in _CORNER_FIELDS + _GEOGRAPHIC_BOUND_FIELDS:
+            # Child of a bounding box element of the record
+            self._text = []
+
+    def _end(self, name) -> None:
+        tag = self._elements.pop()
+        depth = len(self._elements)
+
+        if self._record_depths and depth == self._record_depths[-1]:
+            self._records.pop()
+            self._record_depths.pop()
+            return
+
+        if self._text is None:
+            if self._in_record(depth) and self._bounds:
+                self._bbox_from_bounds()
+            return
+
+        text = "".join(self._text).strip() or None
+        self._text = None
+        record = self._records[-1]
+
+        if self._in_record(depth):
+            field = _TEXT_FIELDS[tag]
+            # Only the first CRS of a layer is its default
+            if record[field] is None:
+                record[field] = text
+        elif text is not None:
+            self._bounds[tag] = text
+
+    def _characters(self, data) -> None:
+        if self._text is not None:
+            self._text.append(data)
+
+    def _bbox_from_bounds(self) -> None:
+        bounds, self._bounds = self._bounds, {}
+        if self._records[-1]["bbox"] is not None:
+            return
+
+        if "LowerCorner" in bounds and "UpperCorner" in bounds:
+            lower = bounds["LowerCorner"].split()
+            upper = bounds["UpperCorner"].split()
+            if len(lower) == 2 and len(upper) == 2:
+                self._set_bbox(lower[0], lower[1], upper[0], upper[1])
+        elif all(field in bounds for field in _GEOGRAPHIC_BOUND_FIELDS):
+            west, south, east, north = (bounds[field] for field in _GEOGRAPHIC_BOUND_FIELDS)
+            self._set_bbox(west, south, east, north)
+
+    def _set_bbox(self, minx, miny, maxx, maxy) -> None:
+        try:
+            self._records[-1]["bbox"] = (float(minx), float(miny), float(maxx), float(maxy))
+        except (TypeError, ValueError):
+            pass
+
+    @property
+    def rejects_sections(self) -> bool:
+        """The exception report blames the `sections` parameter."""
+        return "section" in (self.exception_locator or "").lower() or "section" in (self.exception_code or "").lower()
+
+    @property
+    def current(self) -> bool:
+        """The server answered that the document is unchanged since the requested updateSequence."""
+        return self.exception_code == CURRENT_UPDATE_SEQUENCE
+
+    def feed(self, chunk: bytes) -> None:
+        """Parse the next chunk of the document."""
+        self._parser.Parse(chunk, False)
+
+    def close(self) -> List[Dict[str, object]]:
+        """
+        Finish parsing.
+
+        Returns:
+            The top-level records (FeatureTypes, or the WMS root Layer(s)) in document order
+        """
+        self._parser.Parse(b"", True)
+        return self.records
+
+
+def parse_capabilities(chunks: Iterable[bytes]) -> CapabilitiesParser:
+    """
+    Parse a GetCapabilities document from an iterable of byte chunks
+    (e.g. response.iter_content()).
+
+    Returns:
+        The finished parser: `records` holds the top-level records, `root` the document element
+    """
+    parser = CapabilitiesParser()
+    for chunk in chunks:
+        if chunk:
+            parser.feed(chunk)
+    parser.close()
+    return parser
+
+
+# GML geometry property types, and the geometry type they stand for
+GML_GEOMETRY_PROPERTY_TYPES = {
+    "PointPropertyType": "Point",
+    "MultiPointPropertyType": "MultiPoint",
+    "LineStringPropertyType": "LineString",
+    "CurvePropertyType": "LineString",
+    "MultiLineStringPropertyType": "MultiLineString",
+    "MultiCurvePropertyType": "MultiLineString",
+    "PolygonPropertyType": "Polygon",
+    "SurfacePropertyType": "Polygon",
+    "MultiPolygonPropertyType": "MultiPolygon",
+    "MultiSurfacePropertyType": "MultiPolygon",
+}
+
+
+class FeatureTypeSchemaParser:
+    """
+    Incremental parser for WFS DescribeFeatureType schemas (XSD), extracting the
+    geometry type of every feature type described:
+
+        parser = FeatureTypeSchemaParser()
+        for chunk in response.iter_content(chunk_size=65536):
+            parser.feed(chunk)
+        geometries = parser.close()  # {"layer_name": "MultiPolygon", ...}
+
+    Feature types whose geometry property is generic (gml:GeometryPropertyType) or
+    missing are left out.
+    """
+
+    def __init__(self):
+        self._depth = 0
+        self._element_types: Dict[str, str] = {}  # Feature type element -> its complexType
+        self._type_geometries: Dict[str, str] = {}  # complexType -> geometry type
+        self._element = None  # Top-level element being parsed
+        self._complex_type = None  # complexType being parsed
+
+        self._parser = expat.ParserCreate(namespace_separator="}")
+        self._parser.StartElementHandler = self._start
+        self._parser.EndElementHandler = self._end
+
+    def _start(self, name, attributes) -> None:
+        tag = _local_name(name)
+        self._depth += 1
+
+        # <schema> is at depth 1, its declarations at depth 2
+        if self._depth == 2 and tag == "element" and attributes.get("name"):
+            self._element = attributes["name"]
+            if attributes.get("type"):
+                self._element_types[self._element] = _local_name(attributes["type"])
+            return
+
+        if tag == "complexType" and self._complex_type is None:
+            if self._depth == 2 and attributes.get("name"):
+                self._complex_type = attributes["name"]
+            elif self._element is not None:
+                # Anonymous type of a top-level element
+                self._complex_type = f"#{self._element}"
+                self._element_types[self._element] = self._complex_type
+            return
+
+        if tag == "element" and self._complex_type is not None:
+            geometry = GML_GEOMETRY_PROPERTY_TYPES.get(_local_name(attributes.get("type", "")))
+            if geometry is not None:
+                self._type_geometries.setdefault(self._complex_type, geometry)
+
+    def _end(self, name) -> None:
+        if self._depth == 2:
+            self._element = None
+            self._complex_type = None
+        self._depth -= 1
+
+    def feed(self, chunk: bytes) -> None:
+        """Parse the next chunk of the schema."""
+        self._parser.Parse(chunk, False)
+
+    def close(self) -> Dict[str, str]:
+        """
+        Finish parsing.
+
+        Returns:
+            Dict mapping feature type name (without namespace prefix) -> geometry type
+        """
+        self._parser.Parse(b"", True)
+        return {
+            element: self._type_geometries[type_name]
+            for element, type_name in self._element_types.items()
+            if type_name in self._type_geometries
+        }
+
+
+def parse_feature_type_geometries(chunks: Iterable[bytes]) -> Dict[str, str]:
+    """
+    Parse a DescribeFeatureType schema from an iterable of byte chunks.
+
+    Returns:
+        Dict mapping feature type name (without namespace prefix) -> geometry type
+    """
+    parser = FeatureTypeSchemaParser()
+    for chunk in chunks:
+        if chunk:
+            parser.feed(chunk)
+    return parser.close()
@@ -0,0 +1,73 @@
+import hashlib
+import json
+import os
+import time
+from os.path import join
+from typing import Dict, Optional
+
+from .cache import CRAWLS_CACHE_DIR, ensure_cache_directories
+
+# Checkpoints of crawls started longer ago than this are ignored, the crawl starts over
+CHECKPOINT_MAX_AGE = 86400  # 1 day
+
+
+def _checkpoint_file(url: str) -> str:
+    digest = hashlib.sha256((url or "").strip().rstrip("/").encode("utf-8")).hexdigest()[:32]
+    return join(CRAWLS_CACHE_DIR, f"{digest}.json")
+
+
+def load_crawl_checkpoint(url: str) -> Optional[Dict[str, object]]:
+    """
+    Load the checkpoint of an interrupted crawl of `url`.
+
+    Returns:
+        The checkpoint payload, or None if there is no recent checkpoint
+    """
+    checkpoint_file = _checkpoint_file(url)
+    if not os.path.isfile(checkpoint_file):
+        return None
+
+    try:
+        with open(checkpoint_file, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+    except Exception:
+        return None
+
+    if not isinstance(payload, dict):
+        return None
+
+    # Resumed crawls keep the start time of the first one, so a checkpoint cannot outlive
+    # CHECKPOINT_MAX_AGE by being resumed and saved again
+    started_at = payload.get("started_at") or payload.get("saved_at") or 0
+    if int(time.time()) - started_at > CHECKPOINT_MAX_AGE:
+        return None
+
+    return payload
+
+
+def save_crawl_checkpoint(url: str, payload: Dict[str, object], started_at: Optional[int] = None) -> None:
+    """
+    Save the checkpoint of a running crawl of `url`.
+
+    Args:
+        url: The crawled URL
+        payload: The crawl state
+        started_at: Unix time the crawl started (for resumed crawls: the time the
+            first crawl started). Defaults to now.
+    """
+    ensure_cache_directories()
+    checkpoint_file = _checkpoint_file(url)
+    tmp_file = f"{checkpoint_file}.tmp"
+
+    now = int(time.time())
+    payload = {**payload, "url": url, "started_at": int(started_at or now), "saved_at": now}
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False)
+
+    os.replace(tmp_file, checkpoint_file)
+
+
+def clear_crawl_checkpoint(url: str) -> None:
+    checkpoint_file = _checkpoint_file(url)
+    if os.path.isfile(checkpoint_file):
+        os.remove(checkpoint_file)
@@ -0,0 +1,65 @@
+"""
+Small persistent sets of keys that expire.
+
+Used to remember per-host / per-endpoint decisions (e.g. a host whose TLS certificate
+could not be verified) for a while, across QGIS sessions: the records are kept in
+memory and in a JSON file of the plugin cache, mapping key -> unix time recorded.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from .cache import ensure_cache_directories
+
+
+class ExpiringRecords:
+    """Keys recorded in a JSON file, each forgotten `ttl` seconds after it was recorded."""
+
+    def __init__(self, path: str, ttl: int):
+        self.path = path
+        self.ttl = ttl
+        self._records: Optional[Dict[str, int]] = None  # key -> unix time recorded, loaded on first use
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, int]:
+        if self._records is None:
+            self._records = {}
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    payload = json.load(f)
+                if isinstance(payload, dict):
+                    self._records = {key: int(recorded_at) for key, recorded_at in payload.items()}
+            except Exception:
+                pass
+        return self._records
+
+    def _save(self) -> None:
+        ensure_cache_directories()
+        tmp_file = f"{self.path}.tmp"
+        try:
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(self._records, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.path)
+        except OSError:
+            pass
+
+    def contains(self, key: str) -> bool:
+        """Whether `key` was recorded less than `ttl` seconds ago."""
+        with self._lock:
+            recorded_at = self._load().get(key)
+        return recorded_at is not None and int(time.time()) - recorded_at <= self.ttl
+
+    def record(self, key: str) -> None:
+        """Record `key` (again), restarting its expiry."""
+        with self._lock:
+            self._load()[key] = int(time.time())
+            self._save()
+
+    def discard(self, key: str) -> None:
+        """Forget `key`, if it is recorded."""
+        with self._lock:
+            if self._load().pop(key, None) is not None:
+                self._save()
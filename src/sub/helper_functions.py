@@ -3,11 +3,12 @@ import os
 from os.path import dirname, isfile, join
 from urllib.parse import urlparse
 
-import requests
 from qgis.PyQt.QtGui import QIcon
 from qgis.PyQt.QtWidgets import QTreeWidgetItem
 
 from .cache import ICONS_CACHE_DIR, ensure_cache_directories
+from .cache_manager import touch_cache_file
+from .http_client import ICON_TIMEOUT, http_get
 
 plugin_logo = join(dirname(dirname(__file__)), "assets", "img", "icon.png")
 
@@ -18,7 +19,7 @@ def get_base_url(url):
     return base_url
 
 
-def _service_icon_cache_path(service):
+def service_icon_cache_path(service):
     if not isinstance(service.icon, str) or service.icon == "":
         return None
 
@@ -38,15 +39,16 @@ def cache_service_icon(service):
 
     ensure_cache_directories()
 
-    cache_path = _service_icon_cache_path(service)
+    cache_path = service_icon_cache_path(service)
     if cache_path is None:
         return None
 
     if isfile(cache_path):
+        touch_cache_file(cache_path)
         return cache_path
 
     try:
-        response = requests.get(service.icon, timeout=4)
+        response = http_get(service.icon, timeout=ICON_TIMEOUT)
         if response.status_code != 200:
             return None
 
@@ -71,8 +73,9 @@ def service_qicon(service):
     if service.icon is None:
         return QIcon(plugin_logo)
 
-    cache_path = _service_icon_cache_path(service)
+    cache_path = service_icon_cache_path(service)
     if cache_path and isfile(cache_path):
+        touch_cache_file(cache_path)
         return QIcon(cache_path)
 
     # Avoid synchronous network requests while populating the tree.
@@ -98,7 +101,8 @@ def addLayerItem(layer, parent):
 
 
 def fillServiceLayers(parentItem, service, expanded=True):
-    service_layers = service.getLayers()
+    # Only renders the layers the service has: fetching and refreshing is up to the caller
+    service_layers = service.layers or []
     for layer in service_layers:
         addLayerItem(layer, parentItem)
 
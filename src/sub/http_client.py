@@ -0,0 +1,200 @@
+"""
+Plugin-wide HTTP client.
+
+All network I/O goes through a single requests.Session, so requests to the same
+host reuse keep-alive connections (and TLS sessions) instead of paying a new
+handshake each time. The session also carries the shared user agent, the
+accepted content encodings and the default timeout policy.
+
+Compressed responses are decoded by urllib3 as they are read, so streamed
+bodies (stream=True, iter_content) are decompressed chunk by chunk.
+"""
+
+import threading
+from http.cookiejar import DefaultCookiePolicy
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .response_cache import (CachedResponseWriter, delete_cached_responses,
+                             load_cached_response_body,
+                             load_cached_response_meta, response_cache_key,
+                             save_cached_response, touch_cached_response)
+
+USER_AGENT = "grdata-qgis-plugin/3.0.0"
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (5, 10)
+ICON_TIMEOUT = (3, 5)
+
+# Number of per-host pools kept alive, and keep-alive connections per host.
+# The per-host size must cover the crawlers' per-host concurrency.
+POOL_CONNECTIONS = 32
+POOL_MAXSIZE = 16
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def _accept_encoding() -> str:
+    """Content encodings we can decode: gzip and deflate, plus brotli if a brotli module is installed."""
+    encodings = ["gzip", "deflate"]
+    for module in ("brotli", "brotlicffi"):
+        try:
+            __import__(module)
+        except ImportError:
+            continue
+        encodings.append("br")
+        break
+    return ", ".join(encodings)
+
+
+ACCEPT_ENCODING = _accept_encoding()
+
+
+def _new_session() -> requests.Session:
+    session = requests.Session()
+    session.headers.update({"user-agent": USER_AGENT, "accept-encoding": ACCEPT_ENCODING})
+
+    # Requests are stateless, never keep cookies between them
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """Return the shared session, creating it on first use."""
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            _session = _new_session()
+        return _session
+
+
+def http_get(url, params=None, timeout=DEFAULT_TIMEOUT, **kwargs) -> requests.Response:
+    """
+    GET a URL through the shared session.
+
+    Args:
+        url: The URL to request
+        params: Optional query parameters
+        timeout: (connect, read) timeout, defaults to DEFAULT_TIMEOUT
+        **kwargs: Passed through to requests (headers, verify, stream, ...)
+
+    Returns:
+        requests.Response
+    """
+    kwargs.setdefault("allow_redirects", True)
+    return get_session().get(url, params=params, timeout=timeout, **kwargs)
+
+
+def _response_from_cache(response: requests.Response, cached) -> requests.Response:
+    """Turn a 304 Not Modified into a regular response carrying the cached body."""
+    cached_response = requests.Response()
+    cached_response.status_code = 200
+    cached_response._content = cached["body"]
+    cached_response._content_consumed = True  # Lets iter_content() serve the cached body
+    cached_response.headers.update(cached.get("headers") or {})
+    cached_response.url = response.url
+    cached_response.request = response.request
+    cached_response.not_modified = True
+    return cached_response
+
+
+def _cache_while_streaming(response: requests.Response, writer: CachedResponseWriter) -> None:
+    """Make iter_content() also write the body to the cache; it is stored once fully read."""
+    iter_content = response.iter_content
+
+    def iter_content_to_cache(chunk_size=1, decode_unicode=False):
+        completed = False
+        try:
+            for chunk in iter_content(chunk_size=chunk_size, decode_unicode=decode_unicode):
+                writer.write(chunk)
+                yield chunk
+            completed = True
+        finally:
+            if completed:
+                writer.commit()
+            else:
+                writer.discard()
+
+    response.iter_content = iter_content_to_cache
+
+
+def conditional_get(url, params=None, **kwargs) -> requests.Response:
+    """
+    GET a URL, revalidating it against the raw-response cache.
+
+    If an earlier response carried an ETag or Last-Modified validator, the request sends
+    If-None-Match / If-Modified-Since. A 304 Not Modified is answered from the cache as
+    a regular 200 response, so callers don't need to handle it. The `not_modified`
+    attribute of the returned response tells whether the cached body was reused.
+    Streamed responses (stream=True) are stored while iter_content() reads them.
+
+    Args:
+        url: The URL to request
+        params: Optional query parameters (part of the cache key)
+        **kwargs: Passed through to http_get
+
+    Returns:
+        requests.Response
+    """
+    key = response_cache_key(url, params)
+    # Only the validators are read up front, the (possibly large) body only on a 304
+    cached = load_cached_response_meta(key)
+
+    headers = dict(kwargs.pop("headers", None) or {})
+    request_headers = dict(headers)
+    if cached is not None:
+        if cached.get("etag"):
+            request_headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            request_headers["If-Modified-Since"] = cached["last_modified"]
+
+    response = http_get(url, params=params, headers=request_headers, **kwargs)
+
+    if response.status_code == 304 and cached is not None:
+        body = load_cached_response_body(key, cached)
+        if body is not None:
+            touch_cached_response(key)
+            return _response_from_cache(response, {**cached, "body": body})
+
+        # The cached body went missing since the validators were read: ask for the full document
+        response.close()
+        response = http_get(url, params=params, headers=headers, **kwargs)
+
+    response.not_modified = False
+    if response.status_code == 200:
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            content_type = response.headers.get("Content-Type")
+            headers = {"Content-Type": content_type} if content_type else None
+            if kwargs.get("stream"):
+                _cache_while_streaming(
+                    response, CachedResponseWriter(key, url, etag, last_modified, headers)
+                )
+            else:
+                save_cached_response(
+                    key, url, response.content, etag=etag, last_modified=last_modified, headers=headers
+                )
+        elif cached is not None:
+            # The stored validators describe an older document and can no longer be checked
+            delete_cached_responses([key])
+
+    return response
+
+
+def close_session() -> None:
+    """Close all pooled connections (e.g. when the plugin is unloaded)."""
+    global _session
+
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
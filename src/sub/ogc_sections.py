@@ -0,0 +1,38 @@
+"""
+Per-endpoint memory of OGC servers that do not honour the GetCapabilities `sections`
+parameter.
+
+Endpoints that ignored or rejected a reduced-section request are recorded in
+.cache/ogc_sections.json for SECTIONS_DECISION_TTL. Until then, their capabilities
+are requested in full straight away instead of after a wasted request.
+"""
+
+from os.path import join
+
+from .cache import CACHE_DIR
+from .expiring_records import ExpiringRecords
+
+OGC_SECTIONS_FILE = join(CACHE_DIR, "ogc_sections.json")
+SECTIONS_DECISION_TTL = 604800  # 1 week
+
+_full_request_endpoints = ExpiringRecords(OGC_SECTIONS_FILE, SECTIONS_DECISION_TTL)
+
+
+def request_sections(endpoint: str) -> bool:
+    """Whether GetCapabilities requests to `endpoint` should ask for the needed sections only."""
+    return not _full_request_endpoints.contains(endpoint)
+
+
+def record_sections_outcome(endpoint: str, supported: bool) -> None:
+    """
+    Record the outcome of a reduced-section GetCapabilities request.
+
+    Args:
+        endpoint: The capabilities endpoint (service URL and OGC service type)
+        supported: The server answered with the requested sections only
+            (False: it ignored or rejected the parameter)
+    """
+    if supported:
+        _full_request_endpoints.discard(endpoint)
+    else:
+        _full_request_endpoints.record(endpoint)
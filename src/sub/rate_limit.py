@@ -0,0 +1,170 @@
+"""
+Adaptive per-host request limiting for the capability crawlers.
+
+Every host gets a token bucket (requests per second) and a concurrency limit.
+Both grow slowly while the host answers normally, and are halved as soon as it
+throttles (429/503), fails (5xx) or times out, so each server is crawled at the
+highest rate it sustains without tripping its protections.
+
+A request holds its ticket until the response headers arrive. The body of a
+streamed response (stream=True) is downloaded after the ticket is released, so
+long downloads do not count towards the concurrency limit; their number is
+bounded by the callers instead (the OGC loader streams at most two capabilities
+documents per server at a time).
+"""
+
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+
+# Concurrency limits per host
+MAX_CONCURRENCY_PER_HOST = 10
+INITIAL_CONCURRENCY_PER_HOST = 4
+MIN_CONCURRENCY_PER_HOST = 1
+
+# Token bucket rates per host (requests / second)
+MAX_RATE_PER_HOST = 100.0
+INITIAL_RATE_PER_HOST = 25.0
+MIN_RATE_PER_HOST = 1.0
+RATE_INCREASE_STEP = 1.0
+
+# Longest pause honoured from a Retry-After header (seconds)
+MAX_RETRY_AFTER = 60
+
+THROTTLE_STATUS_CODES = (429, 503)
+
+
+class HostRateLimiter:
+    """
+    Token bucket with adaptive (additive increase / multiplicative decrease)
+    rate and concurrency for a single host.
+    """
+
+    def __init__(self, host: str):
+        self.host = host
+        self.rate = INITIAL_RATE_PER_HOST
+        self.concurrency = float(INITIAL_CONCURRENCY_PER_HOST)
+        self.in_flight = 0
+
+        self._tokens = 1.0
+        self._refilled_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._condition = threading.Condition()
+
+    def _refill(self, now: float) -> None:
+        burst = max(1.0, self.concurrency)
+        self._tokens = min(burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def acquire(self) -> None:
+        """Block until a request to the host may start."""
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+
+                if now < self._blocked_until:
+                    self._condition.wait(self._blocked_until - now)
+                    continue
+
+                if self.in_flight >= int(self.concurrency):
+                    self._condition.wait(0.5)
+                    continue
+
+                if self._tokens < 1.0:
+                    self._condition.wait((1.0 - self._tokens) / self.rate)
+                    continue
+
+                self._tokens -= 1.0
+                self.in_flight += 1
+                return
+
+    def release(self, succeeded: bool, retry_after: Optional[float] = None) -> None:
+        """
+        Finish a request and adapt the limits to its outcome.
+
+        Args:
+            succeeded: The host answered normally
+            retry_after: Seconds the host asked us to wait before the next request
+        """
+        with self._condition:
+            self.in_flight = max(0, self.in_flight - 1)
+
+            if succeeded:
+                self.concurrency = min(
+                    MAX_CONCURRENCY_PER_HOST, self.concurrency + 1.0 / max(1.0, self.concurrency)
+                )
+                self.rate = min(MAX_RATE_PER_HOST, self.rate + RATE_INCREASE_STEP)
+            else:
+                self.concurrency = max(MIN_CONCURRENCY_PER_HOST, self.concurrency / 2)
+                self.rate = max(MIN_RATE_PER_HOST, self.rate / 2)
+                self._tokens = min(self._tokens, 0.0)
+
+            if retry_after:
+                self._blocked_until = max(
+                    self._blocked_until, time.monotonic() + min(retry_after, MAX_RETRY_AFTER)
+                )
+
+            self._condition.notify_all()
+
+    def request(self) -> "_RequestTicket":
+        """
+        Context manager wrapping one request to the host:
+
+            with limiter.request() as ticket:
+                response = http_get(url)
+                ticket.record(response)
+
+        Exceptions raised inside the block (timeouts, connection errors) count as failures,
+        except certificate errors: the host answered, it is not congested.
+        """
+        return _RequestTicket(self)
+
+
+class _RequestTicket:
+    def __init__(self, limiter: HostRateLimiter):
+        self.limiter = limiter
+        self.succeeded = True
+        self.retry_after = None
+
+    def record(self, response: requests.Response) -> None:
+        status = response.status_code
+        self.succeeded = status < 500 and status not in THROTTLE_STATUS_CODES
+
+        if status in THROTTLE_STATUS_CODES:
+            try:
+                self.retry_after = float(response.headers.get("Retry-After", ""))
+            except ValueError:
+                self.retry_after = None
+
+    def __enter__(self) -> "_RequestTicket":
+        self.limiter.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if (
+            exc_type is not None
+            and issubclass(exc_type, requests.exceptions.RequestException)
+            and not issubclass(exc_type, requests.exceptions.SSLError)
+        ):
+            self.succeeded = False
+        self.limiter.release(self.succeeded, self.retry_after)
+        return False
+
+
+_host_limiters: Dict[str, HostRateLimiter] = {}
+_host_limiters_lock = threading.Lock()
+
+
+def get_host_limiter(url: str) -> HostRateLimiter:
+    """Return the limiter of the host of `url`, shared by every loader."""
+    host = urlparse(url).netloc.lower()
+    with _host_limiters_lock:
+        limiter = _host_limiters.get(host)
+        if limiter is None:
+            limiter = HostRateLimiter(host)
+            _host_limiters[host] = limiter
+        return limiter
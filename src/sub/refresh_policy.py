@@ -0,0 +1,83 @@
+"""
+Adaptive refresh interval (TTL) of the services' cached layers.
+
+Each service keeps the outcome of its last REFRESH_HISTORY_LENGTH refreshes: whether
+the server's catalog had changed. The TTL starts at DEFAULT_SERVICE_TTL and replays
+that history: it doubles after every unchanged refresh and halves after every change,
+within the bounds set in the QGIS settings (MIN_TTL_SETTING / MAX_TTL_SETTING, in
+hours). Servers that never change are thus refreshed rarely, busy ones often.
+
+A "ttl" (seconds) in a service's services.json entry overrides the adaptive TTL.
+"""
+
+import time
+from typing import List, Optional, Tuple
+
+from qgis.core import QgsSettings
+
+MIN_TTL_SETTING = "grdata/cache/min_ttl_hours"
+MAX_TTL_SETTING = "grdata/cache/max_ttl_hours"
+DEFAULT_MIN_TTL_HOURS = 24  # 1 day
+DEFAULT_MAX_TTL_HOURS = 2160  # 90 days
+DEFAULT_SERVICE_TTL = 604800  # 1 week
+REFRESH_HISTORY_LENGTH = 10
+
+
+def _setting_hours(key: str, default: int) -> int:
+    try:
+        return max(int(QgsSettings().value(key, default)), 1)
+    except (TypeError, ValueError):
+        return default
+
+
+def configured_ttl_bounds() -> Tuple[int, int]:
+    """The (minimum, maximum) adaptive TTL, in seconds."""
+    min_ttl = _setting_hours(MIN_TTL_SETTING, DEFAULT_MIN_TTL_HOURS) * 3600
+    max_ttl = _setting_hours(MAX_TTL_SETTING, DEFAULT_MAX_TTL_HOURS) * 3600
+    return min_ttl, max(min_ttl, max_ttl)
+
+
+def record_refresh(history: Optional[List], changed: bool, refreshed_at: Optional[int] = None) -> List:
+    """
+    Append the outcome of a refresh to a service's refresh history.
+
+    Args:
+        history: The service's refresh history ([unix time, changed] pairs, oldest first)
+        changed: The refresh found a different catalog
+        refreshed_at: Unix time of the refresh (default: now)
+
+    Returns:
+        The new history, holding at most REFRESH_HISTORY_LENGTH refreshes
+    """
+    history = list(history or [])
+    history.append([int(refreshed_at or time.time()), bool(changed)])
+    return history[-REFRESH_HISTORY_LENGTH:]
+
+
+def service_ttl(history: Optional[List], override=None, bounds: Optional[Tuple[int, int]] = None) -> int:
+    """
+    The refresh interval of a service.
+
+    Args:
+        history: The service's refresh history (see record_refresh)
+        override: The "ttl" of the service's services.json entry, in seconds
+        bounds: (minimum, maximum) TTL in seconds (default: configured_ttl_bounds())
+
+    Returns:
+        Seconds after which the service's cached layers are refreshed
+    """
+    if override is not None:
+        try:
+            return max(int(override), 0)
+        except (TypeError, ValueError):
+            pass
+
+    min_ttl, max_ttl = bounds or configured_ttl_bounds()
+    ttl = min(max(DEFAULT_SERVICE_TTL, min_ttl), max_ttl)
+    for entry in history or []:
+        try:
+            changed = bool(entry[1])
+        except (TypeError, IndexError):
+            continue
+        ttl = min(max(ttl // 2 if changed else ttl * 2, min_ttl), max_ttl)
+    return ttl
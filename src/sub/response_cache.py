@@ -0,0 +1,222 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from os.path import join
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .cache import RESPONSES_CACHE_DIR, ensure_cache_directories
+
+# Bodies are stored gzip-compressed, capability documents shrink 10-20x
+BODY_ENCODING = "gzip"
+BODY_COMPRESS_LEVEL = 6
+
+# Each response is a single file: a line of JSON metadata, then the body
+RESPONSE_EXTENSION = ".response"
+
+
+def response_cache_key(url: str, params: Optional[Dict] = None) -> str:
+    """Stable key for a request, independent of query parameter order."""
+    query = "&".join(f"{k}={v}" for k, v in sorted((params or {}).items()))
+    return hashlib.sha256(f"{url}?{query}".encode("utf-8")).hexdigest()
+
+
+def _response_cache_file(key: str) -> str:
+    return join(RESPONSES_CACHE_DIR, f"{key}{RESPONSE_EXTENSION}")
+
+
+def _legacy_response_cache_files(key: str) -> Tuple[str, str]:
+    # Metadata and body were stored in separate files before RESPONSE_EXTENSION
+    return join(RESPONSES_CACHE_DIR, f"{key}.json"), join(RESPONSES_CACHE_DIR, f"{key}.body")
+
+
+def _read_meta(f) -> Optional[Dict[str, object]]:
+    try:
+        meta = json.loads(f.readline().decode("utf-8"))
+    except (UnicodeDecodeError, ValueError):
+        return None
+    return meta if isinstance(meta, dict) else None
+
+
+def load_cached_response_meta(key: str) -> Optional[Dict[str, object]]:
+    """
+    Load the metadata of a cached raw response, without its body.
+
+    Returns:
+        Dict with the stored validators ("etag", "last_modified") and "headers", or
+        None if nothing is cached for the key
+    """
+    try:
+        with open(_response_cache_file(key), "rb") as f:
+            return _read_meta(f)
+    except OSError:
+        return None
+
+
+def load_cached_response_body(key: str, meta: Dict[str, object]) -> Optional[bytes]:
+    """
+    Load the raw (decompressed) body of a cached response.
+
+    Args:
+        key: The response cache key
+        meta: The response's metadata (see load_cached_response_meta)
+
+    Returns:
+        The body, or None if it is missing, unreadable, or was replaced by another
+        response since `meta` was read
+    """
+    try:
+        with open(_response_cache_file(key), "rb") as f:
+            if _read_meta(f) != meta:
+                return None
+            if meta.get("body_encoding") == BODY_ENCODING:
+                with gzip.GzipFile(fileobj=f, mode="rb") as body:
+                    return body.read()
+            return f.read()
+    except Exception:
+        return None
+
+
+def load_cached_response(key: str) -> Optional[Dict[str, object]]:
+    """
+    Load a cached raw response.
+
+    Returns:
+        Dict with the stored validators ("etag", "last_modified"), "headers" and the raw
+        (decompressed) "body", or None if nothing is cached for the key
+    """
+    meta = load_cached_response_meta(key)
+    if meta is None:
+        return None
+
+    body = load_cached_response_body(key, meta)
+    if body is None:
+        return None
+    return {**meta, "body": body}
+
+
+def touch_cached_response(key: str) -> None:
+    """Mark a cached response as used (revalidated), for LRU eviction."""
+    try:
+        os.utime(_response_cache_file(key), None)
+    except OSError:
+        pass
+
+
+def cached_response_usage() -> List[Dict[str, object]]:
+    """
+    Disk usage of every cached response.
+
+    Returns:
+        List of {"key", "bytes" (metadata and body), "last_used" (unix time)}
+    """
+    if not os.path.isdir(RESPONSES_CACHE_DIR):
+        return []
+
+    usage = dict()
+    for file_name in os.listdir(RESPONSES_CACHE_DIR):
+        key, extension = os.path.splitext(file_name)
+        if extension not in (RESPONSE_EXTENSION, ".json", ".body"):
+            continue  # Temporary files of running writes
+        try:
+            stat = os.stat(join(RESPONSES_CACHE_DIR, file_name))
+        except OSError:
+            continue
+        entry = usage.setdefault(key, {"key": key, "bytes": 0, "last_used": 0})
+        entry["bytes"] += stat.st_size
+        entry["last_used"] = max(entry["last_used"], int(stat.st_mtime))
+    return list(usage.values())
+
+
+def delete_cached_responses(keys: Iterable[str]) -> None:
+    """Remove cached responses."""
+    for key in keys:
+        for path in (_response_cache_file(key), *_legacy_response_cache_files(key)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _response_meta(url, etag, last_modified, headers) -> bytes:
+    meta = {
+        "url": url,
+        "etag": etag,
+        "last_modified": last_modified,
+        "headers": headers or {},
+        "body_encoding": BODY_ENCODING,
+        "stored_at": int(time.time()),
+    }
+    # A single line, followed by the body
+    return json.dumps(meta, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def save_cached_response(
+    key: str,
+    url: str,
+    body: bytes,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+    headers: Optional[Dict[str, str]] = None,
+) -> None:
+    """Store a raw response body along with its HTTP validators."""
+    writer = CachedResponseWriter(key, url, etag=etag, last_modified=last_modified, headers=headers)
+    try:
+        writer.write(body)
+        writer.commit()
+    except Exception:
+        writer.discard()
+        raise
+
+
+class CachedResponseWriter:
+    """
+    Store a streamed response body while it is being read, compressing it on the fly
+    without holding it in memory. Nothing is stored unless commit() is called once the
+    whole body has been written; the metadata and the body then replace the previous
+    response at once.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        url: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ):
+        ensure_cache_directories()
+        self._file_path = _response_cache_file(key)
+        self._meta = _response_meta(url, etag, last_modified, headers)
+        self._tmp_file = f"{self._file_path}.{threading.get_ident()}.tmp"
+        self._file = None  # Opened on the first write
+        self._body = None
+
+    def _open(self) -> None:
+        self._file = open(self._tmp_file, "wb")
+        self._file.write(self._meta)
+        self._body = gzip.GzipFile(fileobj=self._file, mode="wb", compresslevel=BODY_COMPRESS_LEVEL)
+
+    def write(self, chunk: bytes) -> None:
+        if self._file is None:
+            self._open()
+        self._body.write(chunk)
+
+    def commit(self) -> None:
+        if self._file is None:
+            self._open()
+        self._body.close()
+        self._file.close()
+        os.replace(self._tmp_file, self._file_path)
+
+    def discard(self) -> None:
+        if self._file is None:
+            return
+        self._body.close()
+        self._file.close()
+        try:
+            os.remove(self._tmp_file)
+        except OSError:
+            pass
@@ -0,0 +1,181 @@
+"""
+Retries and per-host circuit breaking for idempotent capability requests.
+
+Transient failures (timeouts, connection errors, 429 and 5xx answers) are retried
+a few times with jittered exponential backoff. Each host has a circuit breaker
+that opens after repeated failures: while open, requests to the host fail
+immediately instead of each waiting for its own timeout.
+"""
+
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+
+from .http_client import conditional_get
+from .rate_limit import get_host_limiter
+
+MAX_ATTEMPTS = 3
+BACKOFF_BASE = 0.5  # seconds
+BACKOFF_MAX = 8.0  # seconds
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Consecutive failures that open a host's circuit, and how long it stays open
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_OPEN_DURATION = 60  # seconds
+
+# How often a backoff checks whether the calling task was cancelled
+CANCEL_POLL_INTERVAL = 0.1  # seconds
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of sending a request to a host whose circuit is open."""
+
+    def __init__(self, host):
+        super().__init__(f"Circuit open for {host}: too many consecutive failures")
+        self.host = host
+
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker.
+
+    closed: requests go through, consecutive failures are counted
+    open: requests fail immediately, until CIRCUIT_OPEN_DURATION has passed
+    half-open: a single trial request goes through, its outcome closes or re-opens the circuit
+    """
+
+    def __init__(self, host: str):
+        self.host = host
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_request(self) -> None:
+        """Raise CircuitOpenError if the host should not be contacted right now."""
+        with self._lock:
+            if self.opened_at is None:
+                return
+
+            if time.monotonic() - self.opened_at < CIRCUIT_OPEN_DURATION or self._trial_in_flight:
+                raise CircuitOpenError(self.host)
+
+            # Half-open: let one trial request through
+            self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= CIRCUIT_FAILURE_THRESHOLD:
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(url: str) -> CircuitBreaker:
+    """Return the circuit breaker of the host of `url`, shared by every loader."""
+    host = urlparse(url).netloc.lower()
+    with _circuit_breakers_lock:
+        breaker = _circuit_breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(host)
+            _circuit_breakers[host] = breaker
+        return breaker
+
+
+def _backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2**attempt)))
+
+
+def _sleep_unless_cancelled(delay: float, is_cancelled: Optional[Callable[[], bool]]) -> bool:
+    """Sleep for `delay` seconds, waking up early if the task is cancelled. Returns whether it was."""
+    if is_cancelled is None:
+        time.sleep(delay)
+        return False
+
+    deadline = time.monotonic() + delay
+    while not is_cancelled():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(remaining, CANCEL_POLL_INTERVAL))
+    return True
+
+
+def resilient_get(
+    url, params=None, is_cancelled: Optional[Callable[[], bool]] = None, **kwargs
+) -> requests.Response:
+    """
+    Idempotent GET through the host's circuit breaker and rate limiter, retried
+    with jittered exponential backoff on transient failures.
+
+    Args:
+        url: The URL to request
+        params: Optional query parameters
+        is_cancelled: Tells whether the calling task was cancelled (e.g. QgsTask.isCanceled).
+            A cancelled task is not retried: the last failure is returned or raised.
+        **kwargs: Passed through to conditional_get. With stream=True, the host limiter's
+            ticket is released once the headers arrive, before the body is read.
+
+    Raises:
+        CircuitOpenError: The host's circuit is open
+        requests.exceptions.RequestException: The last attempt failed
+
+    Returns:
+        requests.Response (the last one, if every attempt was answered with a retryable status)
+    """
+    breaker = get_circuit_breaker(url)
+    limiter = get_host_limiter(url)
+
+    for attempt in range(MAX_ATTEMPTS):
+        last_attempt = attempt == MAX_ATTEMPTS - 1
+        breaker.before_request()
+
+        try:
+            with limiter.request() as ticket:
+                response = conditional_get(url, params=params, **kwargs)
+                ticket.record(response)
+        except requests.exceptions.SSLError:
+            # Not transient, the caller decides how to handle certificate problems
+            breaker.record_success()
+            raise
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            breaker.record_failure()
+            if last_attempt or _sleep_unless_cancelled(_backoff(attempt), is_cancelled):
+                raise
+            continue
+        except Exception:
+            # Not retried (e.g. too many redirects, a broken chunked body, a failed cache
+            # write), but recorded so that a half-open trial always resolves the breaker
+            breaker.record_failure()
+            raise
+
+        if response.status_code not in RETRY_STATUS_CODES:
+            breaker.record_success()
+            return response
+
+        # Throttling means the host is alive, only server errors count towards the breaker
+        if response.status_code == 429:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+
+        # The host limiter additionally holds every request back for Retry-After
+        if last_attempt or _sleep_unless_cancelled(_backoff(attempt), is_cancelled):
+            return response
+
+    return response
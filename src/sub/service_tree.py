@@ -5,7 +5,8 @@ from qgis.PyQt.QtWidgets import QHeaderView, QPushButton, QTreeWidgetItem
 
 from ..core.layer_hierarchy import LayerGroup
 from ..core.Service import GrdServiceState
-from .capabilities_cache import has_capabilities_cache
+from .capabilities_cache import (has_capabilities_cache,
+                                 services_with_cached_layers)
 from .helper_functions import (cache_service_icon, fillServiceLayers,
                                service_qicon, toggle_tree_widget_all)
 from .tree_item_roles import (ITEM_KIND_GROUP, ITEM_KIND_LAYER,
@@ -30,6 +31,7 @@ class ServiceTreeController:
         self.native_datasource_connections = native_datasource_connections
         self.tr = tr
         self._setup_columns()
+        self.tree.itemExpanded.connect(self._on_item_expanded)
 
     # ------------------------------------------------------------------
     # Column layout
@@ -92,7 +94,9 @@ class ServiceTreeController:
             service_items.append((service_item, service))
 
             if service.loaded:
-                self._populate_loaded_layers(service_item, service, expanded=False)
+                # Cached layers are loaded when the service is first expanded
+                service_item.setChildIndicatorPolicy(QTreeWidgetItem.ShowIndicator)
+                service_item.setToolTip(0, self._service_summary_text(service))
 
         # Sort all groups and services alphabetically
         self._sort_tree_items_recursive(self.tree.invisibleRootItem())
@@ -108,6 +112,16 @@ class ServiceTreeController:
             if self.is_group_item(item):
                 item.setExpanded(True)
 
+    def _service_summary_text(self, service):
+        summary = service.summary or {}
+        text = self.tr("{} layers").format(summary.get("layer_count", 0))
+        geometry_counts = summary.get("geometry_counts") or {}
+        if geometry_counts:
+            text += " (" + ", ".join(
+                f"{count} {geometry}" for geometry, count in sorted(geometry_counts.items())
+            ) + ")"
+        return text
+
     def _service_group_path(self, service):
         config = service.config or {}
         group_path = config.get("group")
@@ -259,7 +273,8 @@ class ServiceTreeController:
         service_name = service.name
         # Build name -> [indexes] map using the service's canonical layer list.
         # This keeps tree metadata stable even when UI sorting changes item order.
-        layers = service.getLayers() or []
+        # (Not getLayers(): rendering, e.g. while filtering, must not fetch or refresh.)
+        layers = service.layers or []
         layer_name_to_indexes = {}
         for layer_idx, layer in enumerate(layers):
             key = str(getattr(layer, "name", "") or "")
@@ -326,10 +341,7 @@ class ServiceTreeController:
         for child in layer_group.children:
             if isinstance(child, LayerGroup):
                 # Create a folder/group item for nested LayerGroup
-                group_item = QTreeWidgetItem()
-                group_item.setText(0, child.name)
-                group_item.setIcon(0, QIcon.fromTheme("folder"))
-                group_item.setData(0, ROLE_ITEM_KIND, ITEM_KIND_LAYER_GROUP)
+                group_item = self._new_layer_group_item(child.name)
                 parent_item.addChild(group_item)
 
                 # Recursively add children of this group
@@ -337,15 +349,46 @@ class ServiceTreeController:
                 group_item.setExpanded(expanded)
             else:
                 # It's a Layer object - add it directly
-                layer_item = QTreeWidgetItem()
-                layer_item.setText(0, child.name)
-                layer_item.setIcon(0, QIcon(child.getIcon()))
-                layer_item.setToolTip(0, f"{child.name} ({child.type})")
-                layer_item.setData(0, ROLE_ITEM_KIND, ITEM_KIND_LAYER)
-                parent_item.addChild(layer_item)
+                parent_item.addChild(self._new_layer_item(child))
 
         parent_item.setExpanded(expanded)
 
+    def _new_layer_group_item(self, name):
+        group_item = QTreeWidgetItem()
+        group_item.setText(0, name)
+        group_item.setIcon(0, QIcon.fromTheme("folder"))
+        group_item.setData(0, ROLE_ITEM_KIND, ITEM_KIND_LAYER_GROUP)
+        return group_item
+
+    def _new_layer_item(self, layer):
+        layer_item = QTreeWidgetItem()
+        layer_item.setText(0, layer.name)
+        layer_item.setIcon(0, QIcon(layer.getIcon()))
+        layer_item.setToolTip(0, f"{layer.name} ({layer.type})")
+        layer_item.setData(0, ROLE_ITEM_KIND, ITEM_KIND_LAYER)
+        return layer_item
+
+    def _layer_group_for_path(self, service_item, layer_path):
+        """Find or create the layer group items leading to a layer path ("A/B/Layer")."""
+        parent_item = service_item
+        segments = [s.strip() for s in str(layer_path or "").split("/") if s.strip()]
+
+        for segment in segments[:-1]:
+            group_item = None
+            for idx in range(parent_item.childCount()):
+                child = parent_item.child(idx)
+                if self._item_kind(child) == ITEM_KIND_LAYER_GROUP and child.text(0) == segment:
+                    group_item = child
+                    break
+
+            if group_item is None:
+                group_item = self._new_layer_group_item(segment)
+                parent_item.addChild(group_item)
+                group_item.setExpanded(True)
+            parent_item = group_item
+
+        return parent_item
+
     def _set_status_text(self, item, text=None):
         base_name = self._service_name(item)
         if text:
@@ -456,13 +499,17 @@ class ServiceTreeController:
             icon = QIcon(cached_icon_path)
             item.setIcon(0, icon)
 
-        if not service.loaded:
-            if not getattr(service, "_grdata_ui_bound", False):
-                service.changed.connect(
-                    lambda state, srv=service, ready_icon=icon:
-                        self._on_service_state_changed(srv, ready_icon, state)
-                )
-                service._grdata_ui_bound = True
+        # Also for loaded services: a background refresh may change their layers
+        if not getattr(service, "_grdata_ui_bound", False):
+            service.changed.connect(
+                lambda state, srv=service, ready_icon=icon:
+                    self._on_service_state_changed(srv, ready_icon, state)
+            )
+            service.layersAdded.connect(
+                lambda layers, layer_paths, srv=service:
+                    self._on_service_layers_added(srv, layers, layer_paths)
+            )
+            service._grdata_ui_bound = True
 
         if service.getLayers() is None:
             self._set_fetch_button(item, service)
@@ -471,6 +518,27 @@ class ServiceTreeController:
         self._populate_loaded_layers(item, service, expanded=True)
         self._set_fetch_button(item, service)
 
+    def _on_item_expanded(self, item):
+        if self.is_service_item(item) and item.childCount() == 0:
+            self.expand_service(item, fetch_if_needed=False)
+
+    def populate_matching_services(self, filter_text):
+        """
+        Populate the cached services not expanded yet that have layers whose name
+        matches `filter_text`, so that filtering the layers of the tree finds them.
+        """
+        text = (filter_text or "").strip()
+        if text == "":
+            return
+
+        matching = set(services_with_cached_layers(text))
+        for item in list(self._iter_tree_items()):
+            if not self.is_service_item(item) or item.childCount() > 0:
+                continue
+            service = self.service_manager.getService(self._service_name(item))
+            if service.loaded and service.id in matching:
+                self._populate_loaded_layers(item, service, expanded=False)
+
     def _iter_tree_items(self):
         stack = [self.tree.topLevelItem(i) for i in range(self.tree.topLevelItemCount() - 1, -1, -1)]
         while stack:
@@ -487,6 +555,28 @@ class ServiceTreeController:
                 return item
         return None
 
+    def _on_service_layers_added(self, service, layers, layer_paths):
+        """Append layers published while the service is still being fetched."""
+        if service.state != GrdServiceState.LOADING:
+            return
+
+        item = self._find_service_item(service)
+        if item is None:
+            return
+
+        use_paths = getattr(service, "type", None) == "esri"
+        for pos, layer in enumerate(layers):
+            parent_item = item
+            if use_paths and pos < len(layer_paths):
+                parent_item = self._layer_group_for_path(item, layer_paths[pos])
+
+            layer_item = self._new_layer_item(layer)
+            layer_item.setData(0, ROLE_SERVICE_NAME, service.name)
+            layer_item.setData(0, ROLE_LAYER_INDEX, layer.id)
+            parent_item.addChild(layer_item)
+
+        item.setExpanded(True)
+
     def _on_service_state_changed(self, service, icon, state):
         item = self._find_service_item(service)
         if item is None:
@@ -512,6 +602,9 @@ class ServiceTreeController:
 
         if state == GrdServiceState.ERROR:
             service._grdata_pending_action = None
+            if not service.layers:
+                # Drop layers streamed by a fetch that ended up failing
+                item.takeChildren()
             self._set_status_text(item)
             item.setIcon(0, icon)
             self._set_fetch_button(item, service)
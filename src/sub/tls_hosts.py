@@ -0,0 +1,42 @@
+"""
+Per-host memory of failed TLS certificate verification.
+
+Hosts whose certificate could not be verified are recorded in .cache/tls_hosts.json
+for TLS_DECISION_TTL. Until then, requests to them skip verification straight away
+instead of starting with a failed handshake. Once the record expires, the next
+request verifies again.
+"""
+
+from os.path import join
+from urllib.parse import urlparse
+
+from .cache import CACHE_DIR
+from .expiring_records import ExpiringRecords
+
+TLS_HOSTS_FILE = join(CACHE_DIR, "tls_hosts.json")
+TLS_DECISION_TTL = 604800  # 1 week
+
+_unverified_hosts = ExpiringRecords(TLS_HOSTS_FILE, TLS_DECISION_TTL)
+
+
+def _host(url: str) -> str:
+    return urlparse(url).netloc.lower()
+
+
+def verify_tls(url: str) -> bool:
+    """Whether requests to the host of `url` should verify its certificate."""
+    return not _unverified_hosts.contains(_host(url))
+
+
+def record_tls_outcome(url: str, verified: bool) -> None:
+    """
+    Record the outcome of a verified request to the host of `url`.
+
+    Args:
+        url: The requested URL
+        verified: The certificate was verified (False: verification failed)
+    """
+    if verified:
+        _unverified_hosts.discard(_host(url))
+    else:
+        _unverified_hosts.record(_host(url))
@@ -0,0 +1,116 @@
+"""Offline tests of the plugin cache's disk budget and orphan sweep."""
+
+import os
+import time
+
+import pytest
+
+pytest.importorskip("qgis.core")
+
+from src.sub import cache, cache_manager  # noqa: E402
+from src.sub import capabilities_cache as capabilities  # noqa: E402
+from src.sub import response_cache as responses  # noqa: E402
+
+NOW = int(time.time())
+OLD = NOW - 2 * cache_manager.RESPONSES_MAX_AGE
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """Point the plugin cache at a temporary directory."""
+    for name in ("ICONS_CACHE_DIR", "CAPABILITIES_CACHE_DIR", "RESPONSES_CACHE_DIR", "CRAWLS_CACHE_DIR"):
+        path = str(tmp_path / name.lower())
+        monkeypatch.setattr(cache, name, path)
+        for module in (capabilities, responses, cache_manager):
+            if hasattr(module, name):
+                monkeypatch.setattr(module, name, path)
+    monkeypatch.setattr(cache, "CAPABILITIES_DB_FILE", str(tmp_path / "capabilities.sqlite"))
+    monkeypatch.setattr(capabilities, "_cache_presence_index", {})
+    cache.ensure_cache_directories()
+    return tmp_path
+
+
+def _service(service_id, last_used):
+    layers = [{"id": 0, "name": f"{service_id} layer", "url": f"http://srv/{service_id}/0", "attributes": {}}]
+    capabilities.save_capabilities_cache(
+        service_id, {"id": service_id, "updated_at": last_used}, {f"http://srv/{service_id}": layers}
+    )
+    assert capabilities.flush_capabilities_cache(timeout=10)
+    conn = capabilities._connection()
+    with conn:
+        conn.execute("UPDATE services SET accessed_at = ? WHERE id = ?", (last_used, service_id))
+
+
+def _file(directory, name, modified_at, size=100):
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    os.utime(path, (modified_at, modified_at))
+    return path
+
+
+def _response(key, modified_at):
+    responses.save_cached_response(key, f"http://srv/{key}", b"<Capabilities/>", etag='"1"')
+    path = os.path.join(cache.RESPONSES_CACHE_DIR, f"{key}{responses.RESPONSE_EXTENSION}")
+    os.utime(path, (modified_at, modified_at))
+
+
+def _service_ids():
+    return sorted(usage["id"] for usage in capabilities.capabilities_cache_usage())
+
+
+def _response_keys():
+    return sorted(usage["key"] for usage in responses.cached_response_usage())
+
+
+def test_budget_evicts_least_recently_used_entries_of_every_store():
+    _file(cache.ICONS_CACHE_DIR, "old.png", 50)
+    _service("old", 100)
+    _response("response", 200)
+    _service("new", NOW)
+    new_bytes = next(usage["bytes"] for usage in capabilities.capabilities_cache_usage() if usage["id"] == "new")
+
+    evicted = cache_manager.enforce_cache_budget(new_bytes)
+
+    assert evicted == 3
+    assert _service_ids() == ["new"]
+    assert os.listdir(cache.ICONS_CACHE_DIR) == []
+    assert _response_keys() == []
+
+
+def test_cache_within_budget_is_kept():
+    _file(cache.ICONS_CACHE_DIR, "icon.png", 50)
+    _service("svc", 100)
+
+    assert cache_manager.enforce_cache_budget(10 * 1024 * 1024) == 0
+    assert _service_ids() == ["svc"]
+    assert os.listdir(cache.ICONS_CACHE_DIR) == ["icon.png"]
+
+
+def test_sweep_removes_orphans_and_stale_entries():
+    _service("kept", NOW)
+    _service("gone", NOW)
+    kept_icon = _file(cache.ICONS_CACHE_DIR, "kept.png", NOW)
+    _file(cache.ICONS_CACHE_DIR, "gone.png", NOW)
+    _response("fresh", NOW)
+    _response("stale", OLD)
+    _file(cache.RESPONSES_CACHE_DIR, "fresh.response.1.tmp", NOW)
+    _file(cache.RESPONSES_CACHE_DIR, "interrupted.response.1.tmp", OLD)
+    _file(cache.CRAWLS_CACHE_DIR, "fresh.json", NOW)
+    _file(cache.CRAWLS_CACHE_DIR, "expired.json", OLD)
+
+    removed = cache_manager.sweep_orphans(["kept"], [kept_icon])
+
+    assert removed == 5
+    assert _service_ids() == ["kept"]
+    assert os.listdir(cache.ICONS_CACHE_DIR) == ["kept.png"]
+    assert _response_keys() == ["fresh"]
+    assert sorted(os.listdir(cache.RESPONSES_CACHE_DIR)) == ["fresh.response", "fresh.response.1.tmp"]
+    assert os.listdir(cache.CRAWLS_CACHE_DIR) == ["fresh.json"]
+
+
+def test_sweep_without_configured_services_removes_nothing():
+    _service("svc", NOW)
+
+    assert cache_manager.sweep_orphans([], []) == 0
+    assert _service_ids() == ["svc"]
@@ -0,0 +1,204 @@
+"""Offline tests of the SQLite capabilities cache and the import of legacy JSON caches."""
+
+import json
+import threading
+
+import pytest
+
+from src.sub import cache
+from src.sub import capabilities_cache as capabilities
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """Point the plugin cache at a temporary directory."""
+    for name in ("ICONS_CACHE_DIR", "CAPABILITIES_CACHE_DIR", "RESPONSES_CACHE_DIR", "CRAWLS_CACHE_DIR"):
+        monkeypatch.setattr(cache, name, str(tmp_path / name.lower()))
+    monkeypatch.setattr(cache, "CAPABILITIES_DB_FILE", str(tmp_path / "capabilities.sqlite"))
+    monkeypatch.setattr(capabilities, "CAPABILITIES_CACHE_DIR", cache.CAPABILITIES_CACHE_DIR)
+    monkeypatch.setattr(capabilities, "_cache_presence_index", {})
+    cache.ensure_cache_directories()
+    return tmp_path
+
+
+def _layer(idx, name, source, geometry="polygon"):
+    # The structure of Layer.toJson
+    return {
+        "id": idx,
+        "name": name,
+        "url": f"{source}/{idx}",
+        "type": "esri",
+        "geometry_type": geometry,
+        "attributes": {"extent": {"xmin": 1, "ymin": 2, "xmax": 3, "ymax": 4}, "fields": ["a"]},
+        "path": f"{source.rsplit('/', 1)[-1]}/{name}",
+    }
+
+
+def _save(service_id, updated_at, entries):
+    future = capabilities.save_capabilities_cache(
+        service_id, {"id": service_id, "updated_at": updated_at, "fingerprints": {"x": "1"}}, entries
+    )
+    assert capabilities.flush_capabilities_cache(timeout=10)
+    future.result()
+
+
+def _entries():
+    return {
+        "http://srv/A/MapServer": [_layer(0, "roads", "http://srv/A/MapServer", "line")],
+        "http://srv/B/MapServer": [_layer(1, "parcels", "http://srv/B/MapServer"), _layer(2, "lakes", "http://srv/B/MapServer")],
+    }
+
+
+def test_cache_blob_round_trip():
+    value = {"name": "Λίμνες", "layers": [1, 2, 3]}
+    blob = capabilities.encode_cache_blob(value)
+
+    assert blob[0] == capabilities.CACHE_ENCODING_VERSION
+    assert capabilities.decode_cache_blob(blob) == value
+    # Written before the encoding was versioned
+    assert capabilities.decode_cache_blob(json.dumps(value)) == value
+    assert capabilities.decode_cache_blob(json.dumps(value).encode("utf-8")) == value
+
+
+def test_save_and_load_round_trip():
+    _save("svc", 100, _entries())
+
+    cached = capabilities.load_capabilities_cache("svc")
+    assert cached["updated_at"] == 100
+    assert cached["fingerprints"] == {"x": "1"}
+    assert cached["layer_count"] == 3
+    assert cached["layers"] == [layer for layers in _entries().values() for layer in layers]
+
+    summary = capabilities.load_capabilities_index()["svc"]
+    assert summary == {"updated_at": 100, "layer_count": 3, "geometry_counts": {"line": 1, "polygon": 2}}
+
+    assert [layer["name"] for layer in capabilities.load_cached_layers("svc", start=1, count=1)] == ["parcels"]
+    assert capabilities.services_with_cached_layers("LAKE") == ["svc"]
+    assert capabilities.has_capabilities_cache("svc")
+    assert capabilities.load_capabilities_cache("other") is None
+
+
+def test_layer_name_filter_matches_wildcards_literally():
+    layers = [
+        _layer(0, "100% coverage", "http://srv/A/MapServer"),
+        _layer(1, "land_use", "http://srv/A/MapServer"),
+    ]
+    _save("a", 100, {"http://srv/A/MapServer": layers})
+    _save("b", 100, {"http://srv/B/MapServer": [_layer(0, "1000 coverage", "http://srv/B/MapServer")]})
+    _save("c", 100, {"http://srv/C/MapServer": [_layer(0, "landXuse", "http://srv/C/MapServer")]})
+
+    assert capabilities.services_with_cached_layers("0% cov") == ["a"]
+    assert capabilities.services_with_cached_layers("d_u") == ["a"]
+    assert sorted(capabilities.services_with_cached_layers("COVERAGE")) == ["a", "b"]
+    assert capabilities.services_with_cached_layers("\\") == []
+
+
+def test_unchanged_sources_are_not_rewritten():
+    _save("svc", 100, _entries())
+
+    entries = _entries()
+    entries["http://srv/B/MapServer"][1]["name"] = "reservoirs"
+    _save("svc", 200, entries)
+
+    updated = dict(
+        capabilities._connection().execute("SELECT source, updated_at FROM sources WHERE service_id = 'svc'")
+    )
+    assert updated == {"http://srv/A/MapServer": 100, "http://srv/B/MapServer": 200}
+    assert [layer["name"] for layer in capabilities.load_cached_layers("svc")] == ["roads", "parcels", "reservoirs"]
+
+
+def test_delete_capabilities_cache():
+    _save("a", 100, _entries())
+    _save("b", 100, _entries())
+
+    capabilities.delete_capabilities_cache(["a"]).result(timeout=10)
+
+    assert sorted(usage["id"] for usage in capabilities.capabilities_cache_usage()) == ["b"]
+    assert not capabilities.has_capabilities_cache("a")
+    assert capabilities.load_cached_layers("a") == []
+
+
+def test_delete_drops_a_queued_save():
+    _save("a", 100, _entries())
+    release = threading.Event()
+    capabilities._writer.submit("block", release.wait)
+
+    capabilities.save_capabilities_cache("a", {"id": "a", "updated_at": 200}, _entries())
+    removed = capabilities.delete_capabilities_cache(["a"])
+    assert not capabilities.has_capabilities_cache("a")
+
+    release.set()
+    removed.result(timeout=10)
+    assert capabilities.capabilities_cache_usage() == []
+
+
+def test_queued_saves_of_a_service_are_coalesced(monkeypatch):
+    writes = []
+    save = capabilities._save
+
+    def counting_save(safe_id, *args):
+        writes.append(safe_id)
+        save(safe_id, *args)
+
+    monkeypatch.setattr(capabilities, "_save", counting_save)
+    release = threading.Event()
+    capabilities._writer.submit("block", release.wait)
+
+    futures = [
+        capabilities.save_capabilities_cache("svc", {"id": "svc", "updated_at": updated_at}, _entries())
+        for updated_at in (100, 200, 300)
+    ]
+    assert all(future is futures[0] for future in futures)
+
+    release.set()
+    futures[0].result(timeout=10)
+    assert writes == ["svc"]
+    assert capabilities.load_capabilities_cache("svc")["updated_at"] == 300
+
+
+def test_flush_times_out_while_writing():
+    release = threading.Event()
+    capabilities._writer.submit("block", release.wait)
+
+    assert not capabilities.flush_capabilities_cache(timeout=0.05)
+
+    release.set()
+    assert capabilities.flush_capabilities_cache(timeout=10)
+
+
+def test_legacy_json_cache_is_imported(cache_dir):
+    layers = [
+        {"id": 0, "name": "roads", "url": "http://srv/A/MapServer/0", "type": "esri", "attributes": {}},
+        {"id": 1, "name": "Sub/lakes", "url": "http://srv/A/MapServer/1", "type": "esri", "attributes": {}},
+    ]
+    legacy = {
+        "id": "legacy",
+        "url": "http://srv",
+        "updated_at": 50,
+        "layers": layers,
+        "layer_structure": {
+            "type": "group",
+            "name": "root",
+            "children": [
+                {"type": "layer", "layer_json": layers[0]},
+                {
+                    "type": "group",
+                    "name": "Sub",
+                    "children": [{"type": "layer", "layer_json": layers[1]}],
+                },
+            ],
+        },
+    }
+    legacy_file = cache_dir / "capabilities_cache_dir" / "legacy.json"
+    legacy_file.write_text(json.dumps(legacy), encoding="utf-8")
+
+    index = capabilities.load_capabilities_index()
+
+    assert index["legacy"]["updated_at"] == 50
+    assert index["legacy"]["layer_count"] == 2
+    assert not legacy_file.exists()
+
+    cached = capabilities.load_capabilities_cache("legacy")
+    assert "layer_structure" not in cached
+    # The hierarchy is kept as layer paths; names with "/" do not repeat their group
+    assert [layer["path"] for layer in cached["layers"]] == ["roads", "Sub/lakes"]
@@ -0,0 +1,233 @@
+"""Offline tests of the streaming GetCapabilities / DescribeFeatureType parsers."""
+
+from src.sub.capabilities_parser import (CURRENT_UPDATE_SEQUENCE,
+                                         parse_capabilities,
+                                         parse_feature_type_geometries)
+
+WFS_1_1 = b"""<?xml version="1.0" encoding="UTF-8"?>
+<wfs:WFS_Capabilities version="1.1.0" updateSequence="42"
+    xmlns:wfs="http://www.opengis.net/wfs" xmlns:ows="http://www.opengis.net/ows">
+  <ows:ServiceIdentification><ows:Title>Service</ows:Title></ows:ServiceIdentification>
+  <FeatureTypeList>
+    <FeatureType>
+      <Name>ns:roads</Name>
+      <Title>Roads</Title>
+      <Abstract>Road network</Abstract>
+      <DefaultSRS>urn:ogc:def:crs:EPSG::2100</DefaultSRS>
+      <OtherSRS>urn:ogc:def:crs:EPSG::4326</OtherSRS>
+      <ows:WGS84BoundingBox>
+        <ows:LowerCorner>19.5 34.8</ows:LowerCorner>
+        <ows:UpperCorner>28.2 41.7</ows:UpperCorner>
+      </ows:WGS84BoundingBox>
+    </FeatureType>
+    <FeatureType>
+      <Name>ns:lakes</Name>
+      <Title>Lakes</Title>
+      <DefaultSRS>EPSG:4326</DefaultSRS>
+    </FeatureType>
+  </FeatureTypeList>
+</wfs:WFS_Capabilities>
+"""
+
+WFS_2_0 = b"""<?xml version="1.0" encoding="UTF-8"?>
+<wfs:WFS_Capabilities version="2.0.0"
+    xmlns:wfs="http://www.opengis.net/wfs/2.0" xmlns:ows="http://www.opengis.net/ows/1.1">
+  <wfs:FeatureTypeList>
+    <wfs:FeatureType>
+      <wfs:Name>ns:parcels</wfs:Name>
+      <wfs:Title>Parcels</wfs:Title>
+      <wfs:DefaultCRS>urn:ogc:def:crs:EPSG::2100</wfs:DefaultCRS>
+      <ows:WGS84BoundingBox>
+        <ows:LowerCorner>20 35</ows:LowerCorner>
+        <ows:UpperCorner>27 42</ows:UpperCorner>
+      </ows:WGS84BoundingBox>
+    </wfs:FeatureType>
+  </wfs:FeatureTypeList>
+</wfs:WFS_Capabilities>
+"""
+
+WMS_1_1 = b"""<?xml version="1.0" encoding="UTF-8"?>
+<WMT_MS_Capabilities version="1.1.1">
+  <Service><Name>OGC:WMS</Name><Title>Service</Title></Service>
+  <Capability>
+    <Layer>
+      <Title>Root</Title>
+      <SRS>EPSG:4326</SRS>
+      <LatLonBoundingBox minx="19" miny="34" maxx="29" maxy="42"/>
+      <Layer>
+        <Name>ortho</Name>
+        <Title>Orthophotos</Title>
+        <SRS>EPSG:2100</SRS>
+        <SRS>EPSG:3857</SRS>
+        <LatLonBoundingBox minx="20.5" miny="35.5" maxx="26.5" maxy="41.5"/>
+      </Layer>
+    </Layer>
+  </Capability>
+</WMT_MS_Capabilities>
+"""
+
+WMS_1_3 = b"""<?xml version="1.0" encoding="UTF-8"?>
+<WMS_Capabilities version="1.3.0" updateSequence="2024-01-01T00:00:00Z"
+    xmlns="http://www.opengis.net/wms">
+  <Service><Name>WMS</Name><Title>Service</Title></Service>
+  <Capability>
+    <Layer>
+      <Title>Root</Title>
+      <CRS>EPSG:2100</CRS>
+      <Layer>
+        <Name>grid</Name>
+        <Title>Grid</Title>
+        <EX_GeographicBoundingBox>
+          <westBoundLongitude>19.1</westBoundLongitude>
+          <eastBoundLongitude>29.6</eastBoundLongitude>
+          <southBoundLatitude>34.3</southBoundLatitude>
+          <northBoundLatitude>41.8</northBoundLatitude>
+        </EX_GeographicBoundingBox>
+        <Layer>
+          <Name>grid:cells</Name>
+          <Title>Cells</Title>
+        </Layer>
+      </Layer>
+    </Layer>
+  </Capability>
+</WMS_Capabilities>
+"""
+
+OWS_EXCEPTION = b"""<?xml version="1.0" encoding="UTF-8"?>
+<ows:ExceptionReport version="2.0.0" xmlns:ows="http://www.opengis.net/ows/1.1">
+  <ows:Exception exceptionCode="InvalidParameterValue" locator="sections">
+    <ows:ExceptionText>Unknown section</ows:ExceptionText>
+  </ows:Exception>
+</ows:ExceptionReport>
+"""
+
+WMS_EXCEPTION = b"""<?xml version="1.0" encoding="UTF-8"?>
+<ServiceExceptionReport version="1.3.0" xmlns="http://www.opengis.net/ogc">
+  <ServiceException code="CurrentUpdateSequence">Document is current</ServiceException>
+</ServiceExceptionReport>
+"""
+
+DESCRIBE_FEATURE_TYPE = b"""<?xml version="1.0" encoding="UTF-8"?>
+<xsd:schema xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:gml="http://www.opengis.net/gml"
+    xmlns:ns="http://example.org/ns" targetNamespace="http://example.org/ns">
+  <xsd:complexType name="roadsType">
+    <xsd:complexContent>
+      <xsd:extension base="gml:AbstractFeatureType">
+        <xsd:sequence>
+          <xsd:element name="name" type="xsd:string"/>
+          <xsd:element name="the_geom" type="gml:MultiCurvePropertyType"/>
+        </xsd:sequence>
+      </xsd:extension>
+    </xsd:complexContent>
+  </xsd:complexType>
+  <xsd:element name="roads" type="ns:roadsType" substitutionGroup="gml:_Feature"/>
+  <xsd:element name="lakes" substitutionGroup="gml:_Feature">
+    <xsd:complexType>
+      <xsd:sequence>
+        <xsd:element name="geom" type="gml:SurfacePropertyType"/>
+      </xsd:sequence>
+    </xsd:complexType>
+  </xsd:element>
+  <xsd:complexType name="anyType">
+    <xsd:sequence>
+      <xsd:element name="geom" type="gml:GeometryPropertyType"/>
+    </xsd:sequence>
+  </xsd:complexType>
+  <xsd:element name="mixed" type="ns:anyType"/>
+  <xsd:element name="table" type="ns:missingType"/>
+</xsd:schema>
+"""
+
+
+def _chunks(document: bytes, size: int = 7):
+    """Feed documents in small chunks, splitting tags and text like a download does."""
+    return [document[i : i + size] for i in range(0, len(document), size)]
+
+
+def test_wfs_1_1_records():
+    parser = parse_capabilities(_chunks(WFS_1_1))
+
+    assert parser.root == "WFS_Capabilities"
+    assert parser.update_sequence == "42"
+    assert parser.sections == ["ServiceIdentification", "FeatureTypeList"]
+    assert parser.exception_code is None
+    assert parser.records == [
+        {
+            "name": "ns:roads",
+            "title": "Roads",
+            "abstract": "Road network",
+            "crs": "urn:ogc:def:crs:EPSG::2100",
+            "bbox": (19.5, 34.8, 28.2, 41.7),
+            "layers": [],
+        },
+        {
+            "name": "ns:lakes",
+            "title": "Lakes",
+            "abstract": None,
+            "crs": "EPSG:4326",
+            "bbox": None,
+            "layers": [],
+        },
+    ]
+
+
+def test_wfs_2_0_records():
+    parser = parse_capabilities(_chunks(WFS_2_0))
+
+    assert parser.sections == ["FeatureTypeList"]
+    assert [record["name"] for record in parser.records] == ["ns:parcels"]
+    assert parser.records[0]["crs"] == "urn:ogc:def:crs:EPSG::2100"
+    assert parser.records[0]["bbox"] == (20.0, 35.0, 27.0, 42.0)
+
+
+def test_wms_1_1_nested_layers():
+    parser = parse_capabilities(_chunks(WMS_1_1))
+
+    assert parser.root == "WMT_MS_Capabilities"
+    assert parser.sections == ["Service", "Capability"]
+    (root,) = parser.records
+    assert root["name"] is None
+    assert root["bbox"] == (19.0, 34.0, 29.0, 42.0)
+
+    (ortho,) = root["layers"]
+    assert ortho["name"] == "ortho"
+    assert ortho["crs"] == "EPSG:2100"  # The first SRS
+    assert ortho["bbox"] == (20.5, 35.5, 26.5, 41.5)
+
+
+def test_wms_1_3_nested_layers():
+    parser = parse_capabilities(_chunks(WMS_1_3))
+
+    assert parser.update_sequence == "2024-01-01T00:00:00Z"
+    (root,) = parser.records
+    assert root["crs"] == "EPSG:2100"
+
+    (grid,) = root["layers"]
+    assert grid["bbox"] == (19.1, 34.3, 29.6, 41.8)
+    assert [layer["name"] for layer in grid["layers"]] == ["grid:cells"]
+    assert grid["layers"][0]["bbox"] is None
+
+
+def test_ows_exception_report():
+    parser = parse_capabilities(_chunks(OWS_EXCEPTION))
+
+    assert parser.records == []
+    assert parser.exception_code == "InvalidParameterValue"
+    assert parser.exception_locator == "sections"
+    assert parser.rejects_sections
+    assert not parser.current
+
+
+def test_wms_exception_report_current():
+    parser = parse_capabilities(_chunks(WMS_EXCEPTION))
+
+    assert parser.exception_code == CURRENT_UPDATE_SEQUENCE
+    assert parser.current
+    assert not parser.rejects_sections
+
+
+def test_feature_type_geometries():
+    geometries = parse_feature_type_geometries(_chunks(DESCRIBE_FEATURE_TYPE))
+
+    # Named and anonymous types; generic geometries and unknown types are left out
+    assert geometries == {"roads": "MultiLineString", "lakes": "Polygon"}
@@ -0,0 +1,114 @@
+"""
+Offline test of the ESRI crawlers: the concurrent crawler must produce the same
+layers and hierarchy paths as the serial one, with and without {service}/layers
+batching. Needs the QGIS Python bindings (QgsTask).
+"""
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("qgis.core")
+
+from src.core import ESRIService as esri_module  # noqa: E402
+from src.core.ESRIService import LoadEsriAsync  # noqa: E402
+
+BASE = "http://example.org/arcgis/rest/services"
+
+
+def _layer_definition(name, geometry_type, xmin):
+    return {
+        "name": name,
+        "geometryType": geometry_type,
+        "fields": [{"name": "code", "domain": {"description": "codes"}}],
+        "extent": {"xmin": xmin, "ymin": 0, "xmax": xmin + 1, "ymax": 1},
+    }
+
+
+def _server():
+    """Directory with a root service, nested folders, an excluded and a missing folder, and a failing service."""
+    server = {
+        BASE: {
+            "folders": ["Cadastre", "Networks", "Hidden", "temp"],
+            "services": [{"name": "Basemap", "type": "MapServer"}],
+        },
+        f"{BASE}/Cadastre": {
+            "folders": [],
+            "services": [
+                {"name": "Cadastre/Parcels", "type": "FeatureServer"},
+                {"name": "Cadastre/Imagery", "type": "ImageServer"},
+            ],
+        },
+        f"{BASE}/Networks": {
+            "services": [
+                {"name": "Networks/Water", "type": "MapServer"},
+                {"name": "Networks/Broken", "type": "MapServer"},
+            ],
+        },
+    }
+
+    services = {
+        f"{BASE}/Basemap/MapServer": ["roads", "rivers", "labels"],
+        f"{BASE}/Cadastre/Parcels/FeatureServer": ["parcels", "buildings"],
+        f"{BASE}/Cadastre/Imagery/ImageServer": [],
+        f"{BASE}/Networks/Water/MapServer": ["pipes", "valves", "zones", "meters"],
+    }
+    for url, names in services.items():
+        server[url] = {
+            "currentVersion": 10.9,
+            "layers": [{"id": i, "name": name} for i, name in enumerate(names)],
+        }
+        definitions = []
+        for i, name in enumerate(names):
+            definition = _layer_definition(name, "esriGeometryPolygon" if i % 2 else "esriGeometryPoint", i)
+            server[f"{url}/{i}"] = definition
+            definitions.append({**definition, "id": i})
+        server[f"{url}/layers"] = {"layers": definitions, "tables": []}
+
+    # A service whose definitions fail: its layers keep empty attributes
+    server[f"{BASE}/Networks/Broken/MapServer"] = {"layers": [{"id": 0, "name": "broken"}]}
+    return server
+
+
+class _Response:
+    def __init__(self, payload):
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+@pytest.fixture
+def esri_server(monkeypatch):
+    server = _server()
+
+    def resilient_get(url, params=None, **kwargs):
+        if url not in server:
+            return _Response({"error": {"code": 404, "message": "Not found"}})
+        return _Response(server[url])
+
+    monkeypatch.setattr(esri_module, "resilient_get", resilient_get)
+    return server
+
+
+def _crawl(**kwargs):
+    task = LoadEsriAsync(BASE, resume=False, **kwargs)
+    assert task.run()
+    return task
+
+
+@pytest.mark.parametrize("batch_layers", [True, False])
+def test_concurrent_crawl_matches_serial_crawl(esri_server, batch_layers):
+    serial = _crawl(concurrent=False, batch_layers=batch_layers)
+    concurrent = _crawl(concurrent=True, batch_layers=batch_layers, max_workers=4)
+
+    assert len(serial.layers) == 10
+    assert concurrent.layers == serial.layers
+    assert concurrent.layer_paths == serial.layer_paths
+
+
+def test_batched_crawl_matches_per_layer_crawl(esri_server):
+    batched = _crawl(concurrent=True, batch_layers=True)
+    per_layer = _crawl(concurrent=True, batch_layers=False)
+
+    assert batched.layers == per_layer.layers
+    assert batched.layer_paths == per_layer.layer_paths
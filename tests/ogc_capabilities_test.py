@@ -0,0 +1,327 @@
+"""
+Offline tests of the OGC capabilities requests: the reduced-section request and its
+fallbacks, and the updateSequence delta refresh. The network is replaced by canned
+responses. Needs the QGIS Python bindings (QgsTask).
+"""
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("qgis.core")
+
+import requests  # noqa: E402
+
+from src.core import OGCService as ogc_module  # noqa: E402
+from src.core.OGCService import LoadOGCAsync  # noqa: E402
+from src.sub import ogc_sections, tls_hosts  # noqa: E402
+from src.sub.expiring_records import ExpiringRecords  # noqa: E402
+
+URL = "http://example.org/geoserver/ows"
+WFS_ENDPOINT = f"{URL}?service=WFS"
+WMS_ENDPOINT = f"{URL}?service=WMS"
+
+SECTIONED_WFS_1_1 = b"""<?xml version="1.0" encoding="UTF-8"?>
+<wfs:WFS_Capabilities version="1.1.0" updateSequence="7"
+    xmlns:wfs="http://www.opengis.net/wfs" xmlns:ogc="http://www.opengis.net/ogc">
+  <FeatureTypeList>
+    <FeatureType><Name>ns:roads</Name><Title>Roads</Title><DefaultSRS>EPSG:2100</DefaultSRS></FeatureType>
+  </FeatureTypeList>
+  <ogc:Filter_Capabilities><ogc:Spatial_Capabilities/></ogc:Filter_Capabilities>
+</wfs:WFS_Capabilities>
+"""
+
+FULL_WFS_1_1 = b"""<?xml version="1.0" encoding="UTF-8"?>
+<wfs:WFS_Capabilities version="1.1.0" updateSequence="8"
+    xmlns:wfs="http://www.opengis.net/wfs" xmlns:ows="http://www.opengis.net/ows"
+    xmlns:ogc="http://www.opengis.net/ogc">
+  <ows:ServiceIdentification><ows:Title>Service</ows:Title></ows:ServiceIdentification>
+  <ows:ServiceProvider><ows:ProviderName>Provider</ows:ProviderName></ows:ServiceProvider>
+  <ows:OperationsMetadata/>
+  <FeatureTypeList>
+    <FeatureType><Name>ns:roads</Name><Title>Roads</Title><DefaultSRS>EPSG:2100</DefaultSRS></FeatureType>
+    <FeatureType><Name>ns:lakes</Name><Title>Lakes</Title><DefaultSRS>EPSG:2100</DefaultSRS></FeatureType>
+  </FeatureTypeList>
+  <ogc:Filter_Capabilities/>
+</wfs:WFS_Capabilities>
+"""
+
+SECTIONED_WMS_1_3 = b"""<?xml version="1.0" encoding="UTF-8"?>
+<WMS_Capabilities version="1.3.0" updateSequence="3" xmlns="http://www.opengis.net/wms">
+  <Capability>
+    <Layer><Title>Root</Title><Layer><Name>ortho</Name><Title>Orthophotos</Title></Layer></Layer>
+  </Capability>
+</WMS_Capabilities>
+"""
+
+SECTIONS_EXCEPTION = b"""<?xml version="1.0" encoding="UTF-8"?>
+<ows:ExceptionReport version="1.1.0" xmlns:ows="http://www.opengis.net/ows">
+  <ows:Exception exceptionCode="InvalidParameterValue" locator="sections"/>
+</ows:ExceptionReport>
+"""
+
+CURRENT_EXCEPTION = b"""<?xml version="1.0" encoding="UTF-8"?>
+<ows:ExceptionReport version="1.1.0" xmlns:ows="http://www.opengis.net/ows">
+  <ows:Exception exceptionCode="CurrentUpdateSequence" locator="updateSequence"/>
+</ows:ExceptionReport>
+"""
+
+INVALID_SEQUENCE_EXCEPTION = b"""<?xml version="1.0" encoding="UTF-8"?>
+<ows:ExceptionReport version="1.1.0" xmlns:ows="http://www.opengis.net/ows">
+  <ows:Exception exceptionCode="InvalidUpdateSequence" locator="updateSequence"/>
+</ows:ExceptionReport>
+"""
+
+DESCRIBE_ROADS = b"""<?xml version="1.0" encoding="UTF-8"?>
+<xsd:schema xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:gml="http://www.opengis.net/gml">
+  <xsd:element name="roads">
+    <xsd:complexType><xsd:sequence><xsd:element name="geom" type="gml:MultiCurvePropertyType"/></xsd:sequence></xsd:complexType>
+  </xsd:element>
+</xsd:schema>
+"""
+
+PREVIOUS_WFS_LAYERS = [{"id": 0, "name": "Roads", "url": f"{URL}?typename=ns:roads", "type": "wfs", "attributes": {}}]
+
+
+class _Response:
+    def __init__(self, body=b"", status_code=200):
+        self.body = body
+        self.status_code = status_code
+        self.closed = False
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.body), chunk_size):
+            yield self.body[i : i + chunk_size]
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error", response=self)
+
+    def close(self):
+        self.closed = True
+
+
+class _Server:
+    """Answers the capabilities requests with the responses queued per service, recording the requests."""
+
+    def __init__(self):
+        self.responses = {"WFS": [], "WMS": []}
+        self.requests = []
+
+    def __call__(self, url, params=None, **kwargs):
+        params = dict(params or {})
+        self.requests.append(params)
+        queued = self.responses[params["service"]]
+        return queued.pop(0) if queued else _Response(status_code=500)
+
+    def sent(self, service):
+        return [params for params in self.requests if params["service"] == service]
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    server = _Server()
+    monkeypatch.setattr(ogc_module, "resilient_get", server)
+    monkeypatch.setattr(
+        ogc_sections, "_full_request_endpoints", ExpiringRecords(str(tmp_path / "ogc_sections.json"), 3600)
+    )
+    monkeypatch.setattr(tls_hosts, "_unverified_hosts", ExpiringRecords(str(tmp_path / "tls_hosts.json"), 3600))
+    return server
+
+
+def test_sectioned_answer_with_filter_capabilities_supports_sections(server):
+    server.responses["WFS"] = [_Response(SECTIONED_WFS_1_1)]
+
+    parser = LoadOGCAsync(URL)._get_capabilities(URL, "WFS")
+
+    assert server.sent("WFS")[0]["sections"] == "FeatureTypeList"
+    assert parser.sections == ["FeatureTypeList", "Filter_Capabilities"]
+    assert ogc_sections.request_sections(WFS_ENDPOINT)
+
+
+def test_ignored_sections_are_remembered(server):
+    server.responses["WFS"] = [_Response(FULL_WFS_1_1), _Response(FULL_WFS_1_1)]
+
+    task = LoadOGCAsync(URL)
+    assert [record["name"] for record in task._get_capabilities(URL, "WFS").records] == ["ns:roads", "ns:lakes"]
+    assert not ogc_sections.request_sections(WFS_ENDPOINT)
+
+    # The next request asks for the full document straight away
+    task._get_capabilities(URL, "WFS")
+    assert "sections" not in server.sent("WFS")[1]
+
+
+def test_sections_exception_falls_back_to_full_capabilities(server):
+    server.responses["WFS"] = [_Response(SECTIONS_EXCEPTION), _Response(FULL_WFS_1_1)]
+
+    parser = LoadOGCAsync(URL)._get_capabilities(URL, "WFS")
+
+    assert parser.update_sequence == "8"
+    assert [params.get("sections") for params in server.sent("WFS")] == ["FeatureTypeList", None]
+    assert not ogc_sections.request_sections(WFS_ENDPOINT)
+
+
+def test_http_error_falls_back_to_full_capabilities(server):
+    server.responses["WMS"] = [_Response(status_code=400), _Response(SECTIONED_WMS_1_3)]
+
+    task = LoadOGCAsync(URL)
+    parser = task._get_capabilities(URL, "WMS")
+
+    assert parser.update_sequence == "3"
+    assert [params.get("sections") for params in server.sent("WMS")] == ["Capability", None]
+    assert not ogc_sections.request_sections(WMS_ENDPOINT)
+    assert task.exception is None
+
+
+def test_failed_full_request_gives_up(server):
+    server.responses["WFS"] = [_Response(status_code=400), _Response(status_code=500)]
+
+    task = LoadOGCAsync(URL)
+
+    assert task._get_capabilities(URL, "WFS") is None
+    assert len(server.sent("WFS")) == 2
+    assert isinstance(task.exception, requests.exceptions.HTTPError)
+
+
+def test_not_modified_answer_is_current(server):
+    server.responses["WFS"] = [_Response(status_code=304)]
+
+    parser = LoadOGCAsync(URL)._get_capabilities(URL, "WFS", update_sequence="7")
+
+    assert parser.current
+    assert server.sent("WFS")[0]["updateSequence"] == "7"
+    # No document to judge the sections by
+    assert ogc_sections.request_sections(WFS_ENDPOINT)
+
+
+def test_current_update_sequence_exception(server):
+    server.responses["WFS"] = [_Response(CURRENT_EXCEPTION)]
+
+    parser = LoadOGCAsync(URL)._get_capabilities(URL, "WFS", update_sequence="7")
+
+    assert parser.current
+    assert len(server.sent("WFS")) == 1
+    assert ogc_sections.request_sections(WFS_ENDPOINT)
+
+
+@pytest.mark.parametrize("rejection", [_Response(status_code=400), _Response(INVALID_SEQUENCE_EXCEPTION)])
+def test_rejected_update_sequence_is_dropped(server, rejection):
+    server.responses["WFS"] = [rejection, _Response(SECTIONED_WFS_1_1)]
+
+    parser = LoadOGCAsync(URL)._get_capabilities(URL, "WFS", update_sequence="bogus")
+
+    assert parser.update_sequence == "7"
+    first, second = server.sent("WFS")
+    assert first["updateSequence"] == "bogus" and "updateSequence" not in second
+    # The sections were not blamed for the rejected updateSequence
+    assert second["sections"] == "FeatureTypeList"
+    assert ogc_sections.request_sections(WFS_ENDPOINT)
+
+
+def test_current_endpoint_reuses_previous_layers(server):
+    server.responses["WFS"] = [_Response(CURRENT_EXCEPTION)]
+    server.responses["WMS"] = [_Response(SECTIONED_WMS_1_3)]
+    previous = {"wfs": {"update_sequence": "7", "layers": PREVIOUS_WFS_LAYERS}, "wms": {"update_sequence": "2"}}
+
+    task = LoadOGCAsync(URL, describe_feature_types=False, previous_endpoints=previous)
+    layers = task.query_OGC_server(URL)
+
+    assert layers[0] == PREVIOUS_WFS_LAYERS[0] and layers[0] is not PREVIOUS_WFS_LAYERS[0]
+    assert [layer["name"] for layer in layers[1:]] == ["Orthophotos"]
+    assert task.update_sequences == {"wfs": "7", "wms": "3"}
+    # The updateSequence is only sent for endpoints with layers to reuse
+    assert server.sent("WFS")[0]["updateSequence"] == "7"
+    assert "updateSequence" not in server.sent("WMS")[0]
+
+
+def test_failed_endpoint_reuses_previous_layers(server):
+    server.responses["WMS"] = [_Response(SECTIONED_WMS_1_3)]
+    previous = {"wfs": {"update_sequence": "7", "layers": PREVIOUS_WFS_LAYERS}}
+
+    task = LoadOGCAsync(URL, describe_feature_types=False, previous_endpoints=previous)
+    layers = task.query_OGC_server(URL)
+
+    assert layers[0] == PREVIOUS_WFS_LAYERS[0]
+    assert task.update_sequences["wfs"] == "7"
+
+
+def test_full_refresh_ignores_update_sequence(server):
+    server.responses["WFS"] = [_Response(SECTIONED_WFS_1_1)]
+    previous = {"wfs": {"update_sequence": "7", "layers": PREVIOUS_WFS_LAYERS}}
+
+    task = LoadOGCAsync(URL, describe_feature_types=False, previous_endpoints=previous, delta=False)
+    layers = task.query_OGC_server(URL)
+
+    assert "updateSequence" not in server.sent("WFS")[0]
+    assert [layer["name"] for layer in layers] == ["Roads"]
+
+
+def _batches(task, monkeypatch):
+    """Record the batches a task publishes (from its worker threads, without an event loop)."""
+    batches = []
+    emit_batch = task._emit_batch
+
+    def record_batch(layers):
+        # What batchLoaded would carry
+        if layers:
+            batches.append([dict(layer) for layer in layers])
+        emit_batch(layers)
+
+    monkeypatch.setattr(task, "_emit_batch", record_batch)
+    return batches
+
+
+def test_wfs_and_wms_are_loaded_concurrently(server, monkeypatch):
+    server.responses["WFS"] = [_Response(SECTIONED_WFS_1_1)]
+    server.responses["WMS"] = [_Response(SECTIONED_WMS_1_3)]
+
+    task = LoadOGCAsync(URL, describe_feature_types=False)
+    batches = _batches(task, monkeypatch)
+
+    assert task.run()
+    # WFS layers first, whichever endpoint answered first
+    assert [(layer["type"], layer["name"]) for layer in task.layers] == [("wfs", "Roads"), ("wms", "Orthophotos")]
+    assert sorted(batch[0]["type"] for batch in batches) == ["wfs", "wms"]
+    assert task.update_sequences == {"wfs": "7", "wms": "3"}
+
+
+def test_one_failed_endpoint_keeps_the_other(server, monkeypatch):
+    server.responses["WMS"] = [_Response(SECTIONED_WMS_1_3)]
+
+    task = LoadOGCAsync(URL, describe_feature_types=False)
+    batches = _batches(task, monkeypatch)
+
+    assert task.run()
+    assert [layer["name"] for layer in task.layers] == ["Orthophotos"]
+    assert [[layer["name"] for layer in batch] for batch in batches] == [["Orthophotos"]]
+
+
+def test_no_endpoint_loaded(server):
+    task = LoadOGCAsync(URL)
+
+    assert task.query_OGC_server(URL) is None
+    assert not task.run()
+
+
+def test_wfs_batch_is_published_before_describe_feature_type(server, monkeypatch):
+    server.responses["WFS"] = [_Response(SECTIONED_WFS_1_1), _Response(DESCRIBE_ROADS)]
+    server.responses["WMS"] = [_Response(SECTIONED_WMS_1_3)]
+
+    task = LoadOGCAsync(URL)
+    batches = _batches(task, monkeypatch)
+    published_before_describe = []
+
+    def resilient_get(url, params=None, **kwargs):
+        if params["request"] == "DescribeFeatureType":
+            published_before_describe.extend(layer["type"] for batch in batches for layer in batch)
+        return server(url, params, **kwargs)
+
+    monkeypatch.setattr(ogc_module, "resilient_get", resilient_get)
+
+    assert task.run()
+    assert "wfs" in published_before_describe
+    (wfs_batch,) = [batch for batch in batches if batch[0]["type"] == "wfs"]
+    # The batch has the guessed geometry type, the final list the described one
+    assert wfs_batch[0]["geometryType"] is None
+    assert "geometryType" not in wfs_batch[0]["attributes"]
+    assert task.layers[0]["geometryType"] == "MultiLineString"
+    assert task.layers[0]["attributes"]["geometryType"] == "MultiLineString"
@@ -0,0 +1,88 @@
+"""Offline tests of the adaptive per-host rate limiter."""
+
+import pytest
+
+requests = pytest.importorskip("requests")
+
+from src.sub import rate_limit  # noqa: E402
+from src.sub.rate_limit import (INITIAL_CONCURRENCY_PER_HOST,  # noqa: E402
+                                INITIAL_RATE_PER_HOST, MAX_RETRY_AFTER,
+                                MIN_CONCURRENCY_PER_HOST, MIN_RATE_PER_HOST,
+                                RATE_INCREASE_STEP, HostRateLimiter)
+
+
+def _response(status, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    return response
+
+
+def test_success_increases_the_limits():
+    limiter = HostRateLimiter("example.org")
+    limiter.acquire()
+    limiter.release(succeeded=True)
+
+    assert limiter.in_flight == 0
+    assert limiter.rate == INITIAL_RATE_PER_HOST + RATE_INCREASE_STEP
+    assert limiter.concurrency > INITIAL_CONCURRENCY_PER_HOST
+
+
+def test_failures_halve_the_limits_down_to_the_minimum():
+    limiter = HostRateLimiter("example.org")
+    limiter.release(succeeded=False)
+
+    assert limiter.rate == INITIAL_RATE_PER_HOST / 2
+    assert limiter.concurrency == INITIAL_CONCURRENCY_PER_HOST / 2
+
+    for _ in range(20):
+        limiter.release(succeeded=False)
+    assert limiter.rate == MIN_RATE_PER_HOST
+    assert limiter.concurrency == MIN_CONCURRENCY_PER_HOST
+
+
+def test_throttled_response_records_retry_after():
+    limiter = HostRateLimiter("example.org")
+    with limiter.request() as ticket:
+        ticket.record(_response(429, {"Retry-After": "2"}))
+
+    assert not ticket.succeeded
+    assert ticket.retry_after == 2.0
+    assert limiter.rate == INITIAL_RATE_PER_HOST / 2
+    assert limiter._blocked_until > 0
+
+
+def test_retry_after_is_capped():
+    limiter = HostRateLimiter("example.org")
+    limiter.release(succeeded=False, retry_after=10 * MAX_RETRY_AFTER)
+
+    assert limiter._blocked_until <= rate_limit.time.monotonic() + MAX_RETRY_AFTER
+
+
+def test_client_errors_do_not_slow_the_host_down():
+    limiter = HostRateLimiter("example.org")
+    with limiter.request() as ticket:
+        ticket.record(_response(404))
+
+    assert ticket.succeeded
+    assert limiter.rate > INITIAL_RATE_PER_HOST
+
+
+def test_request_exceptions_count_as_failures():
+    limiter = HostRateLimiter("example.org")
+    with pytest.raises(requests.exceptions.Timeout):
+        with limiter.request():
+            raise requests.exceptions.Timeout()
+
+    assert limiter.in_flight == 0
+    assert limiter.rate == INITIAL_RATE_PER_HOST / 2
+
+
+def test_certificate_errors_do_not_slow_the_host_down():
+    limiter = HostRateLimiter("example.org")
+    with pytest.raises(requests.exceptions.SSLError):
+        with limiter.request():
+            raise requests.exceptions.SSLError()
+
+    assert limiter.in_flight == 0
+    assert limiter.rate > INITIAL_RATE_PER_HOST
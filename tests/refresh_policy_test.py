@@ -0,0 +1,52 @@
+"""Offline tests of the adaptive refresh interval of cached services."""
+
+import pytest
+
+pytest.importorskip("qgis.core")
+
+from src.sub.refresh_policy import (DEFAULT_SERVICE_TTL,  # noqa: E402
+                                    REFRESH_HISTORY_LENGTH, record_refresh,
+                                    service_ttl)
+
+DAY = 86400
+BOUNDS = (DAY, 90 * DAY)
+
+
+def _history(*changes):
+    history = []
+    for i, changed in enumerate(changes):
+        history = record_refresh(history, changed, refreshed_at=1000 + i)
+    return history
+
+
+def test_record_refresh_keeps_the_latest_refreshes():
+    history = _history(*([False] * (REFRESH_HISTORY_LENGTH + 3)))
+
+    assert len(history) == REFRESH_HISTORY_LENGTH
+    assert history[-1] == [1000 + REFRESH_HISTORY_LENGTH + 2, False]
+    assert record_refresh(None, True, refreshed_at=5) == [[5, True]]
+
+
+def test_ttl_without_history_is_the_default():
+    assert service_ttl([], bounds=BOUNDS) == DEFAULT_SERVICE_TTL
+    assert service_ttl(None, bounds=(DAY, 2 * DAY)) == 2 * DAY
+
+
+def test_ttl_grows_for_unchanged_and_shrinks_for_changed_catalogs():
+    assert service_ttl(_history(False), bounds=BOUNDS) == 2 * DEFAULT_SERVICE_TTL
+    assert service_ttl(_history(True), bounds=BOUNDS) == DEFAULT_SERVICE_TTL // 2
+    assert service_ttl(_history(False, True), bounds=BOUNDS) == DEFAULT_SERVICE_TTL
+
+
+def test_ttl_stays_within_bounds():
+    assert service_ttl(_history(*[False] * 10), bounds=BOUNDS) == 90 * DAY
+    assert service_ttl(_history(*[True] * 10), bounds=BOUNDS) == DAY
+    # Clamped at every step: a bounded run of changes is undone by as many unchanged refreshes
+    assert service_ttl(_history(*[True] * 5, False), bounds=BOUNDS) == 2 * DAY
+
+
+def test_override_replaces_the_adaptive_ttl():
+    assert service_ttl(_history(True), override=3600, bounds=BOUNDS) == 3600
+    assert service_ttl(_history(True), override="7200", bounds=BOUNDS) == 7200
+    # Unusable overrides are ignored
+    assert service_ttl([], override="weekly", bounds=BOUNDS) == DEFAULT_SERVICE_TTL
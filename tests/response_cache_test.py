@@ -0,0 +1,155 @@
+"""Offline tests of the raw-response cache and of conditional requests revalidating it."""
+
+import os
+
+import pytest
+
+pytest.importorskip("requests")
+
+from src.sub import cache, http_client  # noqa: E402
+from src.sub import response_cache as responses  # noqa: E402
+
+URL = "http://example.org/ows"
+PARAMS = {"service": "WMS", "request": "GetCapabilities"}
+KEY = responses.response_cache_key(URL, PARAMS)
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """Point the plugin cache at a temporary directory."""
+    for name in ("ICONS_CACHE_DIR", "CAPABILITIES_CACHE_DIR", "RESPONSES_CACHE_DIR", "CRAWLS_CACHE_DIR"):
+        monkeypatch.setattr(cache, name, str(tmp_path / name.lower()))
+    monkeypatch.setattr(responses, "RESPONSES_CACHE_DIR", cache.RESPONSES_CACHE_DIR)
+    cache.ensure_cache_directories()
+    return tmp_path
+
+
+class _Response:
+    def __init__(self, status_code=200, body=b"", headers=None):
+        self.status_code = status_code
+        self.content = body
+        self.headers = headers or {}
+        self.url = URL
+        self.request = None
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i : i + chunk_size]
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """Queue of answers to http_get, and the request headers it was sent."""
+
+    class Server:
+        answers = []
+        sent_headers = []
+
+    def http_get(url, params=None, headers=None, **kwargs):
+        Server.sent_headers.append(dict(headers or {}))
+        return Server.answers.pop(0)
+
+    monkeypatch.setattr(http_client, "http_get", http_get)
+    return Server
+
+
+def _cached_files():
+    return sorted(os.listdir(cache.RESPONSES_CACHE_DIR))
+
+
+def test_writer_stores_the_streamed_body_on_commit():
+    writer = responses.CachedResponseWriter(KEY, URL, etag='"v1"', headers={"Content-Type": "text/xml"})
+    for chunk in (b"<WMS_", b"Capabilities/>"):
+        writer.write(chunk)
+    assert responses.load_cached_response(KEY) is None
+
+    writer.commit()
+
+    cached = responses.load_cached_response(KEY)
+    assert cached["body"] == b"<WMS_Capabilities/>"
+    assert cached["etag"] == '"v1"'
+    assert cached["headers"] == {"Content-Type": "text/xml"}
+    assert _cached_files() == [f"{KEY}{responses.RESPONSE_EXTENSION}"]
+
+
+def test_discarded_writer_keeps_the_previous_response():
+    responses.save_cached_response(KEY, URL, b"old", etag='"v1"')
+
+    writer = responses.CachedResponseWriter(KEY, URL, etag='"v2"')
+    writer.write(b"partial")
+    writer.discard()
+
+    cached = responses.load_cached_response(KEY)
+    assert (cached["etag"], cached["body"]) == ('"v1"', b"old")
+    assert _cached_files() == [f"{KEY}{responses.RESPONSE_EXTENSION}"]
+
+
+def test_body_of_a_replaced_response_is_not_served():
+    responses.save_cached_response(KEY, URL, b"old", etag='"v1"')
+    meta = responses.load_cached_response_meta(KEY)
+
+    responses.save_cached_response(KEY, URL, b"new", etag='"v2"')
+
+    # The validators read earlier do not describe the stored body anymore
+    assert responses.load_cached_response_body(KEY, meta) is None
+    new_meta = responses.load_cached_response_meta(KEY)
+    assert responses.load_cached_response_body(KEY, new_meta) == b"new"
+
+
+def test_delete_removes_legacy_files():
+    responses.save_cached_response(KEY, URL, b"body", etag='"v1"')
+    for extension in (".json", ".body"):
+        with open(os.path.join(cache.RESPONSES_CACHE_DIR, f"{KEY}{extension}"), "wb") as f:
+            f.write(b"{}")
+
+    (usage,) = responses.cached_response_usage()
+    assert usage["key"] == KEY
+
+    responses.delete_cached_responses([KEY])
+    assert _cached_files() == []
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_not_modified_is_answered_from_the_cache(server, stream):
+    document = b"<WMS_Capabilities/>" * 100
+    server.answers = [
+        _Response(200, document, {"ETag": '"v1"', "Content-Type": "text/xml"}),
+        _Response(304),
+    ]
+
+    first = http_client.conditional_get(URL, params=PARAMS, stream=stream)
+    assert b"".join(first.iter_content(64)) == document
+    assert not first.not_modified
+
+    second = http_client.conditional_get(URL, params=PARAMS, stream=stream)
+
+    assert server.sent_headers[1]["If-None-Match"] == '"v1"'
+    assert second.status_code == 200
+    assert second.not_modified
+    assert b"".join(second.iter_content(64)) == document
+    assert second.headers["Content-Type"] == "text/xml"
+
+
+def test_partially_read_stream_is_not_cached(server):
+    server.answers = [_Response(200, b"<WMS_Capabilities/>", {"ETag": '"v1"'})]
+
+    response = http_client.conditional_get(URL, params=PARAMS, stream=True)
+    chunks = response.iter_content(4)
+    next(chunks)
+    chunks.close()
+
+    assert responses.load_cached_response(KEY) is None
+
+
+def test_response_without_validators_drops_the_cached_one(server):
+    responses.save_cached_response(KEY, URL, b"old", etag='"v1"')
+    server.answers = [_Response(200, b"new")]
+
+    response = http_client.conditional_get(URL, params=PARAMS)
+
+    assert response.content == b"new"
+    assert responses.load_cached_response(KEY) is None
+    assert _cached_files() == []
@@ -0,0 +1,207 @@
+"""Offline tests of the per-host circuit breaker."""
+
+import pytest
+
+pytest.importorskip("requests")
+
+from src.sub import retry  # noqa: E402
+from src.sub.retry import (CIRCUIT_FAILURE_THRESHOLD,  # noqa: E402
+                           CIRCUIT_OPEN_DURATION, CircuitBreaker,
+                           CircuitOpenError)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(retry.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _open(breaker):
+    for _ in range(CIRCUIT_FAILURE_THRESHOLD):
+        breaker.before_request()
+        breaker.record_failure()
+
+
+def test_circuit_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("example.org")
+    for _ in range(CIRCUIT_FAILURE_THRESHOLD - 1):
+        breaker.record_failure()
+    breaker.before_request()
+
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker("example.org")
+    for _ in range(CIRCUIT_FAILURE_THRESHOLD - 1):
+        breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+
+    breaker.before_request()
+    assert breaker.failures == 1
+
+
+def test_half_open_trial_closes_the_circuit(clock):
+    breaker = CircuitBreaker("example.org")
+    _open(breaker)
+
+    clock[0] += CIRCUIT_OPEN_DURATION + 1
+    breaker.before_request()  # The trial request
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()  # Only one trial at a time
+
+    breaker.record_success()
+    breaker.before_request()
+
+
+def test_failed_trial_reopens_the_circuit(clock):
+    breaker = CircuitBreaker("example.org")
+    _open(breaker)
+
+    clock[0] += CIRCUIT_OPEN_DURATION + 1
+    breaker.before_request()
+    breaker.record_failure()
+
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+    clock[0] += CIRCUIT_OPEN_DURATION + 1
+    breaker.before_request()
+
+
+def test_breakers_are_shared_per_host():
+    assert retry.get_circuit_breaker("http://Example.com/a") is retry.get_circuit_breaker("http://example.com/b")
+    assert retry.get_circuit_breaker("http://example.com") is not retry.get_circuit_breaker("http://example.net")
+
+
+class _Ticket:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def record(self, response):
+        pass
+
+
+class _Limiter:
+    def request(self):
+        return _Ticket()
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """Answers of the stubbed conditional_get, in order: responses (status codes) or exceptions."""
+    answers = []
+    calls = []
+    sleeps = []
+
+    def conditional_get(url, params=None, **kwargs):
+        calls.append(url)
+        answer = answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        response = retry.requests.Response()
+        response.status_code = answer
+        return response
+
+    monkeypatch.setattr(retry, "conditional_get", conditional_get)
+    monkeypatch.setattr(retry, "get_host_limiter", lambda url: _Limiter())
+    monkeypatch.setattr(retry, "_circuit_breakers", {})
+    monkeypatch.setattr(retry.time, "sleep", sleeps.append)
+    monkeypatch.setattr(retry, "_backoff", lambda attempt: 0.5)
+    return answers, calls, sleeps
+
+
+URL = "http://example.org/ows"
+
+
+def test_server_errors_are_retried(server):
+    answers, calls, sleeps = server
+    answers.extend([503, 200])
+
+    assert retry.resilient_get(URL).status_code == 200
+    assert len(calls) == 2
+    assert sleeps == [0.5]
+    assert retry.get_circuit_breaker(URL).failures == 0
+
+
+def test_last_response_is_returned_after_max_attempts(server):
+    answers, calls, _ = server
+    answers.extend([502] * retry.MAX_ATTEMPTS)
+
+    assert retry.resilient_get(URL).status_code == 502
+    assert len(calls) == retry.MAX_ATTEMPTS
+    assert retry.get_circuit_breaker(URL).failures == retry.MAX_ATTEMPTS
+
+
+def test_throttling_does_not_count_as_a_failure(server):
+    answers, calls, _ = server
+    answers.extend([429] * retry.MAX_ATTEMPTS)
+
+    assert retry.resilient_get(URL).status_code == 429
+    assert len(calls) == retry.MAX_ATTEMPTS
+    assert retry.get_circuit_breaker(URL).failures == 0
+
+
+def test_timeouts_are_retried_then_raised(server):
+    answers, calls, _ = server
+    answers.extend([retry.requests.exceptions.Timeout()] * retry.MAX_ATTEMPTS)
+
+    with pytest.raises(retry.requests.exceptions.Timeout):
+        retry.resilient_get(URL)
+    assert len(calls) == retry.MAX_ATTEMPTS
+
+
+def test_ssl_errors_are_not_retried(server):
+    answers, calls, sleeps = server
+    answers.append(retry.requests.exceptions.SSLError())
+
+    with pytest.raises(retry.requests.exceptions.SSLError):
+        retry.resilient_get(URL)
+    assert len(calls) == 1
+    assert sleeps == []
+    assert retry.get_circuit_breaker(URL).failures == 0
+
+
+def test_unexpected_error_resolves_the_half_open_trial(server, clock):
+    answers, calls, _ = server
+    breaker = retry.get_circuit_breaker(URL)
+    _open(breaker)
+
+    clock[0] += CIRCUIT_OPEN_DURATION + 1
+    answers.append(retry.requests.exceptions.ChunkedEncodingError())
+    with pytest.raises(retry.requests.exceptions.ChunkedEncodingError):
+        retry.resilient_get(URL)
+
+    # The failed trial re-opened the circuit instead of leaving it stuck half-open
+    assert not breaker._trial_in_flight
+    with pytest.raises(CircuitOpenError):
+        retry.resilient_get(URL)
+
+    clock[0] += CIRCUIT_OPEN_DURATION + 1
+    answers.append(200)
+    assert retry.resilient_get(URL).status_code == 200
+
+
+def test_cancelled_task_is_not_retried(server):
+    answers, calls, sleeps = server
+    answers.extend([503, retry.requests.exceptions.ConnectionError()])
+
+    assert retry.resilient_get(URL, is_cancelled=lambda: True).status_code == 503
+    with pytest.raises(retry.requests.exceptions.ConnectionError):
+        retry.resilient_get(URL, is_cancelled=lambda: True)
+    assert len(calls) == 2
+    assert sleeps == []
+
+
+def test_backoff_wakes_up_on_cancellation(server, clock):
+    _, _, sleeps = server
+    cancelled = iter([False, False, True])
+
+    assert retry._sleep_unless_cancelled(5.0, lambda: next(cancelled))
+    assert sleeps == [retry.CANCEL_POLL_INTERVAL] * 2
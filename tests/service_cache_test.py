@@ -0,0 +1,93 @@
+"""
+Offline tests of the lazy loading of a service's cached layers: services start from
+the summary index, and their layers are only read from the cache when needed.
+"""
+
+import re
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("qgis.core")
+
+from src.core.OGCService import OGCService  # noqa: E402
+from src.core.Service import GrdServiceState  # noqa: E402
+from src.sub import cache  # noqa: E402
+from src.sub import capabilities_cache as capabilities  # noqa: E402
+
+URL = "http://example.org/ows"
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """Point the plugin cache at a temporary directory."""
+    for name in ("ICONS_CACHE_DIR", "CAPABILITIES_CACHE_DIR", "RESPONSES_CACHE_DIR", "CRAWLS_CACHE_DIR"):
+        monkeypatch.setattr(cache, name, str(tmp_path / name.lower()))
+    monkeypatch.setattr(cache, "CAPABILITIES_DB_FILE", str(tmp_path / "capabilities.sqlite"))
+    monkeypatch.setattr(capabilities, "CAPABILITIES_CACHE_DIR", cache.CAPABILITIES_CACHE_DIR)
+    monkeypatch.setattr(capabilities, "_cache_presence_index", {})
+    cache.ensure_cache_directories()
+    return tmp_path
+
+
+@pytest.fixture
+def layer_queries():
+    """SQL statements of this thread's cache connection that read the layers table."""
+    statements = []
+    conn = capabilities._connection()
+    conn.set_trace_callback(statements.append)
+    yield lambda: [sql for sql in statements if re.search(r"\blayers\b", sql)]
+    conn.set_trace_callback(None)
+
+
+def _cache_service(service_id, names):
+    layers = [
+        {"id": i, "name": name, "url": f"{URL}?typename={name}", "type": "wfs", "geometry_type": "Point", "attributes": {}}
+        for i, name in enumerate(names)
+    ]
+    capabilities.save_capabilities_cache(
+        service_id, {"id": service_id, "updated_at": 100, "fingerprints": {"wfs": "1"}}, {f"{URL}?service=WFS": layers}
+    )
+    assert capabilities.flush_capabilities_cache(timeout=10)
+
+
+def test_summary_only_service_reads_its_layers_on_first_access(layer_queries):
+    _cache_service("svc", ["roads", "lakes"])
+    summary = capabilities.load_capabilities_index()["svc"]
+
+    service = OGCService("service", URL, config={"id": "svc"}, summary=summary)
+
+    assert service.loaded
+    assert service.state == GrdServiceState.LOADED
+    assert service.updated_at == 100
+    assert layer_queries() == []
+
+    assert [layer.name for layer in service.layers] == ["roads", "lakes"]
+    assert len(layer_queries()) == 1
+    assert service.fingerprints == {"wfs": "1"}
+
+    # Loaded once
+    service.layers
+    assert len(layer_queries()) == 1
+
+
+def test_service_without_summary_reads_only_the_service_row(layer_queries):
+    _cache_service("svc", ["roads"])
+
+    service = OGCService("service", URL, config={"id": "svc"})
+
+    assert service.summary["layer_count"] == 1
+    assert service.loaded
+    assert layer_queries() == []
+
+
+def test_evicted_service_is_not_loaded():
+    _cache_service("svc", ["roads"])
+    summary = capabilities.load_capabilities_index()["svc"]
+    service = OGCService("service", URL, config={"id": "svc"}, summary=summary)
+
+    capabilities.delete_capabilities_cache(["svc"]).result(timeout=10)
+
+    assert service.layers is None
+    assert not service.loaded
+    assert service.state == GrdServiceState.NOT_LOADED
@@ -0,0 +1,223 @@
+"""
+Offline tests of the stale-while-revalidate refresh of a service's layers: expired
+layers keep being served while a background refresh runs, and are only replaced if
+the catalog changed. The OGC loader task is replaced by a stub the tests finish.
+"""
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("qgis.core")
+
+from qgis.PyQt.QtCore import QObject, pyqtSignal  # noqa: E402
+
+from src.core import OGCService as ogc_module  # noqa: E402
+from src.core.Service import GrdServiceState  # noqa: E402
+from src.sub import cache  # noqa: E402
+from src.sub import capabilities_cache as capabilities  # noqa: E402
+
+URL = "http://example.org/ows"
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """Point the plugin cache at a temporary directory."""
+    for name in ("ICONS_CACHE_DIR", "CAPABILITIES_CACHE_DIR", "RESPONSES_CACHE_DIR", "CRAWLS_CACHE_DIR"):
+        monkeypatch.setattr(cache, name, str(tmp_path / name.lower()))
+    monkeypatch.setattr(cache, "CAPABILITIES_DB_FILE", str(tmp_path / "capabilities.sqlite"))
+    monkeypatch.setattr(capabilities, "CAPABILITIES_CACHE_DIR", cache.CAPABILITIES_CACHE_DIR)
+    monkeypatch.setattr(capabilities, "_cache_presence_index", {})
+    cache.ensure_cache_directories()
+    return tmp_path
+
+
+class _Loader(QObject):
+    """Stands in for LoadOGCAsync; the test emits its signals."""
+
+    loaded = pyqtSignal(list)
+    batchLoaded = pyqtSignal(list, list)
+
+    def __init__(self, url, previous_endpoints=None, delta=True):
+        super().__init__()
+        self.previous_endpoints = previous_endpoints
+        self.delta = delta
+        self.update_sequences = {"wfs": None}
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class _TaskManager:
+    def __init__(self):
+        self.tasks = []
+
+    def addTask(self, task):
+        self.tasks.append(task)
+
+
+def _layers(*names):
+    return [
+        {"id": i, "name": name, "url": f"{URL}?typename={name}", "type": "wfs", "attributes": {}, "geometryType": "Point"}
+        for i, name in enumerate(names)
+    ]
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """An OGC service whose first fetch loaded two layers, now expired."""
+    monkeypatch.setattr(ogc_module, "LoadOGCAsync", _Loader)
+    service = ogc_module.OGCService("service", URL, config={"id": "svc"})
+    service.tm = _TaskManager()
+
+    service.getLayers()
+    first = service.tm.tasks[-1]
+    first.update_sequences = {"wfs": "1"}
+    first.loaded.emit(_layers("roads", "lakes"))
+    assert capabilities.flush_capabilities_cache(timeout=10)
+
+    service.updated_at = 1  # Expired
+    states = []
+    service.changed.connect(states.append)
+    service.states = states
+    return service
+
+
+def _revalidate(service):
+    layers = service.layers
+    assert service.getLayers() is layers
+    return service.tm.tasks[-1]
+
+
+def test_cached_layers_are_served_while_revalidating(service):
+    cached = service.layers
+
+    task = _revalidate(service)
+
+    assert len(service.tm.tasks) == 2
+    assert task.delta
+    assert task.previous_endpoints["wfs"]["update_sequence"] == "1"
+    assert service.state == GrdServiceState.LOADED
+    assert [layer.name for layer in service.getLayers()] == ["roads", "lakes"]
+    assert service.layers is cached
+    # Requested again while running: no second refresh
+    assert len(service.tm.tasks) == 2
+    assert service.states == []
+
+
+def test_unchanged_catalog_keeps_the_layer_objects(service):
+    cached = list(service.layers)
+    task = _revalidate(service)
+
+    task.update_sequences = {"wfs": "1"}
+    task.loaded.emit(_layers("roads", "lakes"))
+
+    assert all(new is old for new, old in zip(service.layers, cached))
+    assert service.states == []
+    assert service.refresh_history[-1][1] is False
+    assert service.updated_at > 1
+
+
+def test_changed_catalog_replaces_the_layers(service):
+    task = _revalidate(service)
+
+    task.update_sequences = {"wfs": "2"}
+    task.loaded.emit(_layers("roads", "lakes", "rivers"))
+    assert capabilities.flush_capabilities_cache(timeout=10)
+
+    assert [layer.name for layer in service.layers] == ["roads", "lakes", "rivers"]
+    assert service.states == [GrdServiceState.LOADED]
+    assert service.refresh_history[-1][1] is True
+    assert service.fingerprints == {f"{URL}?service=WFS": "2"}
+    assert capabilities.load_capabilities_cache("svc")["layer_count"] == 3
+
+
+def test_failed_revalidation_keeps_layers_and_fingerprints(service):
+    cached = service.layers
+    fingerprints = dict(service.fingerprints)
+    task = _revalidate(service)
+
+    task.update_sequences = {"wfs": "2"}
+    task.loaded.emit([])
+    assert capabilities.flush_capabilities_cache(timeout=10)
+
+    assert service.layers is cached
+    assert service.state == GrdServiceState.LOADED
+    assert service.states == []
+    assert service.fingerprints == fingerprints == {f"{URL}?service=WFS": "1"}
+    stored = capabilities.load_capabilities_cache("svc")
+    assert stored["fingerprints"] == fingerprints
+    assert stored["layer_count"] == 2
+
+
+def test_fetch_during_revalidation_takes_it_over(service):
+    task = _revalidate(service)
+
+    # E.g. a layer of the service is selected while it is refreshed
+    service.loaded = False
+    service.getLayers()
+
+    assert len(service.tm.tasks) == 2
+    assert service.state == GrdServiceState.LOADING
+    task.loaded.emit(_layers("roads"))
+    assert [layer.name for layer in service.layers] == ["roads"]
+    assert service.state == GrdServiceState.LOADED
+
+
+def test_manual_refresh_replaces_the_revalidation(service):
+    revalidation = _revalidate(service)
+
+    # As ServiceTree.refresh_service_capabilities does
+    service.loaded = False
+    service.updated_at = None
+    service.getLayers()
+
+    full = service.tm.tasks[-1]
+    assert full is not revalidation
+    assert revalidation.cancelled
+    assert not full.delta
+    assert service.state == GrdServiceState.LOADING
+
+    # The cancelled revalidation can no longer deliver its layers
+    revalidation.loaded.emit(_layers("stale"))
+    assert [layer.name for layer in service.layers] == ["roads", "lakes"]
+
+    full.loaded.emit(_layers("roads", "lakes", "rivers"))
+    assert [layer.name for layer in service.layers] == ["roads", "lakes", "rivers"]
+    assert service.state == GrdServiceState.LOADED
+
+
+def test_first_fetch_streams_batches(monkeypatch):
+    monkeypatch.setattr(ogc_module, "LoadOGCAsync", _Loader)
+    service = ogc_module.OGCService("service", URL, config={"id": "new"})
+    service.tm = _TaskManager()
+    added = []
+    service.layersAdded.connect(lambda layers, paths: added.append([layer.name for layer in layers]))
+
+    service.getLayers()
+    task = service.tm.tasks[-1]
+    assert service.state == GrdServiceState.LOADING
+
+    task.batchLoaded.emit(_layers("roads"), [])
+    task.batchLoaded.emit(_layers("ortho", "grid"), [])
+
+    assert [(layer.id, layer.name) for layer in service.layers] == [(0, "roads"), (1, "ortho"), (2, "grid")]
+    assert added == [["roads"], ["ortho", "grid"]]
+    assert service.state == GrdServiceState.LOADING
+
+    task.loaded.emit(_layers("roads", "ortho", "grid"))
+    assert [layer.name for layer in service.layers] == ["roads", "ortho", "grid"]
+    assert service.state == GrdServiceState.LOADED
+    # A first fetch is not a refresh
+    assert service.refresh_history == []
+
+
+def test_revalidation_does_not_stream_batches(service):
+    added = []
+    service.layersAdded.connect(lambda layers, paths: added.append(layers))
+    task = _revalidate(service)
+
+    task.batchLoaded.emit(_layers("rivers"), [])
+
+    assert [layer.name for layer in service.layers] == ["roads", "lakes"]
+    assert added == []